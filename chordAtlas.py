@@ -0,0 +1,179 @@
+#!/usr/bin/python
+'''
+Fretboard atlas. Batch renders every instrument x key x spelling to files without opening a Tk window.
+
+  python chordAtlas.py                 # svg for everything into ./atlas
+  python chordAtlas.py -f svg,html -i Guitar Bass -s major minor -j 4
+
+Output goes to <out>/<instrument>/<key>-<spelling>.<ext>. A combination is skipped if its output is newer than
+the theory tables, use --force to render everything again. png needs cairosvg.
+'''
+
+from __future__ import print_function
+import os, sys, time, argparse, multiprocessing
+
+from chordTheory import *
+import registry
+from fretboard import fretboardArrays, fretboardLayout, staticShapes, noteShapes
+
+try:
+  import cairosvg
+except ImportError:
+  cairosvg = None
+
+FORMATS = ( 'svg', 'html', 'png' )
+
+# Output is out of date if any of these, or the registry in use, are newer.
+SOURCES = ( 'registry.py', 'chordTheory.py', 'fretboard.py', 'chordAtlas.py' )
+
+def sourceStamp():
+  here = os.path.dirname( os.path.abspath( __file__ ) )
+  return max( os.path.getmtime( f ) for f in [ os.path.join( here, s ) for s in SOURCES ] +
+                                               [ registry.default().fileName ] )
+
+def fileName( outDir, instrument, key, spelling, ext ):
+  return os.path.join( outDir, instrument.replace( ' ', '_' ), "%s-%s.%s" % ( key, spelling, ext ) )
+
+def upToDate( path, stamp ):
+  return os.path.exists( path ) and os.path.getmtime( path ) >= stamp
+
+def escape( txt ):
+  return txt.replace( '&', '&amp;' ).replace( '<', '&lt;' ).replace( '>', '&gt;' )
+
+def svgShape( kind, coords, options ):
+  # One canvas primitive as svg. Tk defaults: ovals and rectangles are outlined black, unfilled.
+  fill = options.get( 'fill' ) or "none"
+  if kind == 'text':
+    return '<text x="%g" y="%g" fill="%s" text-anchor="middle" dominant-baseline="central">%s</text>' % \
+           ( coords[ 0 ], coords[ 1 ], fill, escape( options[ 'text' ] ) )
+  if kind == 'line':
+    return '<line x1="%g" y1="%g" x2="%g" y2="%g" stroke="%s"/>' % ( coords + ( fill, ) )
+  outline = options.get( 'outline', "black" )
+  x0, y0, x1, y1 = coords
+  if kind == 'rectangle':
+    return '<rect x="%g" y="%g" width="%g" height="%g" fill="%s" stroke="%s"/>' % \
+           ( x0, y0, x1 - x0, y1 - y0, fill, outline )
+  return '<ellipse cx="%g" cy="%g" rx="%g" ry="%g" fill="%s" stroke="%s"/>' % \
+         ( ( x0 + x1 ) / 2.0, ( y0 + y1 ) / 2.0, ( x1 - x0 ) / 2.0, ( y1 - y0 ) / 2.0, fill, outline )
+
+def renderSvg( instrument, key, spelling ):
+  fretboard = fretboardArrays( instrument, key, spelling )
+  layout = fretboardLayout( fretboard[ 'numStrings' ], fretboard[ 'numFrets' ] )
+  title = "%s: %s %s" % ( instrument, key, spelling )
+
+  lines = [ '<svg xmlns="http://www.w3.org/2000/svg" width="%d" height="%d" font-family="monospace" font-size="12">' %
+            ( layout[ 'WIDTH' ], layout[ 'HEIGHT' ] ),
+            '<title>%s</title>' % escape( title ),
+            '<rect width="100%" height="100%" fill="white"/>' ]
+  for shape in staticShapes( fretboard ) + noteShapes( fretboard, False ):
+    lines.append( svgShape( *shape ) )
+  lines.append( '</svg>' )
+  return "\n".join( lines ) + "\n"
+
+def renderHtml( instrument, key, spelling, svg ):
+  title = escape( "%s: %s %s" % ( instrument, key, spelling ) )
+  return "<!DOCTYPE html>\n<html><head><title>%s</title></head>\n<body><h2>%s</h2>\n%s</body></html>\n" % \
+         ( title, title, svg )
+
+def writeFile( path, data ):
+  # Write then rename so an interrupted run doesn't leave a partial file that looks up to date.
+  tmpName = path + ".tmp"
+  with open( tmpName, 'wb' ) as f:
+    f.write( data )
+  os.rename( tmpName, path )
+
+def renderJob( job ):
+  '''
+  Render one instrument/key/spelling in all the requested formats. Runs in a worker process.
+  Returns ( files written, files skipped ).
+  '''
+  instrument, key, spelling, formats, outDir, stamp, force = job
+
+  todo = [ ext for ext in formats
+           if force or not upToDate( fileName( outDir, instrument, key, spelling, ext ), stamp ) ]
+  if not todo:
+    return 0, len( formats )
+
+  svg = renderSvg( instrument, key, spelling )
+  for ext in todo:
+    if ext == 'svg':
+      data = svg.encode( 'utf-8' )
+    elif ext == 'html':
+      data = renderHtml( instrument, key, spelling, svg ).encode( 'utf-8' )
+    else:
+      data = cairosvg.svg2png( bytestring=svg.encode( 'utf-8' ) )
+    writeFile( fileName( outDir, instrument, key, spelling, ext ), data )
+
+  return len( todo ), len( formats ) - len( todo )
+
+def writeIndex( outDir, instList, keys, spellingList, formats ):
+  # Top level page linking everything.
+  ext = 'html' if 'html' in formats else formats[ 0 ]
+  lines = [ "<!DOCTYPE html>\n<html><head><title>Fretboard atlas</title></head><body>" ]
+  for instrument in instList:
+    lines.append( "<h2>%s</h2>\n<table>" % escape( instrument ) )
+    for key in keys:
+      cells = []
+      for spelling in spellingList:
+        path = os.path.relpath( fileName( outDir, instrument, key, spelling, ext ), outDir )
+        cells.append( '<td><a href="%s">%s</a></td>' % ( escape( path ), escape( key + spelling ) ) )
+      lines.append( "<tr>" + "".join( cells ) + "</tr>" )
+    lines.append( "</table>" )
+  lines.append( "</body></html>\n" )
+  writeFile( os.path.join( outDir, "index.html" ), "\n".join( lines ).encode( 'utf-8' ) )
+
+def main( argv ):
+  parser = argparse.ArgumentParser( description="Render fretboards for every instrument, key and spelling." )
+  parser.add_argument( '-o', '--out', default="atlas", help="output directory" )
+  parser.add_argument( '-f', '--formats', default="svg", help="comma separated, from: " + ", ".join( FORMATS ) )
+  parser.add_argument( '-i', '--instruments', nargs='+', default=list( instruments ) )
+  parser.add_argument( '-k', '--keys', nargs='+', default=list( dispKeyList ) )
+  parser.add_argument( '-s', '--spellings', nargs='+', default=list( spellings ) )
+  parser.add_argument( '-j', '--jobs', type=int, default=multiprocessing.cpu_count() )
+  parser.add_argument( '--force', action='store_true', help="render even if up to date" )
+  args = parser.parse_args( argv )
+
+  formats = [ f for f in args.formats.split( ',' ) if f ]
+  for f in formats:
+    if f not in FORMATS:
+      parser.error( "Unknown format: " + f )
+  if 'png' in formats and cairosvg is None:
+    parser.error( "png needs cairosvg." )
+  for i in args.instruments:
+    if i not in instrumentMap:
+      parser.error( "Unknown instrument: " + i )
+  for k in args.keys:
+    if k not in dispKeyList:
+      parser.error( "Unknown key: " + k )
+  for s in args.spellings:
+    if s not in spellingMap:
+      parser.error( "Unknown spelling: " + s )
+
+  for instrument in args.instruments:
+    d = os.path.dirname( fileName( args.out, instrument, 'C', 'major', 'svg' ) )
+    if not os.path.isdir( d ):
+      os.makedirs( d )
+
+  stamp = sourceStamp()
+  jobs = [ ( instrument, key, spelling, formats, args.out, stamp, args.force )
+           for instrument in args.instruments for key in args.keys for spelling in args.spellings ]
+
+  start = time.time()
+  written = skipped = 0
+  pool = multiprocessing.Pool( max( 1, args.jobs ) )
+  try:
+    for w, s in pool.imap_unordered( renderJob, jobs, chunksize=8 ):
+      written += w
+      skipped += s
+  finally:
+    pool.close()
+    pool.join()
+
+  writeIndex( args.out, args.instruments, args.keys, args.spellings, formats )
+
+  print( "%d combinations, %d files written, %d up to date, %.1fs." %
+         ( len( jobs ), written, skipped, time.time() - start ) )
+  return 0
+
+if __name__ == '__main__':
+  sys.exit( main( sys.argv[ 1 : ] ) )
@@ -0,0 +1,97 @@
+'''
+Chord identification, the reverse of chords.py: which root/spelling does a set of notes belong to.
+
+An inverted index maps each spelling mask to the ( root, spelling ) pairs that have it, e.g. C Ionian and
+A Aeolian share one. A query is checked against the distinct masks with bit operations, exact, subset
+( notes missing from the chord ) and superset ( notes outside the chord ) matches, and the ranked result
+is memoized per query so repeat lookups ( every beat of a song, live fingering ) are a dict read.
+'''
+
+import chordTheory
+from chordTheory import *
+
+# Scoring, lower is a better match.
+MISSING_COST = 2   # per chord tone not played
+EXTRA_COST = 3     # per played note not in the chord
+NO_ROOT_COST = 2   # chord root not played
+INVERSION_COST = 1 # bass isn't the root
+
+_index = {}       # mask -> list of ( root, spelling )
+_results = {}     # ( mask, bass ) -> ranked matches
+_indexVersion = None
+
+def chordIndex():
+  # The inverted index, rebuilt if the spellings have been recompiled.
+  global _indexVersion
+  if _indexVersion != chordTheory.tablesVersion:
+    _index.clear()
+    _results.clear()
+    for spelling in spellingMap:
+      for root, mask in enumerate( spellingMasks[ spelling ] ):
+        _index.setdefault( mask, [] ).append( ( root, spelling ) )
+    _indexVersion = chordTheory.tablesVersion
+  return _index
+
+def identify( notes, bass=None ):
+  '''
+  Rank every root/spelling against notes, a pitch class mask.
+  bass is the lowest sounding pitch class if known.
+  Returns a list of ( score, root, spelling, missing mask, extra mask ), best first. Only spellings that
+  contain the notes or are contained by them are returned.
+  '''
+  index = chordIndex()
+  key = ( notes, bass )
+  matches = _results.get( key )
+  if matches is not None:
+    return matches
+
+  matches = []
+  if notes:
+    for mask, entries in index.items():
+      common = mask & notes
+      if common != notes and common != mask:
+        continue # neither contains the other
+      missing = maskSize( mask & ~notes )
+      extra = maskSize( notes & ~mask )
+      for root, spelling in entries:
+        score = missing * MISSING_COST + extra * EXTRA_COST
+        if not inMask( notes, root ):
+          score += NO_ROOT_COST
+        if bass is not None and bass != root:
+          score += INVERSION_COST
+        matches.append( ( score, root, spelling, mask & ~notes, notes & ~mask ) )
+
+    # Ties go to the smaller spelling ( chords before scales ), then spellingMap order.
+    matches.sort( key=lambda m : ( m[ 0 ], len( spellingMap[ m[ 2 ] ] ), spellingIndex[ m[ 2 ] ], m[ 1 ] ) )
+
+  _results[ key ] = matches
+  return matches
+
+def frettedNotes( instrument, frets ):
+  '''
+  Pitch class mask and bass of frets on instrument.
+  frets is a fret number per string in instrumentMap order, None for strings not played.
+  The bass is taken to be the last string played, instrumentMap lists strings high to low.
+  '''
+  tuning = instrumentMap[ instrument ][ 't' ]
+  offsets = instrumentMap[ instrument ][ 'f' ]
+  notes = 0
+  bass = None
+  for string, fret in enumerate( frets ):
+    if fret is None:
+      continue
+    note = calcNote( tuning[ string ], fret - offsets[ string ] )
+    notes |= 1 << note
+    bass = note
+  return notes, bass
+
+def identifyFrets( instrument, frets ):
+  return identify( *frettedNotes( instrument, frets ) )
+
+def chordName( root, spelling, bass=None ):
+  # Display name, "Ab m7" or "C major/G" for an inversion.
+  keyList = displayKeyList( root, spelling )
+  name = keyList[ root ] + " " + spelling
+  if bass is not None and bass != root:
+    name += "/" + keyList[ bass ]
+  return name
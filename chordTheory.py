@@ -0,0 +1,194 @@
+'''
+Chord theory tables and a precomputed pitch class engine for chords.py.
+
+Every spelling in spellingMap is compiled once into a 12 bit pitch class mask for each of the 12 roots.
+Bit n of a mask is set if pitch class n (C = 0, Db = 1, .. B = 11) is a member, so membership, interval
+naming and overlay intersection are integer operations. Nothing here needs Tk.
+'''
+
+import registry
+from collections import OrderedDict
+
+_registry = registry.default()
+
+# Instruments, spellings and harmony come from registry.json.
+instrumentMap = _registry.instrumentMap()
+instruments = _registry.instruments() # the instruments shown in menus
+
+intervals = { "Normal" : ( 'R', 'b2', '2', 'b3', '3',  '4', 'b5', '5',  'b6',  '6', 'b7', '7' ),
+              "Extended" : ( 'R', 'b9', '9', 'b3', '3', '11', 'b5', '5', 'b13', '13', 'b7', '7' ),
+              "Lydian" : ( 'R', 'b2', '2', 'b3', '3',  '4', '#4', '5',  'b6',  '6', 'b7', '7' ) }
+
+# display with a #/b if that's how we'd display the major key.
+dispKeyList    = ( 'C', 'Db', 'D', 'Eb', 'E', 'F', 'F#', 'G', 'Ab', 'A', 'Bb', 'B' )
+keyListSharps  = ( 'C', 'C#', 'D', 'D#', 'E', 'F', 'F#', 'G', 'G#', 'A', 'A#', 'B' )
+keyListFlats   = ( 'C', 'Db', 'D', 'Eb', 'E', 'F', 'Gb', 'G', 'Ab', 'A', 'Bb', 'B' )
+bKeys          = ( 'F', 'Bb', 'Eb','Ab', 'Db' ) # keys to be displayed as having flats
+
+# spellingMap is a dictionary of names for the spelling and a tuple of intervals members.
+# Our own copy so addSpelling() doesn't touch the registry.
+spellingMap = OrderedDict( _registry.spellingMap() )
+
+majHarmMap = _registry.majHarmMap()
+
+# The spellings (keys in spellingMap above) shown in menus.
+spellings = _registry.spellings()
+
+extChords = ( '9', 'm9', 'M9', '11', 'm11', 'M11', '13', 'm13', 'M13' )
+extIntervals = ( '9', '11', '13' )
+minorSpellings = ( 'm', 'm7', 'm9', 'm11', 'm13', 'm-Key', 'Aeolian' )
+num_frets = 24
+
+ALL_NOTES = 0xfff # mask with all 12 pitch classes set
+
+def _buildNoteIndex():
+  # Note name -> pitch class. Accepts any of the key lists so "C#", "Db" and "F#" all resolve.
+  index = {}
+  for keyList in( keyListSharps, keyListFlats, dispKeyList ):
+    for ix, name in enumerate( keyList ):
+      index[ name ] = ix
+  return index
+
+def _buildIntervalIndex():
+  # Interval name -> semitones above the root, across all naming schemes ( b5 and #4 are both 6 ).
+  index = {}
+  for names in intervals.values():
+    for ix, name in enumerate( names ):
+      index[ name ] = ix
+  return index
+
+noteIndex = _buildNoteIndex()
+intervalIndex = _buildIntervalIndex()
+
+spellingMasks = {} # spelling -> tuple of 12 masks, indexed by root pitch class
+intervalNames = {} # spelling -> tuple of 12 interval names, indexed by semitones above the root
+spellingIndex = {} # spelling -> column in sharpsTable
+sharpsTable = []   # sharpsTable[ key pitch class ][ spellingIndex[ spelling ] ], True to show with sharps
+tablesVersion = 0  # bumped by compileSpellings() so tables built from these know to rebuild
+
+def intervalScheme( spelling ):
+  # Which intervals naming to use for a spelling.
+  if spelling in extChords:
+    return "Extended"
+  if spelling == 'Lydian':
+    return "Lydian"
+  return "Normal"
+
+def rotateMask( mask, semitones ):
+  # Transpose a pitch class mask up by semitones.
+  semitones %= 12
+  return ( ( mask << semitones ) | ( mask >> ( 12 - semitones ) ) ) & ALL_NOTES
+
+def intervalMask( members ):
+  # Mask of a tuple of interval names relative to C.
+  mask = 0
+  for name in members:
+    mask |= 1 << intervalIndex[ name ]
+  return mask
+
+def calcShowWithSharps( key, spelling ):
+  # return True if we should show this key/spelling as having sharps (vs flats)
+  # Use showWithSharps(), this is how its table is built.
+
+  def relMajor( key, off=3 ):
+    # input is a minor key, returns the relative major key
+    index = ( dispKeyList.index( key ) + off ) % 12
+    key = dispKeyList[ index ]
+    return key
+
+  if spelling in( 'mBlues', 'MBlues' ):  # Blues is always flats
+    return False
+
+  if spelling == "Dorian":
+    key = relMajor( key, 10 )
+  elif spelling == "Phrygian":
+    key = relMajor( key, 8 )
+  elif spelling == "Lydian":
+    key = relMajor( key, 7 )
+  elif spelling == "Mixolydian":
+    key = relMajor( key, 5 )
+  elif spelling == "Locrian":
+    key = relMajor( key, 1 )
+  elif spelling in minorSpellings:
+    key = relMajor( key )
+
+  return key not in bKeys
+
+def deriveTables( spellingMap ):
+  # The compiled tables for spellingMap, see compileSpellings().
+  masks = {}
+  names = {}
+  index = {}
+  for spelling in spellingMap:
+    mask = intervalMask( spellingMap[ spelling ] )
+    masks[ spelling ] = tuple( rotateMask( mask, root ) for root in range( 12 ) )
+    names[ spelling ] = intervals[ intervalScheme( spelling ) ]
+    index[ spelling ] = len( index )
+
+  sharps = [ [ calcShowWithSharps( key, spelling ) for spelling in index ] for key in dispKeyList ]
+  return masks, names, index, sharps
+
+def compileSpellings( tables=None ):
+  '''
+  (Re)build the compiled tables from spellingMap, or install tables from deriveTables().
+  Call this if spellingMap is changed at runtime, addSpelling() does it for you.
+  '''
+  global tablesVersion
+  if tables is None:
+    tables = deriveTables( spellingMap )
+  masks, names, index, sharps = tables
+
+  spellingMasks.clear()
+  spellingMasks.update( masks )
+  intervalNames.clear()
+  intervalNames.update( names )
+  spellingIndex.clear()
+  spellingIndex.update( index )
+  sharpsTable[ : ] = sharps
+  tablesVersion += 1
+
+def addSpelling( spelling, members ):
+  # Add or replace a spelling, members is a tuple of interval names. Add it to spellings to show it in menus.
+  spellingMap[ spelling ] = tuple( members )
+  compileSpellings()
+
+def spellingMask( key, spelling ):
+  # Mask of the pitch classes in spelling rooted at key ( a note name or pitch class ).
+  if not isinstance( key, int ):
+    key = noteIndex[ key ]
+  return spellingMasks[ spelling ][ key ]
+
+def inMask( mask, note ):
+  # True if pitch class note is in mask.
+  return ( mask >> note ) & 1 == 1
+
+def maskNotes( mask ):
+  # Pitch classes in mask, lowest first.
+  return [ n for n in range( 12 ) if ( mask >> n ) & 1 ]
+
+def maskSize( mask ):
+  return bin( mask ).count( '1' )
+
+def calcNote( root, fret ):
+  # Pitch class of fret frets above root.
+  return ( noteIndex[ root ] + fret ) % 12
+
+def calcInterval( note, key ):
+  # Semitones from key up to note, both pitch classes.
+  return ( note - key ) % 12
+
+def intervalName( spelling, interval ):
+  return intervalNames[ spelling ][ interval ]
+
+def showWithSharps( key, spelling ):
+  # True if key ( a note name or pitch class ) / spelling is shown with sharps (vs flats)
+  if not isinstance( key, int ):
+    key = noteIndex[ key ]
+  return sharpsTable[ key ][ spellingIndex[ spelling ] ]
+
+def displayKeyList( key, spelling ):
+  # The note names to display key/spelling with.
+  return keyListSharps if showWithSharps( key, spelling ) else keyListFlats
+
+# Startup uses the tables cached with the registry, they're only derived when registry.json changes.
+compileSpellings( _registry.cached( 'spellingTables', lambda data : deriveTables( data[ 'spellings' ] ) ) )
@@ -17,279 +17,183 @@ else:
   from tkinter import *
   import tkinter.font as tkFont
 
-instrumentMap = {
-  'Mandolin' :    { "t" : ( "E", "A", "D", "G" ),           "f" : ( 0, 0, 0, 0 ) },
-  'Guitar' :      { "t" : ( "E", "B", "G", "D", "A", "E" ), "f" : ( 0, 0, 0, 0, 0, 0 ) },
-  'Dropped D' :   { "t" : ( "E", "B", "G", "D", "A", "D" ), "f" : ( 0, 0, 0, 0, 0, 0 ) },
-  'Bass' :        { "t" : ( "G", "D", "A", "E" ),           "f" : ( 0, 0, 0, 0 ) },
-  '5StringBass' : { "t" : ( "G", "D", "A", "E", "B" ),      "f" : ( 0, 0, 0, 0, 0 ) },
-  'Uke' :         { "t" : ( "A", "E", "C", "G" ),           "f" : ( 0, 0, 0, 0 ) },
-  'Stick' :       { "t" : ( "D", "A", "E", "B", "F#", "C", "G", "D", "A", "E" ), "f" : ( 0, 0, 0, 0, 0, 0, 0, 0, 0, 0 ) }, # Classic tuning
-  'Stick-4ths':   { "t" : ("C", "G", "D", "A", "E", "B", "E", "A", "D", "G", "C", "F" ), "f" : ( 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0 ) },
-  'Banjo' :       { "t" : ( "D", "B", "G", "D", "G" ),      "f" : ( 0, 0, 0, 0, 5 ) }
-  }
-
-# Pick the instruments you care about
-instruments = ( 'Guitar', 'Bass', 'Dropped D', 'Uke', 'Mandolin', 'Banjo', '5StringBass', 'Stick', 'Stick-4ths' )
-
-intervals = { "Normal" : ( 'R', 'b2', '2', 'b3', '3',  '4', 'b5', '5',  'b6',  '6', 'b7', '7' ),
-              "Extended" : ( 'R', 'b9', '9', 'b3', '3', '11', 'b5', '5', 'b13', '13', 'b7', '7' ),
-              "Lydian" : ( 'R', 'b2', '2', 'b3', '3',  '4', '#4', '5',  'b6',  '6', 'b7', '7' ) }
-
-# display with a #/b if that's how we'd display the major key.
-dispKeyList    = ( 'C', 'Db', 'D', 'Eb', 'E', 'F', 'F#', 'G', 'Ab', 'A', 'Bb', 'B' )
-keyListSharps  = ( 'C', 'C#', 'D', 'D#', 'E', 'F', 'F#', 'G', 'G#', 'A', 'A#', 'B' )
-keyListFlats   = ( 'C', 'Db', 'D', 'Eb', 'E', 'F', 'Gb', 'G', 'Ab', 'A', 'Bb', 'B' )
-bKeys          = ( 'F', 'Bb', 'Eb','Ab', 'Db' ) # keys to be displayed as having flats
-
-# spellingMap is a dictionary of names for the spelling and a tuple of intervals members.
-# if you add an entry, also add it to spellings tuple below.
-spellingMap = { "major" :     ( 'R',  '3',  '5' ),
-                "minor" :     ( 'R', 'b3',  '5' ),
-                "sus2" :      ( 'R',  '2',  '5' ),
-                "sus4" :      ( 'R',  '4',  '5' ),
-                "6" :         ( 'R',  '3',  '5',  '6' ),
-                "m6" :        ( 'R', 'b3',  '5',  '6' ),
-                "7" :         ( 'R',  '3',  '5', 'b7' ),
-                "m7" :        ( 'R', 'b3',  '5', 'b7' ),
-                "M7" :        ( 'R',  '3',  '5',  '7' ),
-                "9" :         ( 'R',  '3',  '5', 'b7',  '9' ),
-                "m9" :        ( 'R', 'b3',  '5', 'b7',  '9' ),
-                "M9" :        ( 'R',  '3',  '5',  '7',  '9' ),
-                "11" :        ( 'R',  '3',  '5', 'b7',  '9', '11' ),
-                "m11" :       ( 'R', 'b3',  '5', 'b7',  '9', '11' ),
-                "M11" :       ( 'R',  '3',  '5',  '7',  '9', '11' ),
-                "13" :        ( 'R',  '3',  '5', 'b7',  '9', '11', '13' ),
-                "m13" :       ( 'R', 'b3',  '5', 'b7',  '9', '11', '13' ),
-                "M13" :       ( 'R',  '3',  '5',  '7',  '9', '11', '13' ),
-                "dim" :       ( 'R', 'b3', 'b5',  '6' ),
-                "m7-5" :      ( 'R', 'b3', 'b5', 'b7' ),
-                "Ionian" :    ( 'R',  '2',  '3',  '4',  '5',  '6',  '7' ),
-                "Dorian" :    ( 'R',  '2', 'b3',  '4',  '5',  '6', 'b7' ),
-                "Phrygian" :  ( 'R', 'b2', 'b3',  '4',  '5', 'b6', 'b7' ),
-                "Lydian" :    ( 'R',  '2',  '3', '#4',  '5',  '6',  '7' ),
-                "Mixolydian" :( 'R',  '2',  '3',  '4',  '5',  '6', 'b7' ),
-                "Aeolian" :   ( 'R',  '2', 'b3',  '4',  '5', 'b6', 'b7' ),
-                "Locrian" :   ( 'R', 'b2', 'b3',  '4', 'b5', 'b6', 'b7' ),
-                "Melodic" :   ( 'R',  '2', 'b3',  '4',  '5',  '6',  '7' ),
-                "Harmonic" :  ( 'R',  '2', 'b3',  '4',  '5', 'b6',  '7' ),
-                "Altered" :   ( 'R', 'b2', 'b3',  '3', 'b5', 'b6', 'b7' ),
-                "Pent-Min" :  ( 'R', 'b3',  '4',  '5', 'b7' ),
-                "Pent-Maj" :  ( 'R',  '2',  '3',  '5',  '6' ),
-                "mBlues" :    ( 'R', 'b3',  '4', 'b5',  '5', 'b7' ),
-                "MBlues" :    ( 'R',  '2', 'b3',  '3',  '5',  '6' ),
-                }
-
-majHarmMap = { "I" :      ( 'R', '3', '5', '7' ),
-               "ii" :     ( '2', '4', '6', 'R' ),
-               "iii" :    ( '3', '5', '7', '2' ),
-               "IV" :     ( '4', '6', 'R', '3' ),
-               "V" :      ( '5', '7', '2', '4' ),
-               "vi" :     ( '6', 'R', '3', '5' ),
-               "viiDim" : ( '7', '2', '4', '6' ) }
-
-# Pick the spellings (keys in spellingMap above) you care about.
-spellings = ( 'major', 'minor', 'sus2', 'sus4', '7', 'm7', 'M7', '9', 'dim', 'm7-5', # chords
-              'Ionian', 'Dorian', 'Phrygian', 'Lydian', 'Mixolydian', 'Aeolian', 'Locrian', # modes of major scale
-              'Melodic', 'Harmonic', 'Altered', 'Pent-Min', 'Pent-Maj', 'mBlues', 'MBlues' # other scales
-              )
-
-extChords = ( '9', 'm9', 'M9', '11', 'm11', 'M11', '13', 'm13', 'M13' )
-extIntervals = ( '9', '11', '13' )
-minorSpellings = ( 'm', 'm7', 'm9', 'm11', 'm13', 'm-Key', 'Aeolian' )
-num_frets = 24
+from chordTheory import *
+from fretboard import fretboardArrays, fretboardLayout, fretPosition, staticShapes, cellStates, \
+                      HIDE_RAD, LEFT_BORDER, FRET_SPACING, STR_SPC
+from chordId import identify, frettedNotes, chordName
+from voicings import voicings
+from harmony import isScale, diatonicChords
+import frameTimer
 
 disFont = { 0 : ( "TkFixedFont", 18, "bold italic" ), 1 : ( "TkFixedFont", 14, "" ) }
 
 class runGui():
 
-  def showWithSharps( self, key, spelling ):
-    # return True if we should show this key/spelling as having sharps (vs flats)
-
-    def relMajor( key, off=3 ):
-      # input is a minor key, returns the relative major key
-      index = ( dispKeyList.index( key ) + off ) % 12
-      key = dispKeyList[ index ]
-      return key
-
-    if spelling in( 'mBlues', 'MBlues' ):  # Blues is always flats
-      return False
-
-    if spelling == "Dorian":
-      key = relMajor( key, 10 )
-    elif spelling == "Phrygian":
-      key = relMajor( key, 8 )
-    elif spelling == "Lydian":
-      key = relMajor( key, 7 )
-    elif spelling == "Mixolydian":
-      key = relMajor( key, 5 )
-    elif spelling == "Locrian":
-      key = relMajor( key, 1 )
-    elif spelling in minorSpellings:
-      key = relMajor( key )
-
-    return key not in bKeys
-
-  def calcNote( self, root, fret ):
-    rootNum = ( dispKeyList.index( root ) + fret ) % 12
-    return dispKeyList[ rootNum ]
-
-  def calcInterval( self, note, key ):
-    noteNum = dispKeyList.index( note ) + 12  # C = 12, C# = 13, etc
-    keyNum = dispKeyList.index( key )  # C = 0, C# = 1
-    intNum = ( noteNum - keyNum ) % 12  # (if C) C = 0, C# = 1
-    return intNum
-
-  def fretInfoGen( self, root, fret, fretOffset ):
-    '''
-    Generate a dictionary entry about the given fret.
-    root is the string's fretOffset fret note. Usually fret 0 (open).
-    fret is the fret number relative to a zero offset string note is the text of the note
-    '''
-    assert fret >= fretOffset, "Fret below fret offset."
-
-    fretInfo = { 'root' : root,
-                 'fret' : fret,
-                 'note' : self.calcNote( root, fret - fretOffset ) }
-    interval = self.calcInterval( fretInfo[ 'note' ], self.key )
-    OLinterval = self.calcInterval( fretInfo[ 'note' ], self.OLkey )
-
-    x = "Normal"
-    if self.spelling in extChords:
-      x = "Extended"
-    elif self.spelling == 'Lydian':
-      x = "Lydian"
-
-    fretInfo[ 'interval' ] = intervals[ x ][ interval ]
-    fretInfo[ 'inSpelling' ] = intervals[ x ][ interval ] in spellingMap[ self.spelling ]
-    fretInfo[ 'inOLSpelling' ] = intervals[ x ][ OLinterval ] in spellingMap[ self.OLspelling ]
-
-    # convert note for display
-    curKeyList = keyListSharps if self.showWithSharps( self.key, self.spelling ) else keyListFlats
-    fretInfo[ 'note' ] = curKeyList[ dispKeyList.index( fretInfo[ 'note' ] ) ]
-
-    return fretInfo
-
   def generateFretboard( self ):
-    '''
-    Returns a dictionary with everything we care about
-    strings are keyed by string number (1 - N) and contain a list of dictionaries for each fret
-    There are also some other 'global' kinda things.. numStrings, instrument, etc.
+    # Everything about the current fretboard as arrays, see fretboard.fretboardArrays()
+    return fretboardArrays( self.instrument, self.key, self.spelling, self.OLkey, self.OLspelling )
 
-    This could be removed. There is no reason to generate the fretboard in advance,
-    just generate frets on the fly while displaying.
+  def drawStatic( self, fretboard ):
+    '''
+    Draw the frets, inlays and strings, and create the items for every fret cell.
+    Only needed when the instrument changes, displayFretboards() just updates the cells.
     '''
-
-    strings = instrumentMap[ self.instrument ][ 't' ]
-
-    fretBoard = { 'numStrings' : len( strings ),
-                  'instrument' : self.instrument,
-                  'spelling'   : self.spelling,
-                  'fretOffset' : instrumentMap[ self.instrument ][ 'f' ] }
-
-    for string in range( 1, len( strings ) + 1 ):
-      stringList = []
-      rootNote = strings[ string - 1 ]
-      offset = instrumentMap[ self.instrument ][ 'f' ][ string - 1 ]
-
-      for fret in range( offset, num_frets + 1 ):
-        fretInfo = self.fretInfoGen( rootNote, fret, offset )
-        stringList.append( fretInfo )
-
-      fretBoard[ string ] = stringList
-
-    return fretBoard
-
-  def displayFretboards( self ):
-
-    fretboard = self.generateFretboard()
-    numStrings = fretboard[ 'numStrings' ]
-
-    LEFT_BORDER = 30
-    STR_SPC = 20
-    FRET_SPACING = 30
-    FRET_NUM_VERT_OFFSET = 20
-
-    FRET1_TOP = FRET_NUM_VERT_OFFSET + 20
-    FRET1_BOTTOM = FRET1_TOP + ( numStrings - 1 ) * STR_SPC
-
-    FRET2_TOP = FRET1_BOTTOM + 40
-    FRET2_BOTTOM = FRET2_TOP + ( numStrings - 1 ) * STR_SPC
-
-    STRING_LEFT = LEFT_BORDER + 10
-    STRING_RIGHT = STRING_LEFT + ( num_frets + 1 ) * FRET_SPACING
-
-    HIDE_RAD = 9 # Hide radius
-
     self.canvas.delete( ALL )
 
-    # Draw fret numbers and frets
-    for fret in range( 0, num_frets + 1 ):
-      xPos = LEFT_BORDER + FRET_SPACING + fret * FRET_SPACING
-
-      txt = str( fret )
-      self.canvas.create_text( xPos - STR_SPC / 2, FRET_NUM_VERT_OFFSET, text=txt, fill="black" ) # Fretboard numbering
+    for kind, coords, options in staticShapes( fretboard ):
+      getattr( self.canvas, 'create_' + kind )( *coords, **options )
+
+    l = fretboardLayout( fretboard[ 'numStrings' ], fretboard[ 'numFrets' ] )
+    self.cells = []
+    for stringNum in range( 0, fretboard[ 'numStrings' ] ):
+      row = []
+      for fret in range( 0, fretboard[ 'numFrets' ] + 1 ):
+        xPos, yPos = fretPosition( l, stringNum, fret )
+        xBot, yBot = fretPosition( l, stringNum, fret, bottom=True )
+        row.append( ( self.canvas.create_oval( xPos - HIDE_RAD, yPos - HIDE_RAD, xPos + HIDE_RAD, yPos + HIDE_RAD, state=HIDDEN ),
+                      self.canvas.create_text( xPos, yPos, fill="black", state=HIDDEN ),
+                      self.canvas.create_oval( xBot - 5, yBot - 5, xBot + 5, yBot + 5, fill="black", state=HIDDEN ), # Root
+                      self.canvas.create_oval( xBot - HIDE_RAD, yBot - HIDE_RAD, xBot + HIDE_RAD, yBot + HIDE_RAD,
+                                               fill="white", outline="black", state=HIDDEN ),
+                      self.canvas.create_text( xBot, yBot, fill="black", state=HIDDEN ) ) )
+      self.cells.append( row )
+
+    self.shownStates = [ [ ( None, None, None ) ] * len( row ) for row in self.cells ]
+    self.drawnInstrument = fretboard[ 'instrument' ]
+    self.layout = l
+
+    # One ring per string to mark fingered notes, moved to the fingered fret.
+    self.fingerRings = [ self.canvas.create_oval( 0, 0, 0, 0, outline="#080", width=3, state=HIDDEN )
+                         for _ in range( fretboard[ 'numStrings' ] ) ]
+    self.fingered = [ None ] * fretboard[ 'numStrings' ]
+    self.showFingering()
+
+  def updateCell( self, items, old, new ):
+    topOval, topText, rootDot, botOval, botText = items
+    fill, note, interval = new
+
+    if ( fill, note ) != old[ 0 : 2 ]:
+      self.canvas.itemconfigure( topOval, fill=fill or "", state=NORMAL if fill else HIDDEN )
+      self.canvas.itemconfigure( topText, text=note or "", state=NORMAL if fill else HIDDEN )
+
+    if interval != old[ 2 ]:
+      self.canvas.itemconfigure( rootDot, state=NORMAL if interval == 'R' else HIDDEN )
+      other = interval and interval != 'R'
+      self.canvas.itemconfigure( botOval, state=NORMAL if other else HIDDEN )
+      self.canvas.itemconfigure( botText, text=interval or "", state=NORMAL if other else HIDDEN )
 
-      w = 1 if fret else 4
-      if fret == 12:
-        w = 2
-      self.canvas.create_rectangle( xPos, FRET1_TOP, xPos + w + 1, FRET1_BOTTOM, fill="black" )
-      self.canvas.create_rectangle( xPos, FRET2_TOP, xPos + w + 1, FRET2_BOTTOM, fill="black" )
-
-    for fretInd in( 3, 5, 7, 9, 12, 15, 17 ):
-      xPos = LEFT_BORDER + FRET_SPACING / 2 + fretInd * FRET_SPACING
-
-      if fretInd == 12:
-        yPos = ( FRET1_TOP + FRET1_BOTTOM ) / 3 # put 1/3 from top / bottom
-        self.canvas.create_oval( xPos - 4, yPos - 4, xPos + 4, yPos + 4,fill="black" )
-        yPos = ( FRET1_TOP + FRET1_BOTTOM ) * 2/3
-        self.canvas.create_oval( xPos - 4, yPos - 4, xPos + 4, yPos + 4,fill="black" )
+  def displayFretboards( self ):
+    timer = self.timer
+
+    with timer.phase( "generate" ):
+      fretboard = self.generateFretboard()
+
+    if self.drawnInstrument != self.instrument:
+      with timer.phase( "create" ):
+        self.drawStatic( fretboard )
+
+    # Only touch the cells that changed
+    with timer.phase( "cells" ):
+      updated = 0
+      for stringNum, row in enumerate( cellStates( fretboard, self.overlay ) ):
+        shownRow = self.shownStates[ stringNum ]
+        for fret, state in enumerate( row ):
+          if state != shownRow[ fret ]:
+            self.updateCell( self.cells[ stringNum ][ fret ], shownRow[ fret ], state )
+            shownRow[ fret ] = state
+            updated += 1
+
+    if timer.enabled:
+      # Tk does the drawing when idle, do it now so it can be timed.
+      with timer.phase( "idle" ):
+        self.canvas.update_idletasks()
+      timer.count( "updated", updated )
+      timer.count( "items", len( self.canvas.find_all() ) )
+      timer.endFrame( self.instrument )
+
+  def showFingering( self ):
+    # Draw the fingered notes and list the chords they could be.
+    for stringNum, fret in enumerate( self.fingered ):
+      if fret is None:
+        self.canvas.itemconfigure( self.fingerRings[ stringNum ], state=HIDDEN )
       else:
-        yPos = ( FRET1_TOP + FRET1_BOTTOM ) / 2 # put in the middle
-        self.canvas.create_oval( xPos - 4, yPos - 4, xPos + 4, yPos + 4,fill="black" )
-
-    # Draw strings
-    for s in range( 0, numStrings ):
-      self.canvas.create_text( STRING_LEFT - 20, FRET1_TOP + s * STR_SPC, text=fretboard[ s + 1 ][ 0 ][ 'root'], fill="black" )
-      self.canvas.create_text( STRING_LEFT - 20, FRET2_TOP + s * STR_SPC, text=fretboard[ s + 1 ][ 0 ][ 'root'], fill="black" )
-      self.canvas.create_line( STRING_LEFT,  FRET1_TOP + s * STR_SPC, STRING_RIGHT, FRET1_TOP + s * STR_SPC, fill="black" )
-      self.canvas.create_line( STRING_LEFT,  FRET2_TOP + s * STR_SPC, STRING_RIGHT, FRET2_TOP + s * STR_SPC, fill="black" )
-
-    # Populate individual frets
-    for stringNum in range( 0, numStrings ):
-      string = fretboard[ stringNum + 1 ]
-      for fret in string:
-        if fret[ 'interval' ] in extIntervals and stringNum > ( numStrings / 2 ):
-          continue # Don't display ext intervals on bass strings
-
-        xPos = LEFT_BORDER + FRET_SPACING / 2 + fret[ 'fret' ] * FRET_SPACING
-        yPos = FRET1_TOP + stringNum * STR_SPC
-
-        fill = None
-        if self.overlay:
-          if fret[ 'inSpelling' ] and fret[ 'inOLSpelling' ]:
-            fill="#8ff" # blue-green if in both
-          else:
-            if fret[ 'inSpelling' ]:
-              fill="#f88" # red-ish
-            elif fret[ 'inOLSpelling' ]:
-              fill="#88f" # blue-ish
-        elif fret[ 'inSpelling' ]:
-          fill="#f88"
-
-        if fill:
-          self.canvas.create_oval( xPos - HIDE_RAD, yPos - HIDE_RAD, xPos + HIDE_RAD, yPos + HIDE_RAD, fill=fill )
-          self.canvas.create_text( xPos, yPos, text=fret[ 'note' ], fill="black" )
-
-        # Bottom fretboard is just Chord 1's intervals.
-        if fret[ 'inSpelling' ]:
-          yPos = FRET2_TOP + stringNum * STR_SPC
-          if fret[ 'interval' ] == 'R':
-            self.canvas.create_oval( xPos - 5, yPos - 5, xPos + 5, yPos + 5, fill="black" )
-          else:
-            self.canvas.create_oval( xPos - HIDE_RAD, yPos - HIDE_RAD, xPos + HIDE_RAD, yPos + HIDE_RAD,
-                                     fill="white", outline="black" ) # erase
-            self.canvas.create_text( xPos, yPos, text=fret[ 'interval' ], fill="black" )
+        xPos, yPos = fretPosition( self.layout, stringNum, fret )
+        r = HIDE_RAD + 2
+        self.canvas.coords( self.fingerRings[ stringNum ], xPos - r, yPos - r, xPos + r, yPos + r )
+        self.canvas.itemconfigure( self.fingerRings[ stringNum ], state=NORMAL )
+
+    notes, bass = frettedNotes( self.instrument, self.fingered )
+    if not notes:
+      self.chordVar.set( "Click the top fretboard to finger notes, right click to clear." )
+      return
+
+    names = [ chordName( root, spelling, bass ) for _, root, spelling, _, _ in identify( notes, bass )[ : 5 ] ]
+    self.chordVar.set( "   ".join( names ) if names else "No match." )
+
+  def fingerClick( self, event ):
+    # Toggle the fingered fret under the mouse. One note per string.
+    stringNum = int( round( float( event.y - self.layout[ 'FRET1_TOP' ] ) / STR_SPC ) )
+    fret = int( ( event.x - LEFT_BORDER ) // FRET_SPACING )
+    if stringNum < 0 or stringNum >= len( self.fingered ) or fret < 0 or fret > num_frets:
+      return
+    if fret < instrumentMap[ self.instrument ][ 'f' ][ stringNum ]:
+      return
+
+    self.fingered[ stringNum ] = None if self.fingered[ stringNum ] == fret else fret
+    self.showFingering()
+
+  def fingerClear( self, event ):
+    self.fingered = [ None ] * len( self.fingered )
+    self.showFingering()
+
+  def nextVoicing( self ):
+    # Finger the next voicing of key/spelling, starting over after the last one.
+    chord = ( self.instrument, self.key, self.spelling )
+    if self.voicingChord != chord:
+      self.voicingChord = chord
+      self.voicingGen = voicings( *chord )
+
+    v = next( self.voicingGen, None )
+    if v is None:
+      self.voicingGen = voicings( *chord ) # cached now
+      v = next( self.voicingGen, None )
+    if v is None:
+      self.chordVar.set( "No voicings." )
+      return
+
+    self.fingered = list( v )
+    self.showFingering()
+
+  def updateHarmonyMenu( self ):
+    # The diatonic chords of key/spelling, triads then sevenths. Picking one shows it in the overlay.
+    menu = self.harmonyMenu[ "menu" ]
+    menu.delete( 0, END )
+    if not isScale( self.spelling ):
+      self.harmonyMenu[ "state" ] = "disable"
+      return
+    self.harmonyMenu[ "state" ] = "normal"
+
+    keyList = displayKeyList( self.key, self.spelling )
+    shown = set()
+    for sevenths in( False, True ):
+      if sevenths:
+        menu.add_separator()
+      for num, root, spelling, mask in diatonicChords( self.key, self.spelling, sevenths ):
+        if ( root, mask ) in shown:
+          continue
+        shown.add( ( root, mask ) )
+        if spelling is None: # not in spellingMap, list its notes
+          notes = [ keyList[ ( n + root ) % 12 ] for n in maskNotes( rotateMask( mask, -root ) ) ]
+          menu.add_command( label="%-5s %s" % ( num, " ".join( notes ) ), state="disable" )
+        else:
+          menu.add_command( label="%-5s %s %s" % ( num, keyList[ root ], spelling ),
+                            command=partial( self.harmonyChange, root, spelling ) )
+
+  def harmonyChange( self, root, spelling ):
+    self.OLkeysVar.set( dispKeyList[ root ] )
+    self.OLspellingVar.set( spelling )
+    if not self.overlay:
+      self.overlayToggle()
 
   def instrumentChange( self, *args ):
     self.instrument = self.inst.get()
@@ -297,6 +201,7 @@ class runGui():
 
   def keyChange( self, *args ):
     self.key = self.keysVar.get()
+    self.updateHarmonyMenu()
     self.displayFretboards( )
 
   def OLkeyChange( self, *args ):
@@ -305,6 +210,7 @@ class runGui():
 
   def spellingChange( self, *args ):
     self.spelling = self.spellingVar.get()
+    self.updateHarmonyMenu()
     self.displayFretboards( )
 
   def OLspellingChange( self, *args ):
@@ -366,6 +272,18 @@ class runGui():
     self.spellingMenu.config( fg="BLACK" )
     self.spellingMenu.pack( side=LEFT )
 
+    self.harmonyMenu = Menubutton( self.mainFrame, text="Harmony", relief=RAISED, fg="BLACK" )
+    self.harmonyMenu[ "menu" ] = Menu( self.harmonyMenu, tearoff=0 )
+    self.harmonyMenu.pack( side=LEFT )
+    self.updateHarmonyMenu()
+
+    self.voicingButton = Button( self.mainFrame,
+                                 text="V",
+                                 font=disFont[ 1 ],
+                                 command=self.nextVoicing,
+                                 fg = "BLACK")
+    self.voicingButton.pack( side=LEFT )
+
     self.overLayButton = Button( self.mainFrame,
                                  textvariable=self.overlayTxt,
                                  font=disFont[ 1 ],
@@ -391,6 +309,9 @@ class runGui():
     self.OLkey = dispKeyList[ 0 ] # Overlay
     self.OLspelling = spellings[ 0 ]
     self.overlay = False
+    self.drawnInstrument = None
+    self.voicingChord = None
+    self.timer = frameTimer.fromArgs()
 
     root = Tk()
     root.title( "Chords" )
@@ -401,13 +322,20 @@ class runGui():
     self.initMainframe()
     self.displayMainframe()
 
+    self.chordVar = StringVar()
+    self.chordLabel = Label( root, textvariable=self.chordVar, font=disFont[ 1 ], fg="BLACK" )
+    self.chordLabel.pack( side=TOP )
+
     self.fretboardFrame = Frame( root )
     self.fretboardFrame.pack( side=TOP )
 
     self.canvas = Canvas( self.fretboardFrame, width=800, height=600 )
     self.canvas.pack()
+    self.canvas.bind( "<Button-1>", self.fingerClick )
+    self.canvas.bind( "<Button-3>", self.fingerClear )
     self.displayFretboards()
 
     root.mainloop()
+    self.timer.writeSummary()
 
 runGui()
\ No newline at end of file
@@ -0,0 +1,108 @@
+'''
+Redraw timing for chords.py.
+
+Off unless $CHORDS_PROFILE names a log file or chords.py is run with --profile [logfile]. Each redraw is a
+frame, timed in phases ( fretboard generation, canvas item creation, cell updates, Tk idle work ) along with
+counts like the number of canvas items. Every few frames the p50 / p95 of the last window of frames is
+appended to the log.
+'''
+
+import os, sys, time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+DEFAULT_LOG = "chordsProfile.log"
+WINDOW = 200    # frames in the rolling summary
+LOG_EVERY = 20  # frames between summaries
+
+def percentile( values, p ):
+  # Nearest rank percentile of values, p in 0..100.
+  values = sorted( values )
+  if not values:
+    return 0
+  return values[ min( len( values ) - 1, int( len( values ) * p / 100.0 ) ) ]
+
+class frameTimer( object ):
+  enabled = True
+
+  def __init__( self, logName, window=WINDOW, logEvery=LOG_EVERY ):
+    self.logName = logName
+    self.window = window
+    self.logEvery = logEvery
+    self.samples = OrderedDict() # phase / count name -> last window of values
+    self.current = {}
+    self.label = ""
+    self.frames = 0
+
+  def _add( self, name, value ):
+    self.current[ name ] = self.current.get( name, 0 ) + value
+
+  @contextmanager
+  def phase( self, name ):
+    start = time.time()
+    try:
+      yield
+    finally:
+      self._add( name, ( time.time() - start ) * 1000.0 )
+
+  def count( self, name, n=1 ):
+    self._add( '#' + name, n )
+
+  def endFrame( self, label="" ):
+    # Record the frame, label says what was drawn ( the instrument )
+    for name, value in self.current.items():
+      if name not in self.samples:
+        self.samples[ name ] = deque( maxlen=self.window )
+      self.samples[ name ].append( value )
+    self.current = {}
+    self.label = label
+    self.frames += 1
+    if self.frames % self.logEvery == 0:
+      self.writeSummary()
+
+  def summary( self ):
+    fields = [ time.strftime( "%Y-%m-%d %H:%M:%S" ), "frames=%d" % self.frames, self.label ]
+    for name, values in self.samples.items():
+      if name.startswith( '#' ):
+        fields.append( "%s p50=%d p95=%d" % ( name[ 1 : ], percentile( values, 50 ), percentile( values, 95 ) ) )
+      else:
+        fields.append( "%s p50=%.2fms p95=%.2fms" % ( name, percentile( values, 50 ), percentile( values, 95 ) ) )
+    return "  ".join( fields )
+
+  def writeSummary( self ):
+    if not self.frames:
+      return
+    try:
+      with open( self.logName, "a" ) as f:
+        f.write( self.summary() + "\n" )
+    except ( IOError, OSError ):
+      pass # profiling shouldn't break the GUI
+
+class nullTimer( object ):
+  # Stands in for frameTimer when profiling is off.
+  enabled = False
+
+  @contextmanager
+  def phase( self, name ):
+    yield
+
+  def count( self, name, n=1 ):
+    pass
+
+  def endFrame( self, label="" ):
+    pass
+
+  def writeSummary( self ):
+    pass
+
+def fromArgs( argv=None ):
+  # A frameTimer if profiling was asked for on the command line or in the environment, else a nullTimer.
+  argv = sys.argv if argv is None else argv
+  logName = os.environ.get( 'CHORDS_PROFILE' )
+  if '--profile' in argv:
+    ix = argv.index( '--profile' )
+    if ix + 1 < len( argv ) and not argv[ ix + 1 ].startswith( '-' ):
+      logName = argv[ ix + 1 ]
+    else:
+      logName = logName or DEFAULT_LOG
+  return frameTimer( logName ) if logName else nullTimer()
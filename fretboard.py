@@ -0,0 +1,209 @@
+'''
+Headless fretboard generation.
+
+fretboardArrays() describes a whole fretboard as numpy arrays shaped strings x frets, row 0 is string 1.
+Used by chords.py and anything else that draws fretboards, no Tk needed.
+
+staticShapes() and noteShapes() turn a fretboard into drawing primitives, ( kind, coords, options ) tuples
+where kind is a Tk canvas create_ method suffix and options are canvas item options, so the Tk canvas and
+the file exporters draw the same picture.
+'''
+
+import numpy as np
+from chordTheory import *
+
+# Layout, in canvas pixels.
+LEFT_BORDER = 30
+STR_SPC = 20
+FRET_SPACING = 30
+FRET_NUM_VERT_OFFSET = 20
+HIDE_RAD = 9 # Hide radius
+INLAYS = ( 3, 5, 7, 9, 12, 15, 17 )
+
+_maskBitsCache = {}
+
+def maskBits( mask ):
+  # 12 entry boolean array, True for each pitch class in mask.
+  bits = _maskBitsCache.get( mask )
+  if bits is None:
+    bits = np.array( [ ( mask >> n ) & 1 for n in range( 12 ) ], dtype=bool )
+    _maskBitsCache[ mask ] = bits
+  return bits
+
+def fretboardArrays( instrument, key, spelling, OLkey=None, OLspelling=None, numFrets=num_frets ):
+  '''
+  Returns a dictionary with everything we care about.
+  The arrays are indexed [ string - 1, fret ]:
+
+  note         pitch class of the fret ( C = 0 ), -1 if the fret doesn't exist
+  interval     semitones above key, -1 if the fret doesn't exist
+  valid        False below a string's fret offset ( banjo 5th string )
+  inSpelling   in key/spelling
+  inOLSpelling in OLkey/OLspelling, all False if there is no overlay
+  isExt        interval is displayed as an extension ( 9, 11, 13 )
+
+  Index keyList with note and intervalNames with interval to get display text.
+  '''
+  tuning = instrumentMap[ instrument ][ 't' ]
+  fretOffset = instrumentMap[ instrument ][ 'f' ]
+
+  roots = np.array( [ noteIndex[ n ] for n in tuning ] )[ :, None ]
+  offsets = np.array( fretOffset )[ :, None ]
+  frets = np.arange( numFrets + 1 )[ None, : ]
+
+  valid = frets >= offsets
+  note = ( roots + frets - offsets ) % 12
+  interval = ( note - noteIndex[ key ] ) % 12
+
+  names = intervalNames[ spelling ]
+  isExt = np.array( [ n in extIntervals for n in names ], dtype=bool )[ interval ]
+
+  inSpelling = maskBits( spellingMask( key, spelling ) )[ note ] & valid
+  if OLspelling:
+    inOLSpelling = maskBits( spellingMask( OLkey, OLspelling ) )[ note ] & valid
+  else:
+    inOLSpelling = np.zeros( valid.shape, dtype=bool )
+
+  return { 'numStrings'    : len( tuning ),
+           'numFrets'      : numFrets,
+           'instrument'    : instrument,
+           'key'           : key,
+           'spelling'      : spelling,
+           'tuning'        : tuning,
+           'fretOffset'    : fretOffset,
+           'keyList'       : displayKeyList( key, spelling ),
+           'intervalNames' : names,
+           'valid'         : valid,
+           'note'          : np.where( valid, note, -1 ),
+           'interval'      : np.where( valid, interval, -1 ),
+           'inSpelling'    : inSpelling,
+           'inOLSpelling'  : inOLSpelling,
+           'isExt'         : isExt & valid }
+
+def fretboardLayout( numStrings, numFrets=num_frets ):
+  # Positions of the two fretboards for an instrument with numStrings strings.
+  layout = { 'FRET1_TOP' : FRET_NUM_VERT_OFFSET + 20 }
+  layout[ 'FRET1_BOTTOM' ] = layout[ 'FRET1_TOP' ] + ( numStrings - 1 ) * STR_SPC
+  layout[ 'FRET2_TOP' ] = layout[ 'FRET1_BOTTOM' ] + 40
+  layout[ 'FRET2_BOTTOM' ] = layout[ 'FRET2_TOP' ] + ( numStrings - 1 ) * STR_SPC
+  layout[ 'STRING_LEFT' ] = LEFT_BORDER + 10
+  layout[ 'STRING_RIGHT' ] = layout[ 'STRING_LEFT' ] + ( numFrets + 1 ) * FRET_SPACING
+  layout[ 'WIDTH' ] = layout[ 'STRING_RIGHT' ] + LEFT_BORDER
+  layout[ 'HEIGHT' ] = layout[ 'FRET2_BOTTOM' ] + FRET_NUM_VERT_OFFSET
+  return layout
+
+def fretPosition( layout, stringNum, fret, bottom=False ):
+  # Center of a fret cell. stringNum is 0 based.
+  xPos = LEFT_BORDER + FRET_SPACING / 2 + fret * FRET_SPACING
+  yPos = ( layout[ 'FRET2_TOP' ] if bottom else layout[ 'FRET1_TOP' ] ) + stringNum * STR_SPC
+  return xPos, yPos
+
+def staticShapes( fretboard ):
+  # Fret numbers, frets, inlays and strings. Only depends on the instrument.
+  numStrings = fretboard[ 'numStrings' ]
+  numFrets = fretboard[ 'numFrets' ]
+  l = fretboardLayout( numStrings, numFrets )
+  shapes = []
+
+  # Draw fret numbers and frets
+  for fret in range( 0, numFrets + 1 ):
+    xPos = LEFT_BORDER + FRET_SPACING + fret * FRET_SPACING
+
+    txt = str( fret )
+    shapes.append( ( 'text', ( xPos - STR_SPC / 2, FRET_NUM_VERT_OFFSET ), { 'text' : txt, 'fill' : "black" } ) ) # Fretboard numbering
+
+    w = 1 if fret else 4
+    if fret == 12:
+      w = 2
+    shapes.append( ( 'rectangle', ( xPos, l[ 'FRET1_TOP' ], xPos + w + 1, l[ 'FRET1_BOTTOM' ] ), { 'fill' : "black" } ) )
+    shapes.append( ( 'rectangle', ( xPos, l[ 'FRET2_TOP' ], xPos + w + 1, l[ 'FRET2_BOTTOM' ] ), { 'fill' : "black" } ) )
+
+  for fretInd in INLAYS:
+    xPos = LEFT_BORDER + FRET_SPACING / 2 + fretInd * FRET_SPACING
+
+    if fretInd == 12:
+      yPositions = ( ( l[ 'FRET1_TOP' ] + l[ 'FRET1_BOTTOM' ] ) / 3, # put 1/3 from top / bottom
+                     ( l[ 'FRET1_TOP' ] + l[ 'FRET1_BOTTOM' ] ) * 2/3 )
+    else:
+      yPositions = ( ( l[ 'FRET1_TOP' ] + l[ 'FRET1_BOTTOM' ] ) / 2, ) # put in the middle
+    for yPos in yPositions:
+      shapes.append( ( 'oval', ( xPos - 4, yPos - 4, xPos + 4, yPos + 4 ), { 'fill' : "black" } ) )
+
+  # Draw strings
+  for s in range( 0, numStrings ):
+    for top in( l[ 'FRET1_TOP' ], l[ 'FRET2_TOP' ] ):
+      shapes.append( ( 'text', ( l[ 'STRING_LEFT' ] - 20, top + s * STR_SPC ), { 'text' : fretboard[ 'tuning' ][ s ], 'fill' : "black" } ) )
+    for top in( l[ 'FRET1_TOP' ], l[ 'FRET2_TOP' ] ):
+      shapes.append( ( 'line', ( l[ 'STRING_LEFT' ], top + s * STR_SPC, l[ 'STRING_RIGHT' ], top + s * STR_SPC ), { 'fill' : "black" } ) )
+
+  return shapes
+
+def cellFill( inSpelling, inOLSpelling, overlay ):
+  # Color of a note on the top fretboard, None if it isn't shown.
+  if overlay:
+    if inSpelling and inOLSpelling:
+      return "#8ff" # blue-green if in both
+    if inSpelling:
+      return "#f88" # red-ish
+    if inOLSpelling:
+      return "#88f" # blue-ish
+  elif inSpelling:
+    return "#f88"
+  return None
+
+def cellStates( fretboard, overlay ):
+  '''
+  What to show in each fret cell, indexed [ string - 1 ][ fret ].
+  Each is ( fill, note, interval ): the top fretboard's color and note name ( fill is None if the note isn't
+  shown ) and Chord 1's interval for the bottom fretboard ( None if it isn't in the spelling ).
+  '''
+  numStrings = fretboard[ 'numStrings' ]
+  keyList = fretboard[ 'keyList' ]
+  names = fretboard[ 'intervalNames' ]
+  notes = fretboard[ 'note' ].tolist()
+  intervalNums = fretboard[ 'interval' ].tolist()
+  inSpelling = fretboard[ 'inSpelling' ].tolist()
+  inOLSpelling = fretboard[ 'inOLSpelling' ].tolist()
+  valid = fretboard[ 'valid' ].tolist()
+  isExt = fretboard[ 'isExt' ].tolist()
+  hidden = ( None, None, None )
+  states = []
+
+  for stringNum in range( 0, numStrings ):
+    row = []
+    for fret in range( 0, fretboard[ 'numFrets' ] + 1 ):
+      if not valid[ stringNum ][ fret ] or ( isExt[ stringNum ][ fret ] and stringNum > ( numStrings / 2 ) ):
+        row.append( hidden ) # Don't display ext intervals on bass strings
+        continue
+
+      fill = cellFill( inSpelling[ stringNum ][ fret ], inOLSpelling[ stringNum ][ fret ], overlay )
+      row.append( ( fill,
+                    keyList[ notes[ stringNum ][ fret ] ] if fill else None,
+                    names[ intervalNums[ stringNum ][ fret ] ] if inSpelling[ stringNum ][ fret ] else None ) )
+    states.append( row )
+
+  return states
+
+def noteShapes( fretboard, overlay ):
+  # The notes on the top fretboard and Chord 1's intervals on the bottom one.
+  l = fretboardLayout( fretboard[ 'numStrings' ], fretboard[ 'numFrets' ] )
+  shapes = []
+
+  for stringNum, row in enumerate( cellStates( fretboard, overlay ) ):
+    for fret, ( fill, note, interval ) in enumerate( row ):
+      if fill:
+        xPos, yPos = fretPosition( l, stringNum, fret )
+        shapes.append( ( 'oval', ( xPos - HIDE_RAD, yPos - HIDE_RAD, xPos + HIDE_RAD, yPos + HIDE_RAD ), { 'fill' : fill } ) )
+        shapes.append( ( 'text', ( xPos, yPos ), { 'text' : note, 'fill' : "black" } ) )
+
+      # Bottom fretboard is just Chord 1's intervals.
+      if interval:
+        xPos, yPos = fretPosition( l, stringNum, fret, bottom=True )
+        if interval == 'R':
+          shapes.append( ( 'oval', ( xPos - 5, yPos - 5, xPos + 5, yPos + 5 ), { 'fill' : "black" } ) )
+        else:
+          shapes.append( ( 'oval', ( xPos - HIDE_RAD, yPos - HIDE_RAD, xPos + HIDE_RAD, yPos + HIDE_RAD ),
+                           { 'fill' : "white", 'outline' : "black" } ) ) # erase
+          shapes.append( ( 'text', ( xPos, yPos ), { 'text' : interval, 'fill' : "black" } ) )
+
+  return shapes
@@ -0,0 +1,83 @@
+'''
+Diatonic harmony for every scale in spellingMap, majHarmMap generalized.
+
+Chords are built by stacking every other scale note on each degree and named by looking the result up in
+spellingMap. The stacking only depends on the scale, so it is done once per scale relative to C and each
+key is a transposition of that, cached, so listing a progression is a table lookup.
+'''
+
+import chordTheory
+from chordTheory import *
+
+NUMERALS = ( 'I', 'bII', 'II', 'bIII', 'III', 'IV', 'bV', 'V', 'bVI', 'VI', 'bVII', 'VII' )
+
+_relative = {} # ( scale, sevenths ) -> list of ( degree semitones, chord mask relative to its root, spelling )
+_byKey = {}    # ( key, scale, sevenths ) -> list of chords
+_version = None
+
+def isScale( spelling ):
+  # Scales have 5 or more notes, extended chords don't count.
+  return len( spellingMap[ spelling ] ) >= 5 and spelling not in extChords
+
+def scales():
+  return [ s for s in spellingMap if isScale( s ) ]
+
+def _chordSpellings():
+  # root position mask -> spelling, first in spellingMap wins.
+  names = {}
+  for spelling in spellingMap:
+    if not isScale( spelling ):
+      names.setdefault( spellingMasks[ spelling ][ 0 ], spelling )
+  return names
+
+def _checkVersion():
+  global _version
+  if _version != chordTheory.tablesVersion:
+    _relative.clear()
+    _byKey.clear()
+    _version = chordTheory.tablesVersion
+
+def _relativeChords( scale, sevenths ):
+  _checkVersion()
+  key = ( scale, sevenths )
+  chords = _relative.get( key )
+  if chords is None:
+    names = _chordSpellings()
+    degrees = maskNotes( spellingMasks[ scale ][ 0 ] )
+    chords = []
+    for ix, degree in enumerate( degrees ):
+      mask = 0
+      for step in( ( 0, 2, 4, 6 ) if sevenths else ( 0, 2, 4 ) ):
+        mask |= 1 << ( degrees[ ( ix + step ) % len( degrees ) ] - degree ) % 12
+      chords.append( ( degree, mask, names.get( mask ) ) )
+    _relative[ key ] = chords
+  return chords
+
+def numeral( degree, mask ):
+  # Roman numeral of a chord on degree, lower case if it has a minor third and no major third.
+  n = NUMERALS[ degree ]
+  if inMask( mask, 3 ) and not inMask( mask, 4 ):
+    n = n.lower()
+  return n
+
+def diatonicChords( key, scale, sevenths=False ):
+  '''
+  The chords of scale in key, one per scale degree.
+  Each is ( numeral, root pitch class, spelling, mask ). spelling is None if the chord isn't in
+  spellingMap, mask has the chord's pitch classes.
+  '''
+  if not isinstance( key, int ):
+    key = noteIndex[ key ]
+  _checkVersion()
+  cacheKey = ( key, scale, sevenths )
+  chords = _byKey.get( cacheKey )
+  if chords is None:
+    chords = [ ( numeral( degree, mask ), ( key + degree ) % 12, spelling, rotateMask( mask, key + degree ) )
+               for degree, mask, spelling in _relativeChords( scale, sevenths ) ]
+    _byKey[ cacheKey ] = chords
+  return chords
+
+def progression( key, scale, numerals, sevenths=False ):
+  # The chords for a list of numerals, e.g. ( 'ii', 'V', 'I' ). Numerals not in the scale are None.
+  byNumeral = dict( ( c[ 0 ], c ) for c in diatonicChords( key, scale, sevenths ) )
+  return [ byNumeral.get( n ) for n in numerals ]
@@ -1,6 +1,7 @@
 #!/usr/bin/python
 from __future__ import print_function
 import os, sys, glob, copy, json
+import screen
 
 class bcolors:
   BLUE      = '\033[94m'
@@ -50,17 +51,18 @@ entryList = [
 
 statusString = None
 fileName = DEFAULT_FILE_NAME
+display = screen.screen()
 
 def displayUI():
   global statusString
 
-  os.system( 'clear' )
-  print( "Metadata generator" )
-  print( "File: " + fileName )
-  print( "----------------------------" )
+  lines = [ "Metadata generator" ]
+  lines.append( "File: " + fileName )
+  lines.append( "----------------------------" )
 
   if len( entryList ) == 0:
-    print( "No elements." )
+    lines.append( "No elements." )
+    display.draw( lines )
     return
 
   if not cursorElement:
@@ -75,30 +77,32 @@ def displayUI():
       break
 
     if ix == cursorElement and cursorParam == None:
-      print( bcolors.REVERSE + entryList[ ix ].name + bcolors.ENDC )
+      lines.append( bcolors.REVERSE + entryList[ ix ].name + bcolors.ENDC )
     else:
-      print( entryList[ ix ].name )
+      lines.append( entryList[ ix ].name )
 
     for elemIx in range( 0, len( entryList[ ix ].elements ) ):
       if cursorElement == ix and cursorParam == elemIx:
         if cursorPos == 0:
-          print( " " + bcolors.REVERSE +
-                 entryList[ ix ].elements[ elemIx ].name + bcolors.ENDC + ":" +
-                 entryList[ ix ].elements[ elemIx ].value )
+          lines.append( " " + bcolors.REVERSE +
+                        entryList[ ix ].elements[ elemIx ].name + bcolors.ENDC + ":" +
+                        entryList[ ix ].elements[ elemIx ].value )
         else:
-          print( " " + entryList[ ix ].elements[ elemIx ].name + ":" +
-                 bcolors.REVERSE + entryList[ ix ].elements[ elemIx ].value + bcolors.ENDC )
+          lines.append( " " + entryList[ ix ].elements[ elemIx ].name + ":" +
+                        bcolors.REVERSE + entryList[ ix ].elements[ elemIx ].value + bcolors.ENDC )
       else:
-        print( " " + entryList[ ix ].elements[ elemIx ].name + ":" +
-                     entryList[ ix ].elements[ elemIx ].value )
+        lines.append( " " + entryList[ ix ].elements[ elemIx ].name + ":" +
+                      entryList[ ix ].elements[ elemIx ].value )
 
-  print( "----------------------------" )
-  print( str( len( entryList ) ) + " entries." )
+  lines.append( "----------------------------" )
+  lines.append( str( len( entryList ) ) + " entries." )
 
   if statusString:
-    print( "\n" + bcolors.WARNING + statusString + bcolors.ENDC )
+    lines.append( "\n" + bcolors.WARNING + statusString + bcolors.ENDC )
     statusString = None
 
+  display.draw( lines )
+
 def openJson():
   global statusString, fileName, entryList
 
@@ -113,8 +117,7 @@ def openJson():
 
   while True:
     selSong = None
-    os.system( 'clear' )
-    print( "Use arrow keys to select or exit.\n" )
+    lines = [ "Use arrow keys to select or exit.\n" ]
     index = 0
     for s in matchList:
       line = "  "
@@ -122,7 +125,8 @@ def openJson():
         line = "> "
       line += s[ 2 : ].split( "." )[ 0 ]
       index += 1
-      print( line )
+      lines.append( line )
+    display.draw( lines )
 
     c = getInput()
     if c == "LEFT" or c == "h":
@@ -252,6 +256,7 @@ while True:
         cursorElement -= 1
   elif ch == 'n':
     fileName = raw_input( 'Enter file name:' )
+    display.invalidate()
     if fileName == "":
       fileName = DEFAULT_FILE_NAME
     else:
@@ -260,6 +265,7 @@ while True:
   elif ch == 'e': # Edit
     if cursorElement is not None:
       newVal = raw_input( 'Enter new value:' )
+      display.invalidate()
 
       if cursorParam == None:
 
@@ -307,6 +313,7 @@ while True:
   elif ch == '/':
     found = False
     searchFor = raw_input( 'Search:' )
+    display.invalidate()
     if searchFor == "" and lastSearch is not None:
       searchFor = lastSearch
     else:
@@ -329,6 +336,7 @@ while True:
   elif ch == '?':
     print( helpString )
     foo = getInput()
+    display.invalidate()
   elif ch == 'q':
     exit()
 
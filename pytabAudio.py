@@ -0,0 +1,289 @@
+#!/usr/bin/python
+'''
+Songs as audio, for hearing what a tab sounds like.
+
+events() turns a song into noteEvents, in time order: the notes of every track at the pitch of the song's
+tuning, measures in playing order ( a repeat plays the measures since the last repeat again, once ). Notes
+ring until the next note on their string, at most MAX_RING seconds. Hammer ons and pull offs sound without
+a new pick attack, slides glide from the string's previous note.
+
+render() synthesizes the events with Karplus-Strong plucked strings, computed a whole note at a time with
+numpy, and mixes them a BLOCK at a time into a sink, anything with write( int16 samples ) and close().
+Only the notes sounding in a block are kept, so a long song streams to disk in the same memory as a short
+one. A note is synthesized ringing for MAX_RING and cut to its length as it's mixed, so each pitch is made
+once and kept in an LRU cache of at most TONE_CACHE bytes. wavSink writes a file, pipeSink plays through a command line player ( aplay / sox ).
+
+  python pytabAudio.py song.pytab [ -o song.wav ] [ -t tempo ] [ --play ]
+'''
+
+from __future__ import print_function
+import os, wave, subprocess
+from collections import deque, OrderedDict
+import numpy as np
+
+import pytabRender
+from pytabModel import *
+
+SAMPLE_RATE = 44100
+TEMPO = 240        # tab beats a minute, a beat is a column of the tab
+BLOCK = 16384      # samples mixed at a time
+MAX_RING = 2.0     # seconds a note rings if nothing stops it
+NOTE_GAIN = 0.25   # a note's peak, notes are summed then clipped
+LEGATO_GAIN = 0.5  # hammer ons and pull offs aren't picked, relative to NOTE_GAIN
+SLIDE_TIME = 0.06  # seconds a slide takes to reach its note
+DECAY = 0.996      # Karplus-Strong loop gain, per period
+FADE = 0.005       # seconds faded out at the end of a note so a cut note doesn't click
+TONE_CACHE = 32 << 20 # bytes of tones kept, songs repeat notes a lot
+
+class noteEvent( object ):
+  # A note, start and length in samples. fromPitch is the pitch a slide starts at, None if it isn't one.
+  __slots__ = ( 'start', 'length', 'pitch', 'noteType', 'fromPitch', 'track' )
+
+  def __init__( self, start, length, pitch, noteType=NOTE_NORMAL, fromPitch=None, track=1 ):
+    self.start = start
+    self.length = length
+    self.pitch = pitch
+    self.noteType = noteType
+    self.fromPitch = fromPitch
+    self.track = track
+
+def measureOrder( track ):
+  # Measure numbers in playing order. A repeat goes back to the measure after the previous repeat, once.
+  start = 1
+  taken = 0 # last repeat played
+  m = 1
+  while m <= track.count():
+    yield m
+    measure = track.get( m )
+    if measure is not None and measure.repeat:
+      if m > taken:
+        taken = m
+        m = start
+        continue
+      start = m + 1
+    m += 1
+
+def strikes( song, beatSamples ):
+  # ( start, track, string, pitch, noteType, previous pitch on the string ) of each note, in time order.
+  pitches = pytabRender.tuningPitches( song.tuningIndex )
+  tracks = song.get()
+  last = {} # ( track, string ) -> pitch
+  time = 0
+  for m in measureOrder( tracks[ 0 ] ):
+    tracks[ 0 ].view( m, m + 1 )
+    measures = [ track.get( m ) for track in tracks ]
+    for b in range( 1, tracks[ 0 ].beatCount( m ) + 1 ):
+      for t, measure in enumerate( measures, 1 ):
+        beat = measure.get( b ) if measure is not None else None
+        for note in beat.get() if beat else ():
+          if note is None:
+            continue
+          pitch = pitches[ note.string - 1 ] + note.fret
+          yield time, t, note.string, pitch, note.noteType, last.get( ( t, note.string ) )
+          last[ ( t, note.string ) ] = pitch
+      time += beatSamples
+
+def events( song, tempo=TEMPO, sampleRate=SAMPLE_RATE ):
+  '''
+  The noteEvents of song in start order. A note's length is only known at the next note on its string, so
+  notes wait in a queue until then or until they've rung MAX_RING, that's all the lookahead kept.
+  '''
+  beatSamples = max( 1, int( round( sampleRate * 60.0 / tempo ) ) )
+  maxRing = int( MAX_RING * sampleRate )
+  pending = deque() # noteEvents in start order, length None until known
+  ringing = {} # ( track, string ) -> its pending noteEvent
+
+  for start, t, string, pitch, noteType, previous in strikes( song, beatSamples ):
+    e = ringing.get( ( t, string ) )
+    if e is not None and e.length is None:
+      e.length = min( start - e.start, maxRing )
+    while pending and ( pending[ 0 ].length is not None or start - pending[ 0 ].start >= maxRing ):
+      e = pending.popleft()
+      if e.length is None:
+        e.length = maxRing
+      yield e
+
+    legato = noteType in ( NOTE_HAMMER, NOTE_PULLOFF, NOTE_SLIDE ) and previous is not None
+    e = noteEvent( start, None, pitch, noteType if legato else NOTE_NORMAL,
+                   previous if legato and noteType == NOTE_SLIDE else None, t )
+    pending.append( e )
+    ringing[ ( t, string ) ] = e
+
+  for e in pending:
+    if e.length is None:
+      e.length = maxRing
+    yield e
+
+def karplusStrong( period, samples, rng, smooth=False ):
+  '''
+  samples of a plucked string with a period sample delay loop, averaging adjacent samples each time round.
+  Instead of running the loop a sample at a time each harmonic of the first period ( noise, the pluck ) is
+  scaled by the loop's response to the power of the period number, then all periods come from one inverse FFT.
+  The averaging delays half a sample, the pitch is sampleRate / ( period + 0.5 ).
+  '''
+  noise = rng.uniform( -1.0, 1.0, period )
+  if smooth: # no pick, fewer high harmonics
+    noise = ( noise + np.roll( noise, 1 ) ) * 0.5
+  noise -= noise.mean()
+  spectrum = np.fft.rfft( noise )
+  w = 2 * np.pi * np.arange( len( spectrum ) ) / period
+  loop = DECAY * np.cos( w / 2 ) * np.exp( -0.5j * w ) # the averaging filter at each harmonic
+  periods = -( -samples // period )
+  blocks = np.fft.irfft( spectrum[ None, : ] * loop[ None, : ] ** np.arange( periods )[ :, None ], period )
+  return blocks.ravel()[ : samples ]
+
+def pitchFreq( pitch ):
+  return 440.0 * 2 ** ( ( pitch - 69 ) / 12.0 )
+
+_tones = OrderedDict() # least recently used first
+
+def tone( pitch, noteType=NOTE_NORMAL, fromPitch=None, sampleRate=SAMPLE_RATE ):
+  '''
+  A note's samples ringing for MAX_RING, float32, not faded. Cached, the same note comes out the same every
+  time whatever it's cut to.
+  '''
+  key = ( pitch, noteType, fromPitch, sampleRate )
+  samples = _tones.pop( key, None )
+  if samples is not None:
+    _tones[ key ] = samples # now the most recent
+    return samples
+
+  length = int( MAX_RING * sampleRate )
+  freq = pitchFreq( pitch )
+  period = max( 2, int( sampleRate / freq - 0.5 ) ) # a little long, resampled up to pitch below
+  # Playback rate of the string's samples for each output sample, a slide starts at the ratio for fromPitch.
+  rate = np.full( length, freq * ( period + 0.5 ) / sampleRate )
+  if fromPitch is not None:
+    glide = min( length, int( SLIDE_TIME * sampleRate ) )
+    rate[ : glide ] *= 2 ** ( ( fromPitch - pitch ) / 12.0 * np.linspace( 1.0, 0.0, glide ) )
+  positions = np.cumsum( rate ) - rate[ 0 ]
+
+  rng = np.random.RandomState( pitch * 4 + noteType )
+  string = karplusStrong( period, int( positions[ -1 ] ) + 2, rng, smooth=( noteType != NOTE_NORMAL ) )
+  samples = np.interp( positions, np.arange( len( string ) ), string )
+  peak = np.abs( samples ).max()
+  if peak > 0:
+    samples *= NOTE_GAIN * ( LEGATO_GAIN if noteType in ( NOTE_HAMMER, NOTE_PULLOFF ) else 1.0 ) / peak
+  samples = samples.astype( np.float32 )
+
+  _tones[ key ] = samples
+  while len( _tones ) > 1 and sum( t.nbytes for t in _tones.values() ) > TONE_CACHE:
+    _tones.popitem( last=False )
+  return samples
+
+def mixNote( mix, mixStart, start, length, samples, sampleRate=SAMPLE_RATE ):
+  # Add the part of a note, samples cut to length and faded out, that falls in mix, which starts at mixStart.
+  first = max( start, mixStart )
+  last = min( start + length, mixStart + len( mix ) )
+  if first >= last:
+    return
+  chunk = samples[ first - start : last - start ]
+  fadeStart = start + length - min( length, int( FADE * sampleRate ) )
+  if last > fadeStart:
+    fade = np.linspace( 1.0, 0.0, start + length - fadeStart ).astype( np.float32 )
+    chunk = chunk.copy()
+    chunk[ max( first, fadeStart ) - first : ] *= fade[ max( first, fadeStart ) - fadeStart : last - fadeStart ]
+  mix[ first - mixStart : last - mixStart ] += chunk
+
+def render( song, sink, tempo=TEMPO, sampleRate=SAMPLE_RATE ):
+  ''' Synthesize song into sink a BLOCK at a time. Returns the number of samples written. '''
+  sounding = [] # ( start, length, samples ) of notes still to be mixed
+  end = 0 # where the last note ends
+  blockStart = 0
+  upcoming = events( song, tempo, sampleRate )
+  nxt = next( upcoming, None )
+  while nxt is not None or sounding:
+    blockEnd = blockStart + BLOCK
+    while nxt is not None and nxt.start < blockEnd:
+      sounding.append( ( nxt.start, nxt.length, tone( nxt.pitch, nxt.noteType, nxt.fromPitch, sampleRate ) ) )
+      end = max( end, nxt.start + nxt.length )
+      nxt = next( upcoming, None )
+
+    # The last block stops where the last note does.
+    mix = np.zeros( BLOCK if nxt is not None else min( BLOCK, end - blockStart ), np.float32 )
+    still = []
+    for note in sounding:
+      start, length, samples = note
+      mixNote( mix, blockStart, start, length, samples, sampleRate )
+      if start + length > blockEnd:
+        still.append( note )
+    sounding = still
+
+    sink.write( ( np.clip( mix, -1.0, 1.0 ) * 32767 ).astype( '<i2' ) )
+    blockStart += len( mix )
+  return blockStart
+
+class wavSink( object ):
+  ''' A mono 16 bit WAV file, the wave module fixes up the header's length when it's closed. '''
+
+  def __init__( self, fileName, sampleRate=SAMPLE_RATE ):
+    self.f = wave.open( fileName, 'wb' )
+    self.f.setnchannels( 1 )
+    self.f.setsampwidth( 2 )
+    self.f.setframerate( sampleRate )
+
+  def write( self, samples ):
+    self.f.writeframes( samples.tobytes() )
+
+  def close( self ):
+    self.f.close()
+
+# Players that take raw samples on stdin, the first one installed is used.
+PLAYERS = ( "aplay -q -t raw -f S16_LE -c 1 -r %d",
+            "play -q -t raw -b 16 -e signed -c 1 -r %d -" )
+
+def findPlayer():
+  for player in PLAYERS:
+    name = player.split()[ 0 ]
+    if any( os.access( os.path.join( d, name ), os.X_OK ) for d in os.environ.get( 'PATH', '' ).split( os.pathsep ) ):
+      return player
+  return None
+
+class pipeSink( object ):
+  ''' Plays as it's rendered, through command ( a PLAYERS entry, %d is the sample rate ). '''
+
+  def __init__( self, command=None, sampleRate=SAMPLE_RATE ):
+    command = command or findPlayer()
+    if command is None:
+      raise IOError( "No audio player found, tried: " + ", ".join( p.split()[ 0 ] for p in PLAYERS ) )
+    self.proc = subprocess.Popen( ( command % sampleRate ).split(), stdin=subprocess.PIPE )
+
+  def write( self, samples ):
+    self.proc.stdin.write( samples.tobytes() )
+
+  def close( self ):
+    self.proc.stdin.close()
+    self.proc.wait()
+
+def writeWav( song, fileName, tempo=TEMPO ):
+  ''' Save song as a WAV file. '''
+  sink = wavSink( fileName )
+  try:
+    return render( song, sink, tempo )
+  finally:
+    sink.close()
+
+if __name__ == '__main__':
+  import argparse, time
+  import pytabEdit
+
+  parser = argparse.ArgumentParser( description="Render a .pytab song to a WAV file, or play it." )
+  parser.add_argument( 'song', help="song file" )
+  parser.add_argument( '-o', '--out', help="WAV file, default <song>.wav" )
+  parser.add_argument( '-t', '--tempo', type=float, default=TEMPO, help="tab beats a minute, default %d" % TEMPO )
+  parser.add_argument( '--play', action='store_true', help="play it instead, needs aplay or sox" )
+  args = parser.parse_args()
+
+  base = args.song[ : -len( songExt ) ] if args.song.endswith( songExt ) else args.song
+  song = pytabEdit.openSong( args.song, os.path.basename( base ), lazy=True )
+  start = time.time()
+  if args.play:
+    sink = pipeSink()
+    try:
+      render( song, sink, args.tempo )
+    finally:
+      sink.close()
+  else:
+    out = args.out or base + ".wav"
+    samples = writeWav( song, out, args.tempo )
+    print( "%s, %.1fs of audio in %.1fs." % ( out, samples / float( SAMPLE_RATE ), time.time() - start ) )
@@ -0,0 +1,120 @@
+'''
+A catalog of the .pytab songs in a directory, for tab.py's open dialog.
+
+Each song's name, measure count, tuning and annotation text are kept in CATALOG in the directory along
+with the file's mtime and size ( and its journals' ). refresh() only reads songs whose stamp changed, so
+opening the dialog on a big library costs a directory listing and a stat per song. Binary songs without a
+journal are read from their columns, nothing is decoded.
+'''
+
+import os, json
+from pytabModel import songExt
+import pytabFile, pytabEdit
+
+CATALOG = ".pytabCatalog.json"
+MAX_TEXT = 500 # annotation characters kept per song for searching
+
+def fileStamp( path ):
+  # What tells us a song changed, the song file and its journals.
+  stamp = []
+  for f in ( path, ) + pytabEdit.journalFiles( path ):
+    try:
+      st = os.stat( f )
+      stamp += [ st.st_mtime, st.st_size ]
+    except OSError:
+      stamp += [ 0, 0 ]
+  return stamp
+
+def songInfo( path ):
+  # ( name, measures, tuning index, annotation text ) of the song in path.
+  if pytabFile.isBinary( path ) and not any( os.path.exists( j ) for j in pytabEdit.journalFiles( path ) ):
+    sf = pytabFile.songFile( path )
+    try:
+      first, last = sf.trackMeasures( 0 ) if sf.numTracks() else ( 0, 0 )
+      texts = [ sf.annotation ] + [ sf.string( ix ) for col in ( 'measureAnn', 'beatAnn' )
+                                    for ix in sf.column( col ) if ix >= 0 ]
+      return sf.songName, last - first, sf.tuningIndex, texts
+    finally:
+      sf.close()
+
+  song = pytabEdit.openSong( path, os.path.basename( path )[ : -len( songExt ) ] )
+  texts = [ song.annotation ]
+  track = song.get( 1 )
+  for m in track.get() if track else []:
+    if m:
+      texts.append( m.annotation )
+      texts += [ b.annotation for b in m.get() if b ]
+  return song.songName, track.count() if track else 0, song.tuningIndex, texts
+
+class songCatalog( object ):
+  '''
+  The songs in directory, entries are file name -> { 'file', 'name', 'measures', 'tuning', 'text', 'stamp' }.
+  '''
+
+  def __init__( self, directory="." ):
+    self.directory = directory
+    self.fileName = os.path.join( directory, CATALOG )
+    self.entries = {}
+    self.index = [] # ( lower case name, lower case text, entry ) sorted by name, for search()
+    try:
+      with open( self.fileName ) as f:
+        self.entries = json.load( f )
+    except ( IOError, OSError, ValueError ):
+      pass
+
+  def refresh( self ):
+    ''' Bring the catalog up to date with the directory, reading only songs that changed. '''
+    changed = False
+    entries = {}
+    for f in os.listdir( self.directory ):
+      if not f.endswith( songExt ):
+        continue
+      path = os.path.join( self.directory, f )
+      stamp = fileStamp( path )
+      entry = self.entries.get( f )
+      if entry is None or entry[ 'stamp' ] != stamp:
+        entry = self.read( f, stamp )
+        changed = True
+      entries[ f ] = entry
+    changed = changed or len( entries ) != len( self.entries )
+    self.entries = entries
+    self.index = sorted( ( ( e[ 'name' ].lower(), e[ 'text' ].lower(), e ) for e in entries.values() ),
+                         key=lambda i: ( i[ 0 ], i[ 2 ][ 'file' ] ) )
+    if changed:
+      self.save()
+    return self
+
+  def read( self, f, stamp ):
+    entry = { 'file' : f, 'stamp' : stamp }
+    try:
+      name, measures, tuning, texts = songInfo( os.path.join( self.directory, f ) )
+    except Exception: # unreadable, list it under its file name so it can still be picked
+      name, measures, tuning, texts = None, 0, 0, []
+    entry[ 'name' ] = name or f[ : -len( songExt ) ]
+    entry[ 'measures' ] = measures
+    entry[ 'tuning' ] = tuning
+    entry[ 'text' ] = " ".join( t for t in texts if t )[ : MAX_TEXT ]
+    return entry
+
+  def save( self ):
+    try:
+      with open( self.fileName + ".tmp", 'w' ) as f:
+        json.dump( self.entries, f )
+      os.rename( self.fileName + ".tmp", self.fileName )
+    except ( IOError, OSError ):
+      pass # read only directory, it's only a cache
+
+  def search( self, query="" ):
+    ''' Entries matching query, names starting with it first, then names and annotations containing it. '''
+    query = query.lower()
+    if not query:
+      return [ i[ 2 ] for i in self.index ]
+    starts, names, texts = [], [], []
+    for name, text, entry in self.index:
+      if name.startswith( query ):
+        starts.append( entry )
+      elif query in name or query in entry[ 'file' ].lower():
+        names.append( entry )
+      elif query in text:
+        texts.append( entry )
+    return starts + names + texts
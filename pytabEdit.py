@@ -0,0 +1,378 @@
+'''
+Song edits for tab.py, and the edit journal.
+
+Every change the editor makes to a song is an operation, a tuple like ( 'setNote', track, measure, beat,
+string, fret, type ), applied with songEditor.apply(). Besides changing the song each one is appended to
+<song>.pytab.journal, so a crash loses nothing and saving never waits on the whole song being written. The
+journal is folded into the song file in the background ( compact() ), and loading a song replays whatever
+journal is left.
+
+Records are json lines, [ seq, op, args.. ]. seq keeps counting across compactions and the song file
+remembers the last one it has, so replaying is safe if a compaction was interrupted. Only the last record
+can be cut short by a crash, anything else that doesn't read is a journalError rather than edits replayed on
+top of a missing one.
+
+Undo works the same way, each edit comes with the operations that reverse it ( inverseOps() ), so the
+history holds small operations and measure states, never copies of the song.
+
+Operations, indexes are 1 based like the model API, None means append:
+  setNote      track, measure, beat, string, fret, type   fret None clears the note
+  setBeat      track, measure, beat, beatState, insert    pytabContainer.set() of a beat
+  popBeat      track, measure, beat
+  setMeasure   track, measure, measureState, insert
+  popMeasure   track, measure
+  measureFlags track, measure, pageBreak, repeat
+  measureAnn   track, measure, annotation
+  beatAnn      track, measure, beat, annotation
+  addTrack     track, name, notes                         inserted before track, None appends. notes is
+                                                          None or trackNotes() of a track put back
+  popTrack     track
+  moveTrack    track, to                                  swaps the two
+  tuning       tuning index
+  songName     name
+
+Tracks share their measures and beats ( see pytabModel ), so everything but notes changes every track
+whichever track the operation names.
+'''
+
+import os, json, threading
+from collections import deque
+from pytabModel import *
+from pytabFile import readSong, writeSong, beatFromState, measureFromState, measureState
+
+JOURNAL_EXT = ".journal"
+COMPACTING_EXT = ".compacting" # a journal being folded into the song file
+UNDO_DEPTH = 200 # actions remembered for undo
+
+EMPTY_BEAT = ( None, () )
+
+OPS = ( 'setNote', 'setBeat', 'popBeat', 'setMeasure', 'popMeasure', 'measureFlags', 'measureAnn', 'beatAnn',
+        'addTrack', 'popTrack', 'moveTrack', 'tuning', 'songName' )
+
+class journalError( Exception ):
+  pass
+
+def emptyMeasure( beats=1 ):
+  # measureState of a new measure.
+  return ( 0, None, ( EMPTY_BEAT, ) * beats )
+
+def trackNotes( track ):
+  # The notes of track by measure and beat, None for a missing measure.
+  return [ None if measure is None else
+           [ tuple( ( n.string, n.fret, n.noteType ) for n in beat.get() if n ) if beat else () for beat in measure.get() ]
+           for measure in track.get() ]
+
+def _fillNotes( track, notes ):
+  for m, beats in enumerate( notes, 1 ):
+    measure = track.get( m )
+    if measure is None or not beats:
+      continue
+    measure.version += 1
+    for b, beatNotes in enumerate( beats, 1 ):
+      beat = measure.get( b )
+      for string, fret, noteType in beatNotes if beat else ():
+        beat.addNote( string, fret, noteType )
+
+def _songTracks( song, beat ):
+  # A beat state without notes for tracks song doesn't have, ex: beats copied before a track was deleted.
+  return beat if beat is None or len( beat ) <= song.count() + 1 else tuple( beat[ : song.count() + 1 ] )
+
+def applyOp( song, op ):
+  name, args = op[ 0 ], op[ 1 : ]
+  if name == 'tuning':
+    song.tuningIndex = args[ 0 ]
+    return
+  if name == 'songName':
+    song.songName = args[ 0 ]
+    return
+  if name == 'addTrack':
+    t, trackName, notes = args
+    track = song.addTrack( t, True, trackName )
+    if notes:
+      _fillNotes( track, notes )
+    return
+  if name == 'popTrack':
+    song.popTrack( args[ 0 ] )
+    return
+  if name == 'moveTrack':
+    song.moveTrack( args[ 0 ], args[ 1 ] )
+    return
+
+  track = song.get( args[ 0 ] )
+  if name == 'setMeasure':
+    _, m, state, insert = args
+    if state is not None:
+      state = tuple( state[ : 2 ] ) + ( tuple( _songTracks( song, beat ) for beat in state[ 2 ] ), )
+    track.set( measureFromState( state ), m, insert )
+    return
+  if name == 'popMeasure':
+    track.pop( args[ 1 ] )
+    return
+
+  measure = track.get( args[ 1 ] )
+  measure.version += 1
+  if name == 'setNote':
+    _, _, b, string, fret, noteType = args
+    beat = measure.get( b )
+    if fret is None:
+      if beat:
+        beat.clr( string )
+    else:
+      if not beat:
+        beat = measure.addBeat( b )
+      beat.addNote( string, fret, noteType )
+  elif name == 'setBeat':
+    _, _, b, state, insert = args
+    measure.set( beatFromState( _songTracks( song, state ) ), b, insert )
+  elif name == 'popBeat':
+    measure.pop( args[ 2 ] )
+  elif name == 'measureFlags':
+    measure.pageBreak, measure.repeat = args[ 2 ], args[ 3 ]
+  elif name == 'measureAnn':
+    measure.annotation = args[ 2 ]
+  elif name == 'beatAnn':
+    measure.get( args[ 2 ] ).annotation = args[ 3 ]
+  else:
+    raise ValueError( "Unknown edit: %s" % ( name, ) )
+
+def inverseOps( song, op ):
+  ''' The operations that undo op, worked out before it's applied. '''
+  name, args = op[ 0 ], op[ 1 : ]
+  if name == 'tuning':
+    return [ ( 'tuning', song.tuningIndex ) ]
+  if name == 'songName':
+    return [ ( 'songName', song.songName ) ]
+  if name == 'addTrack':
+    t = args[ 0 ]
+    return [ ( 'popTrack', t if t and t <= song.count() else song.count() + 1 ) ]
+  if name == 'popTrack':
+    t = args[ 0 ]
+    if t < 1 or t > song.count() or song.count() == 1:
+      return []
+    track = song.get( t )
+    return [ ( 'addTrack', t, track.trackName, trackNotes( track ) ) ]
+  if name == 'moveTrack':
+    return [ ( 'moveTrack', args[ 1 ], args[ 0 ] ) ]
+
+  t = args[ 0 ]
+  track = song.get( t )
+  count = track.count()
+  if name == 'setMeasure':
+    m, insert = args[ 1 ], args[ 3 ]
+    if m is None:
+      return [ ( 'popMeasure', t, count + 1 ) ]
+    if m > count: # padded with None measures
+      return [ ( 'popMeasure', t, count + 1 ) ] * ( m + ( 1 if insert else 0 ) - count )
+    if insert:
+      return [ ( 'popMeasure', t, m ) ]
+    return [ ( 'setMeasure', t, m, measureState( track.get( m ) ), False ) ]
+  if name == 'popMeasure':
+    m = args[ 1 ]
+    if m < 1 or m > count:
+      return []
+    # Inserting one past the end would pad, so the last measure is put back by setting it.
+    return [ ( 'setMeasure', t, m, measureState( track.get( m ) ), m < count ) ]
+
+  # Everything else changes one measure, put it back as it was.
+  m = args[ 1 ]
+  return [ ( 'setMeasure', t, m, measureState( track.get( m ) ), False ) ]
+
+def _record( text ):
+  # text as a journal record, None if it isn't one.
+  try:
+    record = json.loads( text )
+  except ValueError:
+    return None
+  if not isinstance( record, list ) or len( record ) < 2 or not isinstance( record[ 0 ], int ) or \
+     record[ 1 ] not in OPS:
+    return None
+  return record
+
+def _tornRecord( line ):
+  '''
+  The record written after a record torn by a crash, both on line. Journals from before repairJournal()
+  have these, the edits made after the crash were appended to the torn one. None if line isn't that.
+  '''
+  decoder = json.JSONDecoder()
+  text = line.rstrip()
+  start = text.find( '[', 1 )
+  while start > 0:
+    try:
+      end = decoder.raw_decode( text, start )[ 1 ]
+    except ValueError:
+      end = 0
+    if end == len( text ):
+      record = _record( text[ start : ] )
+      if record is not None:
+        return record
+    start = text.find( '[', start + 1 )
+  return None
+
+def readJournal( fileName ):
+  '''
+  The records in a journal file. The last record is skipped if a crash cut it short, a record that doesn't
+  read anywhere else raises journalError.
+  '''
+  records = []
+  try:
+    with open( fileName ) as f:
+      lines = f.readlines()
+  except IOError:
+    return records
+  for n, line in enumerate( lines, 1 ):
+    record = _record( line )
+    if record is None:
+      record = _tornRecord( line )
+    if record is None:
+      if n == len( lines ) and not line.endswith( '\n' ):
+        break # torn by a crash
+      raise journalError( "%s line %d is corrupt." % ( fileName, n ) )
+    records.append( record )
+  return records
+
+def repairJournal( fileName ):
+  # Cut a record torn by a crash off the end of journal fileName, so records appended after it start a line.
+  try:
+    with open( fileName, 'rb+' ) as f:
+      data = f.read()
+      if data and not data.endswith( b'\n' ):
+        f.truncate( data.rfind( b'\n' ) + 1 )
+  except IOError:
+    pass
+
+def replay( song, fileName ):
+  # Apply the records in journal fileName that song doesn't have yet. Returns how many that was.
+  count = 0
+  for record in readJournal( fileName ):
+    seq, op = record[ 0 ], record[ 1 : ]
+    if seq > song.journalSeq:
+      applyOp( song, op )
+      song.journalSeq = seq
+      count += 1
+  return count
+
+def journalFiles( fileName ):
+  # A song's journals, oldest first.
+  return ( fileName + JOURNAL_EXT + COMPACTING_EXT, fileName + JOURNAL_EXT )
+
+def openSong( fileName, name, lazy=False ):
+  '''
+  Load a song and replay its journals. A song that was never saved but has a journal starts from newSong().
+  Raises IOError if there's neither, journalError if a journal is corrupt.
+  '''
+  return openEdited( fileName, name, lazy )[ 0 ]
+
+def openEdited( fileName, name, lazy=False ):
+  # ( song, edits ), song as openSong() loads it and the number of unsaved edits replayed into it.
+  journals = [ j for j in journalFiles( fileName ) if os.path.exists( j ) ]
+  if os.path.exists( fileName ):
+    song = readSong( fileName, lazy )
+  elif journals:
+    song = newSong( name )
+  else:
+    raise IOError( "No such song: " + fileName )
+  return song, sum( replay( song, j ) for j in journals )
+
+def compact( fileName, name ):
+  '''
+  Fold <fileName>.journal.compacting into fileName. Works from the files, not the song being edited, so it
+  can run in the background.
+  '''
+  compacting = fileName + JOURNAL_EXT + COMPACTING_EXT
+  song = readSong( fileName ) if os.path.exists( fileName ) else newSong( name )
+  replay( song, compacting )
+  writeSong( song, fileName ) # synced, so the journal can go
+  os.remove( compacting )
+
+class songEditor( object ):
+  '''
+  Applies and journals edits to song, saved as fileName.
+  Edits between endAction() calls are one action for undo() / redo(), undoDepth of them are kept.
+  listeners are called with each operation after it's applied, ex: to keep an index of the song up to date.
+  '''
+
+  def __init__( self, song, fileName, undoDepth=UNDO_DEPTH ):
+    self.song = song
+    self.fileName = fileName
+    self.journalName = fileName + JOURNAL_EXT
+    self.journal = None # opened on the first edit
+    self.compactor = None
+    self.action = []    # ( op, inverse ops ) of the action in progress
+    self.undoList = deque( maxlen=undoDepth )
+    self.redoList = []
+    self.listeners = []
+
+  def apply( self, op ):
+    self.action.append( ( op, inverseOps( self.song, op ) ) )
+    self._apply( op )
+
+  def endAction( self ):
+    if self.action:
+      self.undoList.append( self.action )
+      self.action = []
+      self.redoList = []
+
+  def undo( self ):
+    # Reverse the last action, False if there's nothing to undo.
+    self.endAction()
+    if not self.undoList:
+      return False
+    action = self.undoList.pop()
+    for op, inverse in reversed( action ):
+      for undoOp in inverse:
+        self._apply( undoOp )
+    self.redoList.append( action )
+    return True
+
+  def redo( self ):
+    self.endAction()
+    if not self.redoList:
+      return False
+    action = self.redoList.pop()
+    for op, inverse in action:
+      self._apply( op )
+    self.undoList.append( action )
+    return True
+
+  def _apply( self, op ):
+    applyOp( self.song, op )
+    for listener in self.listeners:
+      listener( op )
+    self.song.journalSeq += 1
+    if self.journal is None:
+      repairJournal( self.journalName )
+      self.journal = open( self.journalName, 'a' )
+    self.journal.write( json.dumps( [ self.song.journalSeq ] + list( op ) ) + "\n" )
+    self.journal.flush() # in the OS's hands now, safe if tab.py dies
+
+  def save( self ):
+    ''' Start folding the journal into the song file, in the background. '''
+    self.wait()
+    if os.path.exists( self.journalName + COMPACTING_EXT ): # left by a crash, fold it in before it's replaced
+      compact( self.fileName, self.song.songName )
+    if self.journal is not None:
+      self.journal.close()
+      self.journal = None
+    if not os.path.exists( self.journalName ):
+      if not os.path.exists( self.fileName ):
+        writeSong( self.song, self.fileName ) # new song, no edits yet
+      return
+    os.rename( self.journalName, self.journalName + COMPACTING_EXT )
+    self.compactor = threading.Thread( target=compact, args=( self.fileName, self.song.songName ) )
+    self.compactor.daemon = True
+    self.compactor.start()
+
+  def wait( self ):
+    # Let a background compaction finish.
+    if self.compactor is not None:
+      self.compactor.join()
+      self.compactor = None
+
+  def close( self, discard=False ):
+    # Stop editing. An unsaved journal stays and is replayed when the song is opened again, unless discard.
+    self.wait()
+    if self.journal is not None:
+      self.journal.close()
+      self.journal = None
+    if discard and os.path.exists( self.journalName ):
+      os.remove( self.journalName )
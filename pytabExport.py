@@ -0,0 +1,175 @@
+'''
+Batch export of .pytab songs without the editor, run as tab.py --export.
+
+  python tab.py --export                     # txt and html for every song in .
+  python tab.py --export -f txt -o out songs/ -j 4
+
+Songs are exported across a process pool, <song>.txt / .html / .wav / .mid next to the song or in --out. An
+export is skipped if it's newer than the song and its journal. If it isn't but the song's content hash is the
+one recorded for it in the directory's MANIFEST ( the song was touched or copied, not changed ) it's kept too.
+'''
+
+from __future__ import print_function
+import os, glob, time, json, hashlib, argparse, multiprocessing
+
+from pytabModel import songExt
+import pytabEdit, pytabRender, pytabMidi
+try:
+  import pytabAudio
+except ImportError: # needs numpy
+  pytabAudio = None
+
+FORMATS = ( 'txt', 'html', 'wav', 'mid' )
+MANIFEST = ".pytabExport.json" # export file name -> hash of the song it was made from
+
+def exportFile( song, fmt, path, bass=False ):
+  # Write then rename so an interrupted run doesn't leave a partial file that looks up to date.
+  tmpName = path + ".tmp"
+  if fmt == 'wav':
+    pytabAudio.writeWav( song, tmpName )
+  elif fmt == 'mid':
+    pytabMidi.writeMidi( song, tmpName )
+  else:
+    pytabRender.exportSong( song, tmpName, fmt == 'html', bass )
+  os.rename( tmpName, path )
+
+def findSongs( paths ):
+  # Song files named by paths, directories are searched like tab.py's open does.
+  songs = []
+  for path in paths:
+    if os.path.isdir( path ):
+      found = glob.glob( os.path.join( path, "*" + songExt ) )
+    else:
+      found = glob.glob( path )
+    for s in sorted( found ):
+      if s not in songs:
+        songs.append( s )
+  return songs
+
+def sourceFiles( songFile ):
+  # What an export of songFile is made from, the song and any unsaved edits.
+  return [ f for f in ( songFile, ) + pytabEdit.journalFiles( songFile ) if os.path.exists( f ) ]
+
+def contentHash( files ):
+  h = hashlib.sha1()
+  for name in files:
+    with open( name, 'rb' ) as f:
+      for chunk in iter( lambda: f.read( 1 << 16 ), b'' ):
+        h.update( chunk )
+  return h.hexdigest()
+
+def exportName( songFile, fmt, outDir=None ):
+  base = os.path.basename( songFile )[ : -len( songExt ) ]
+  return os.path.join( outDir or os.path.dirname( songFile ), base + "." + fmt )
+
+def exportJob( job ):
+  '''
+  Export one song in the formats it's out of date in. Runs in a worker process.
+  targets are ( format, export file, hash recorded for it ). Returns ( song file, hash, [ ( format, bytes
+  written or 0 if kept ) ], error or None ).
+  '''
+  songFile, targets, bass, force = job
+
+  done = []
+  digest = None
+  try:
+    digest = contentHash( sourceFiles( songFile ) )
+    song = None
+    for fmt, path, recorded in targets:
+      if not force and recorded == digest and os.path.exists( path ):
+        os.utime( path, None ) # same song, make it look up to date again
+        done.append( ( fmt, 0 ) )
+        continue
+      if song is None:
+        song = pytabEdit.openSong( songFile, os.path.basename( songFile )[ : -len( songExt ) ], lazy=True )
+      exportFile( song, fmt, path, bass )
+      done.append( ( fmt, os.path.getsize( path ) ) )
+  except Exception as e:
+    return songFile, digest, done, "%s" % ( e, )
+  return songFile, digest, done, None
+
+def loadManifest( directory ):
+  try:
+    with open( os.path.join( directory, MANIFEST ) ) as f:
+      return json.load( f )
+  except ( IOError, OSError, ValueError ):
+    return {}
+
+def saveManifest( directory, manifest ):
+  path = os.path.join( directory, MANIFEST )
+  with open( path + ".tmp", 'w' ) as f:
+    json.dump( manifest, f, indent=1, sort_keys=True )
+  os.rename( path + ".tmp", path )
+
+def main( argv ):
+  parser = argparse.ArgumentParser( prog="tab.py --export", description="Export .pytab songs." )
+  parser.add_argument( 'paths', nargs='*', default=[ "." ], help="songs, patterns or directories, default ." )
+  parser.add_argument( '-o', '--out', help="output directory, default next to each song" )
+  parser.add_argument( '-f', '--formats', default="txt,html", help="comma separated, from: " + ", ".join( FORMATS ) )
+  parser.add_argument( '-b', '--bass', action='store_true', help="4 string bass tab" )
+  parser.add_argument( '-j', '--jobs', type=int, default=multiprocessing.cpu_count() )
+  parser.add_argument( '--force', action='store_true', help="export even if up to date" )
+  args = parser.parse_args( argv )
+
+  formats = [ f for f in args.formats.split( ',' ) if f ]
+  for f in formats:
+    if f not in FORMATS:
+      parser.error( "Unknown format: " + f )
+  if 'wav' in formats and pytabAudio is None:
+    parser.error( "wav needs numpy." )
+  if args.out and not os.path.isdir( args.out ):
+    os.makedirs( args.out )
+
+  start = time.time()
+  songs = findSongs( args.paths )
+  manifests = {} # export directory -> manifest
+  jobs = []
+  upToDate = 0
+  bytesIn = 0
+  for songFile in songs:
+    sources = sourceFiles( songFile )
+    stamp = max( os.path.getmtime( s ) for s in sources )
+    targets = []
+    for fmt in formats:
+      path = exportName( songFile, fmt, args.out )
+      if not args.force and os.path.exists( path ) and os.path.getmtime( path ) >= stamp:
+        upToDate += 1
+        continue
+      directory = os.path.dirname( path )
+      if directory not in manifests:
+        manifests[ directory ] = loadManifest( directory )
+      targets.append( ( fmt, path, manifests[ directory ].get( os.path.basename( path ) ) ) )
+    if targets:
+      jobs.append( ( songFile, targets, args.bass, args.force ) )
+      bytesIn += sum( os.path.getsize( s ) for s in sources )
+
+  written = kept = bytesOut = 0
+  failed = []
+  if jobs:
+    pool = multiprocessing.Pool( max( 1, min( args.jobs, len( jobs ) ) ) )
+    try:
+      for songFile, digest, done, error in pool.imap_unordered( exportJob, jobs, chunksize=4 ):
+        for fmt, size in done:
+          path = exportName( songFile, fmt, args.out )
+          manifests[ os.path.dirname( path ) ][ os.path.basename( path ) ] = digest
+          if size:
+            written += 1
+            bytesOut += size
+          else:
+            kept += 1
+        if error:
+          failed.append( songFile )
+          print( "Failed %s: %s" % ( songFile, error ) )
+    finally:
+      pool.close()
+      pool.join()
+
+  for directory, manifest in manifests.items():
+    saveManifest( directory, manifest )
+
+  elapsed = max( time.time() - start, 0.001 )
+  print( "%d songs, %d files written, %d up to date, %d failed." %
+         ( len( songs ), written, upToDate + kept, len( failed ) ) )
+  print( "%.2fs, %.1f songs/s, %.1f KB/s read, %.1f KB/s written." %
+         ( elapsed, len( jobs ) / elapsed, bytesIn / 1024.0 / elapsed, bytesOut / 1024.0 / elapsed ) )
+  return 1 if failed else 0
@@ -0,0 +1,594 @@
+#!/usr/bin/python
+'''
+Binary .pytab song files.
+
+Songs used to be pickles of the whole object tree, slow to load for long songs and unreadable once the
+classes change. The binary format stores the song as flat columns instead:
+
+  header     magic "PYTB", format version, tuning index, song name and annotation ( string table indexes ),
+             number of sections
+  directory  ( offset, item count ) per section, in SECTIONS order
+  sections   little endian arrays, each 8 byte aligned
+
+Tracks index into the measure columns, measures into the beat columns and beats into the note columns
+through offset tables ( trackMeasures[ t ] .. trackMeasures[ t + 1 ] are track t's measures ). Text lives
+in one string table and is referred to by index, -1 for none. Nothing needs parsing to find a measure so
+the file can be memory mapped and read in place.
+
+Tracks share the first track's measures ( see pytabModel ), the others have no measures of their own and
+their notes come through partNotes, an offset table into the note columns with an entry per track and beat.
+Version 1 files have no partNotes, their other tracks' measures are merged in when they're read.
+
+Songs can be opened lazily, see lazyTrack.
+
+Pickled songs still load, through an unpickler that doesn't need the old classes. Convert them with
+  python pytabFile.py song.pytab ..
+'''
+
+from __future__ import print_function
+import os, sys, struct, mmap, pickle
+from array import array
+from pytabModel import *
+
+MAGIC = b'PYTB'
+VERSION = 2
+VERSIONS = ( 1, 2 ) # read
+
+HEADER = struct.Struct( '<4sHHiiH' ) # magic, version, tuningIndex, song name, song annotation, section count
+DIR_ENTRY = struct.Struct( '<II' )   # offset, count
+
+def _typecode( signed ):
+  # A 4 byte array type, 'i' / 'I' on every platform we know of.
+  for code in ( 'i', 'l' ) if signed else ( 'I', 'L' ):
+    if array( code ).itemsize == 4:
+      return code
+
+I32 = _typecode( True )
+U32 = _typecode( False )
+U8 = 'B'
+
+SECTIONS = ( # name, type
+  ( 'stringOffsets', U32 ), # string table, stringOffsets[ i ] .. stringOffsets[ i + 1 ] in stringData
+  ( 'stringData',    U8 ),  # utf-8
+  ( 'trackMeasures', U32 ), # per track + 1, offset table into the measure columns
+  ( 'trackName',     I32 ),
+  ( 'trackAnn',      I32 ),
+  ( 'measureBeats',  U32 ), # per measure + 1, offset table into the beat columns
+  ( 'measureFlags',  U8 ),
+  ( 'measureAnn',    I32 ),
+  ( 'beatNotes',     U32 ), # per beat + 1, offset table into the note columns
+  ( 'beatFlags',     U8 ),
+  ( 'beatAnn',       I32 ),
+  ( 'noteString',    U8 ),
+  ( 'noteFret',      U8 ),
+  ( 'noteType',      U8 ),
+  ( 'journalSeq',    U32 ),  # last journal record saved in the file, see pytabEdit. Files without it are 0.
+  ( 'partNotes',     U32 ) ) # per track after the first, per beat of the first + 1, offsets into the note columns
+
+PRESENT = 1    # measure / beat flags. Containers can hold None, ex: measure 10 added to a new song.
+PAGE_BREAK = 2
+REPEAT = 4
+
+class formatError( Exception ):
+  pass
+
+def _align( n ):
+  return ( n + 7 ) & ~7
+
+class stringTable( object ):
+
+  def __init__( self ):
+    self.strings = []
+    self.index = {}
+
+  def add( self, s ):
+    if s is None:
+      return -1
+    ix = self.index.get( s )
+    if ix is None:
+      ix = self.index[ s ] = len( self.strings )
+      self.strings.append( s )
+    return ix
+
+  def columns( self ):
+    offsets = array( U32, [ 0 ] )
+    data = bytearray()
+    for s in self.strings:
+      data += s.encode( 'utf-8' )
+      offsets.append( len( data ) )
+    return offsets, array( U8, bytes( data ) )
+
+def _noteStates( beat ):
+  return tuple( ( n.string, n.fret, n.noteType ) for n in beat.get() if n is not None )
+
+def beatState( beat ):
+  '''
+  A beat as plain tuples, None or ( annotation, notes, notes.. ) with the notes of each track,
+  ( ( string, fret, type ).. ). Tracks at the end without notes are left out.
+  '''
+  if beat is None:
+    return None
+  parts = [ _noteStates( pytabBeat( beat.store, beat.slot, part ) ) for part in range( len( beat.store.parts ) ) ]
+  while len( parts ) > 1 and not parts[ -1 ]:
+    parts.pop()
+  return ( beat.annotation, ) + tuple( parts )
+
+def _fillBeat( beat, state ):
+  beat.annotation = state[ 0 ]
+  for part, notes in enumerate( state[ 1 : ] ):
+    view = pytabBeat( beat.store, beat.slot, part )
+    for string, fret, noteType in notes:
+      view.addNote( string, fret, noteType )
+  return beat
+
+def beatFromState( state ):
+  if state is None:
+    return None
+  return _fillBeat( pytabBeat(), state )
+
+def measureState( measure ):
+  '''
+  A measure as plain tuples, what the file stores for it:
+  None, or ( flags, annotation, beats ) with each beat a beatState()
+  '''
+  if measure is None:
+    return None
+  flags = ( PAGE_BREAK if measure.pageBreak else 0 ) | ( REPEAT if measure.repeat else 0 )
+  return ( flags, measure.annotation, tuple( beatState( beat ) for beat in measure.get() ) )
+
+def measureFromState( state ):
+  if state is None:
+    return None
+  flags, annotation, beats = state
+  measure = pytabMeasure()
+  measure.pageBreak = bool( flags & PAGE_BREAK )
+  measure.repeat = bool( flags & REPEAT )
+  measure.annotation = annotation
+  for beat in beats:
+    if beat is None:
+      measure.set( None )
+    else:
+      _fillBeat( measure.addBeat(), beat )
+  return measure
+
+def mergeTrack( song, track ):
+  '''
+  Add track, a track with measures of its own ( older files ), to song as a track of song's measures.
+  Measures and beats song doesn't have are added.
+  '''
+  part = song.addTrack( name=track.trackName )
+  part.annotation = track.annotation
+  for m, measure in enumerate( track.get(), 1 ):
+    if measure is None:
+      continue
+    if part.get( m ) is None:
+      part.set( pytabMeasure(), m )
+    target = part.get( m )
+    for b, beat in enumerate( measure.get(), 1 ):
+      if beat is None:
+        continue
+      if target.get( b ) is None:
+        target.addBeat( b )
+      for n in beat.get():
+        if n is not None:
+          target.get( b ).addNote( n.string, n.fret, n.noteType )
+  return part
+
+def trackStates( track ):
+  # measureState() of each measure in track, measures a lazy track hasn't read come straight from its file.
+  for measure in track.objects:
+    if isinstance( measure, measureRef ):
+      yield track.songFile.measureState( measure.index )
+    else:
+      yield measureState( measure )
+
+def encodeSong( song ):
+  ''' Flatten song into { section name : array } and the header fields. '''
+  strings = stringTable()
+  cols = dict( ( name, array( code ) ) for name, code in SECTIONS )
+  for name in ( 'trackMeasures', 'measureBeats', 'beatNotes' ):
+    cols[ name ].append( 0 )
+
+  parts = [ [] for track in song.get()[ 1 : ] ] # notes of each beat, tracks after the first
+  for t, track in enumerate( song.get() ):
+    if track is None:
+      track = pytabTrack( None )
+    cols[ 'trackName' ].append( strings.add( track.trackName ) )
+    cols[ 'trackAnn' ].append( strings.add( track.annotation ) )
+    for state in trackStates( track ) if t == 0 else ():
+      if state is None:
+        cols[ 'measureFlags' ].append( 0 )
+        cols[ 'measureAnn' ].append( -1 )
+      else:
+        flags, annotation, beats = state
+        cols[ 'measureFlags' ].append( PRESENT | flags )
+        cols[ 'measureAnn' ].append( strings.add( annotation ) )
+        for beat in beats:
+          for part, notes in enumerate( parts, 2 ):
+            notes.append( beat[ part ] if beat is not None and part < len( beat ) else () )
+          if beat is None:
+            cols[ 'beatFlags' ].append( 0 )
+            cols[ 'beatAnn' ].append( -1 )
+          else:
+            cols[ 'beatFlags' ].append( PRESENT )
+            cols[ 'beatAnn' ].append( strings.add( beat[ 0 ] ) )
+            for string, fret, noteType in beat[ 1 ]:
+              cols[ 'noteString' ].append( string )
+              cols[ 'noteFret' ].append( fret )
+              cols[ 'noteType' ].append( noteType )
+          cols[ 'beatNotes' ].append( len( cols[ 'noteString' ] ) )
+      cols[ 'measureBeats' ].append( len( cols[ 'beatFlags' ] ) )
+    cols[ 'trackMeasures' ].append( len( cols[ 'measureFlags' ] ) )
+
+  if parts:
+    cols[ 'partNotes' ].append( len( cols[ 'noteString' ] ) )
+    for notes in parts:
+      for beat in notes:
+        for string, fret, noteType in beat:
+          cols[ 'noteString' ].append( string )
+          cols[ 'noteFret' ].append( fret )
+          cols[ 'noteType' ].append( noteType )
+        cols[ 'partNotes' ].append( len( cols[ 'noteString' ] ) )
+
+  cols[ 'journalSeq' ].append( song.journalSeq )
+  header = ( song.tuningIndex, strings.add( song.songName ), strings.add( song.annotation ) )
+  cols[ 'stringOffsets' ], cols[ 'stringData' ] = strings.columns()
+  return header, cols
+
+def writeSong( song, fileName ):
+  '''
+  Save song to fileName, written and synced to a temporary file first so a failed save or a power loss leaves
+  the old one.
+  '''
+  ( tuningIndex, nameIx, annIx ), cols = encodeSong( song )
+
+  offset = _align( HEADER.size + DIR_ENTRY.size * len( SECTIONS ) )
+  directory = []
+  for name, code in SECTIONS:
+    directory.append( ( offset, len( cols[ name ] ) ) )
+    offset = _align( offset + len( cols[ name ] ) * cols[ name ].itemsize )
+
+  tmpName = fileName + ".tmp"
+  with open( tmpName, 'wb' ) as f:
+    f.write( HEADER.pack( MAGIC, VERSION, tuningIndex, nameIx, annIx, len( SECTIONS ) ) )
+    for entry in directory:
+      f.write( DIR_ENTRY.pack( *entry ) )
+    for ( name, code ), ( start, count ) in zip( SECTIONS, directory ):
+      f.write( b'\0' * ( start - f.tell() ) )
+      col = cols[ name ]
+      if sys.byteorder == 'big' and col.itemsize > 1:
+        col = array( col.typecode, col )
+        col.byteswap()
+      f.write( col.tobytes() if hasattr( col, 'tobytes' ) else col.tostring() )
+    f.flush()
+    os.fsync( f.fileno() ) # on disk before it replaces the old one, callers drop the journal next
+  os.rename( tmpName, fileName )
+  syncDir( os.path.dirname( os.path.abspath( fileName ) ) )
+
+def syncDir( dirName ):
+  # Make a rename in dirName survive a power loss, where directories can be opened ( not Windows ).
+  try:
+    fd = os.open( dirName, os.O_RDONLY )
+  except OSError:
+    return
+  try:
+    os.fsync( fd )
+  except OSError:
+    pass
+  finally:
+    os.close( fd )
+
+class songFile( object ):
+  '''
+  A binary song file, memory mapped. column( name ) gives a section as an array like object without
+  reading the rest of the file.
+  '''
+
+  def __init__( self, fileName ):
+    self.fileName = fileName
+    with open( fileName, 'rb' ) as f:
+      try:
+        self.buf = mmap.mmap( f.fileno(), 0, access=mmap.ACCESS_READ )
+      except ( ValueError, mmap.error ): # empty file, or no mmap here
+        self.buf = f.read()
+
+    if len( self.buf ) < HEADER.size or self.buf[ 0 : 4 ] != MAGIC:
+      raise formatError( "Not a binary song file: " + fileName )
+    magic, self.version, self.tuningIndex, nameIx, annIx, numSections = HEADER.unpack_from( self.buf, 0 )
+    if self.version not in VERSIONS:
+      raise formatError( "Unsupported song file version %d: %s" % ( self.version, fileName ) )
+
+    self.directory = {}
+    for ix, ( name, code ) in enumerate( SECTIONS[ : numSections ] ):
+      self.directory[ name ] = DIR_ENTRY.unpack_from( self.buf, HEADER.size + ix * DIR_ENTRY.size )
+    self.columns = {}
+
+    self.songName = self.string( nameIx )
+    self.annotation = self.string( annIx )
+
+  def column( self, name ):
+    col = self.columns.get( name )
+    if col is None:
+      code = dict( SECTIONS )[ name ]
+      offset, count = self.directory.get( name, ( 0, 0 ) )
+      size = array( code ).itemsize
+      if count and sys.byteorder == 'little' and sys.version_info[ 0 ] >= 3:
+        col = memoryview( self.buf )[ offset : offset + count * size ].cast( code ) # in place
+      else:
+        col = array( code )
+        data = self.buf[ offset : offset + count * size ]
+        if hasattr( col, 'frombytes' ):
+          col.frombytes( data )
+        else:
+          col.fromstring( data ) # python 2
+        if sys.byteorder == 'big' and size > 1:
+          col.byteswap()
+      self.columns[ name ] = col
+    return col
+
+  def string( self, ix ):
+    if ix < 0:
+      return None
+    offsets = self.column( 'stringOffsets' )
+    data = self.column( 'stringData' )
+    return bytes( data[ offsets[ ix ] : offsets[ ix + 1 ] ] ).decode( 'utf-8' )
+
+  def numTracks( self ):
+    return len( self.column( 'trackMeasures' ) ) - 1
+
+  def trackMeasures( self, track ):
+    # Range of measure indexes for track, 0 based.
+    tm = self.column( 'trackMeasures' )
+    return tm[ track ], tm[ track + 1 ]
+
+  def measureState( self, m ):
+    # measureState() of measure m, a global measure index, read from the columns.
+    flags = self.column( 'measureFlags' )[ m ]
+    if not flags & PRESENT:
+      return None
+    mb, bn = self.column( 'measureBeats' ), self.column( 'beatNotes' )
+    beatFlags, beatAnn = self.column( 'beatFlags' ), self.column( 'beatAnn' )
+    strings, frets, types = self.column( 'noteString' ), self.column( 'noteFret' ), self.column( 'noteType' )
+    partNotes = self.column( 'partNotes' )
+    timelineBeats = mb[ self.trackMeasures( 0 )[ 1 ] ] # beats of the first track, each track has notes for
+    extraParts = ( len( partNotes ) - 1 ) // timelineBeats if len( partNotes ) and timelineBeats else 0
+    notes = lambda first, last: tuple( ( strings[ n ], frets[ n ], types[ n ] ) for n in range( first, last ) )
+    beats = []
+    for b in range( mb[ m ], mb[ m + 1 ] ):
+      if beatFlags[ b ] & PRESENT:
+        parts = [ notes( bn[ b ], bn[ b + 1 ] ) ]
+        for part in range( extraParts ):
+          ix = part * timelineBeats + b
+          parts.append( notes( partNotes[ ix ], partNotes[ ix + 1 ] ) )
+        while len( parts ) > 1 and not parts[ -1 ]:
+          parts.pop()
+        beats.append( ( self.string( beatAnn[ b ] ), ) + tuple( parts ) )
+      else:
+        beats.append( None )
+    return ( flags & ~PRESENT, self.string( self.column( 'measureAnn' )[ m ] ), tuple( beats ) )
+
+  def measureBeatCount( self, m ):
+    # Beats in measure m, a global measure index, 0 for a missing measure.
+    if not self.column( 'measureFlags' )[ m ] & PRESENT:
+      return 0
+    mb = self.column( 'measureBeats' )
+    return mb[ m + 1 ] - mb[ m ]
+
+  def decodeMeasure( self, m ):
+    # Measure m, a global measure index, as a pytabMeasure or None.
+    return measureFromState( self.measureState( m ) )
+
+  def decodeSong( self, lazy=False ):
+    '''
+    The song. If lazy measures are only read as they're used, see lazyTrack, and the file has to stay
+    open.
+    '''
+    song = pytabSong( self.songName )
+    song.tuningIndex = self.tuningIndex
+    song.annotation = self.annotation
+    seq = self.column( 'journalSeq' )
+    song.journalSeq = seq[ 0 ] if len( seq ) else 0
+    for t in range( self.numTracks() ):
+      name = self.string( self.column( 'trackName' )[ t ] )
+      first, last = self.trackMeasures( t )
+      if t and first == last: # the first track's measures, notes are in partNotes
+        track = song.addTrack( name=name )
+      elif lazy and not t:
+        track = song.set( lazyTrack( self, name, first, last ) )
+      else:
+        track = pytabTrack( name )
+        for m in range( first, last ):
+          track.set( self.decodeMeasure( m ) )
+        if t: # version 1, measures of its own
+          track = mergeTrack( song, track )
+        else:
+          song.set( track )
+      track.annotation = self.string( self.column( 'trackAnn' )[ t ] )
+    return song
+
+  def close( self ):
+    self.columns = {} # views into the map have to go before it can close
+    if isinstance( self.buf, mmap.mmap ):
+      self.buf.close()
+
+###############
+# Lazy tracks #
+###############
+
+PREFETCH = 8     # measures read ahead / behind the ones shown
+MAX_LOADED = 64  # read measures kept before unchanged ones out of view are dropped
+
+class measureRef( object ):
+  # Stands in for a measure that hasn't been read from the file yet.
+  __slots__ = ( 'index', )
+
+  def __init__( self, index ):
+    self.index = index
+
+class lazyTrack( pytabTrack ):
+  '''
+  A track whose measures are read from a memory mapped songFile when first asked for, so opening a song
+  doesn't depend on its length. view() reads the measures around the ones shown and drops measures out
+  of view again, if they still match the file, so memory stays flat while scrolling.
+  '''
+  __slots__ = ( 'songFile', 'loaded' )
+
+  def __init__( self, songFile, name, first, last ):
+    pytabTrack.__init__( self, name )
+    self.songFile = songFile
+    self.objects = [ measureRef( m ) for m in range( first, last ) ]
+    self.loaded = {} # id( measure ) -> ( measure, file index ) for measures read from the file
+
+  def get( self, index=None ):
+    if not index:
+      for ix in range( 1, self.count() + 1 ):
+        self.get( ix )
+      return self.objects
+
+    measure = pytabTrack.get( self, index )
+    if isinstance( measure, measureRef ):
+      fileIndex = measure.index
+      measure = self.objects[ index - 1 ] = self.songFile.decodeMeasure( fileIndex )
+      if measure is not None:
+        self.loaded[ id( measure ) ] = ( measure, fileIndex )
+    return measure
+
+  def beatCount( self, index ):
+    if index >= 1 and index <= self.count() and isinstance( self.objects[ index - 1 ], measureRef ):
+      return self.songFile.measureBeatCount( self.objects[ index - 1 ].index )
+    return pytabTrack.beatCount( self, index )
+
+  def prefetch( self, first, last ):
+    for ix in range( max( 1, first ), min( last, self.count() ) + 1 ):
+      self.get( ix )
+
+  def evict( self, first, last ):
+    # Put back placeholders for read measures outside first..last that haven't been changed.
+    positions = {}
+    for ix, measure in enumerate( self.objects, 1 ):
+      if id( measure ) in self.loaded:
+        positions[ id( measure ) ] = ix
+    for key, ( measure, fileIndex ) in list( self.loaded.items() ):
+      ix = positions.get( key )
+      if ix is None: # deleted
+        del self.loaded[ key ]
+      elif ( ix < first or ix > last ) and measureState( measure ) == self.songFile.measureState( fileIndex ):
+        self.objects[ ix - 1 ] = measureRef( fileIndex )
+        del self.loaded[ key ]
+
+  def view( self, first, last ):
+    # Measures first..last are about to be shown.
+    self.prefetch( first - PREFETCH, last + PREFETCH )
+    if len( self.loaded ) > MAX_LOADED:
+      self.evict( first - PREFETCH, last + PREFETCH )
+
+def isBinary( fileName ):
+  with open( fileName, 'rb' ) as f:
+    return f.read( len( MAGIC ) ) == MAGIC
+
+#######################
+# Pickled song files. #
+#######################
+
+LEGACY_CLASSES = ( 'pytabContainer', 'pytabNote', 'pytabBeat', 'pytabMeasure', 'pytabTrack', 'pytabSong' )
+
+class legacyObject( object ):
+  # Stands in for the classes pickled songs refer to, the attributes are all we need.
+  pass
+
+_legacyTypes = dict( ( name, type( name, ( legacyObject, ), {} ) ) for name in LEGACY_CLASSES )
+
+class legacyUnpickler( pickle.Unpickler ):
+  # Old songs refer to __main__.pytabSong etc, whatever script saved them.
+
+  def find_class( self, module, name ):
+    if name in _legacyTypes:
+      return _legacyTypes[ name ]
+    return pickle.Unpickler.find_class( self, module, name )
+
+def _legacyObjects( o ):
+  return getattr( o, 'objects', [] )
+
+def fromLegacy( old ):
+  ''' Build a song from an unpickled legacy one. '''
+  song = pytabSong( getattr( old, 'songName', None ) )
+  song.tuningIndex = getattr( old, 'tuningIndex', 0 )
+  song.annotation = getattr( old, 'annotation', None )
+  for oldTrack in _legacyObjects( old ):
+    if oldTrack is None:
+      song.addTrack( name=None )
+      continue
+    track = pytabTrack( getattr( oldTrack, 'trackName', "Track" ) )
+    track.annotation = getattr( oldTrack, 'annotation', None )
+    for oldMeasure in _legacyObjects( oldTrack ):
+      if oldMeasure is None:
+        track.set( None )
+        continue
+      measure = track.set( pytabMeasure() )
+      measure.pageBreak = bool( getattr( oldMeasure, 'pageBreak', False ) )
+      measure.repeat = bool( getattr( oldMeasure, 'repeat', False ) )
+      measure.annotation = getattr( oldMeasure, 'annotation', None )
+      for oldBeat in _legacyObjects( oldMeasure ):
+        if oldBeat is None:
+          measure.set( None )
+          continue
+        beat = measure.set( pytabBeat() )
+        beat.annotation = getattr( oldBeat, 'annotation', None )
+        for n in _legacyObjects( oldBeat ):
+          if n is not None:
+            beat.addNote( n.string, n.fret, n.noteType )
+    if song.count():
+      mergeTrack( song, track )
+    else:
+      song.set( track )
+  return song
+
+def readLegacy( fileName ):
+  with open( fileName, 'rb' ) as f:
+    if sys.version_info[ 0 ] >= 3:
+      old = legacyUnpickler( f, encoding='latin1' ).load() # python 2 pickles
+    else:
+      old = legacyUnpickler( f ).load()
+  return fromLegacy( old )
+
+def readSong( fileName, lazy=False ):
+  '''
+  Load a song file, binary or pickled. A lazy binary song keeps the file mapped and reads measures as
+  they're used.
+  '''
+  if not isBinary( fileName ):
+    return readLegacy( fileName )
+  sf = songFile( fileName )
+  if lazy:
+    return sf.decodeSong( lazy=True )
+  try:
+    return sf.decodeSong()
+  finally:
+    sf.close()
+
+def convert( fileName, keepBackup=True ):
+  ''' Rewrite a pickled song file in the binary format. Returns False if it already was. '''
+  if isBinary( fileName ):
+    return False
+  song = readLegacy( fileName )
+  if keepBackup:
+    backup = fileName + ".pickle"
+    with open( fileName, 'rb' ) as src:
+      with open( backup, 'wb' ) as dst:
+        dst.write( src.read() )
+  writeSong( song, fileName )
+  return True
+
+if __name__ == '__main__':
+  import argparse
+
+  parser = argparse.ArgumentParser( description="Convert pickled .pytab songs to the binary format." )
+  parser.add_argument( 'files', nargs='+', help="song files" )
+  parser.add_argument( '-n', '--no-backup', action='store_true', help="don't keep the pickle as <file>.pickle" )
+  args = parser.parse_args()
+
+  for fileName in args.files:
+    try:
+      print( ( "Converted " if convert( fileName, not args.no_backup ) else "Already binary " ) + fileName )
+    except Exception as e:
+      print( "Failed %s: %s" % ( fileName, e ) )
@@ -0,0 +1,119 @@
+'''
+Batch import of MIDI and MusicXML files into .pytab songs, run as tab.py --import.
+
+  python tab.py --import                     # every .mid / .midi / .xml / .musicxml / .mxl in .
+  python tab.py --import -o songs library/ -j 4
+
+Files are converted across a process pool into <file>.pytab next to the file or in --out. A file is skipped if
+its song is newer or it's XML but not a score, and a song with a journal ( unsaved edits ) is never replaced.
+'''
+
+from __future__ import print_function
+import os, glob, time, argparse, multiprocessing
+
+from pytabModel import songExt
+import pytabFile, pytabEdit, pytabRender, pytabMidi, pytabMusicXml
+
+READERS = [ ( ext, pytabMidi.readMidi ) for ext in pytabMidi.MIDI_EXTS ] + \
+          [ ( ext, pytabMusicXml.readScore ) for ext in pytabMusicXml.XML_EXTS ]
+
+def reader( fileName ):
+  # The function that reads fileName, by its extension, None if it isn't one we read.
+  for ext, read in READERS:
+    if fileName.lower().endswith( ext ):
+      return read
+  return None
+
+def findFiles( paths ):
+  # Files we can read named by paths, directories are searched.
+  files = []
+  for path in paths:
+    if os.path.isdir( path ):
+      found = [ f for f in glob.glob( os.path.join( path, "*" ) ) if reader( f ) ]
+    else:
+      found = glob.glob( path )
+    for f in sorted( found ):
+      if f not in files:
+        files.append( f )
+  return files
+
+def songFileName( fileName, outDir=None ):
+  base = os.path.splitext( os.path.basename( fileName ) )[ 0 ]
+  return os.path.join( outDir or os.path.dirname( fileName ), base + songExt )
+
+def importJob( job ):
+  ''' Convert one file. Runs in a worker process. Returns ( file, measures, error or None, skipped ). '''
+  fileName, songFile, tuningIndex, grid = job
+  try:
+    read = reader( fileName )
+    if read is None:
+      raise IOError( "Not a MIDI or MusicXML file." )
+    if any( os.path.exists( j ) for j in pytabEdit.journalFiles( songFile ) ):
+      raise IOError( songFile + " has unsaved edits, not replaced." )
+    song = read( fileName, os.path.basename( songFile )[ : -len( songExt ) ], tuningIndex, grid )
+    pytabFile.writeSong( song, songFile )
+  except pytabMusicXml.notScore as e:
+    return fileName, 0, "%s" % ( e, ), True
+  except Exception as e: # a bad file mustn't stop the rest
+    return fileName, 0, "%s" % ( e, ), False
+  return fileName, song.get( 1 ).count(), None, False
+
+def main( argv ):
+  parser = argparse.ArgumentParser( prog="tab.py --import", description="Convert MIDI and MusicXML files to songs." )
+  parser.add_argument( 'paths', nargs='*', default=[ "." ], help="files, patterns or directories, default ." )
+  parser.add_argument( '-o', '--out', help="output directory, default next to each file" )
+  parser.add_argument( '-g', '--tuning', default=pytabRender.tunings[ 0 ],
+                       help="for files without one we know, from: " + ", ".join( pytabRender.tunings ) )
+  parser.add_argument( '--grid', type=int, default=pytabMidi.GRID,
+                       help="tab beats a whole note, default %d ( eighths )" % ( pytabMidi.GRID ) )
+  parser.add_argument( '-j', '--jobs', type=int, default=multiprocessing.cpu_count() )
+  parser.add_argument( '--force', action='store_true', help="convert even if the song is newer" )
+  args = parser.parse_args( argv )
+
+  if args.tuning not in pytabRender.tunings:
+    parser.error( "Unknown tuning: " + args.tuning )
+  if args.grid < 1:
+    parser.error( "Grid must be at least 1." )
+  if args.out and not os.path.isdir( args.out ):
+    os.makedirs( args.out )
+
+  start = time.time()
+  files = findFiles( args.paths )
+  jobs = []
+  songFiles = {} # song file -> the file it's made from, ex: song.mid and song.xml can't both be song.pytab
+  failed = []
+  for fileName in files:
+    songFile = songFileName( fileName, args.out )
+    if songFile in songFiles:
+      failed.append( fileName )
+      print( "Skipped %s: %s is made from %s." % ( fileName, songFile, songFiles[ songFile ] ) )
+      continue
+    songFiles[ songFile ] = fileName
+    if args.force or not os.path.exists( songFile ) or os.path.getmtime( songFile ) < os.path.getmtime( fileName ):
+      jobs.append( ( fileName, songFile, pytabRender.tunings.index( args.tuning ), args.grid ) )
+
+  converted = skipped = measures = bytesIn = 0
+  if jobs:
+    bytesIn = sum( os.path.getsize( j[ 0 ] ) for j in jobs )
+    pool = multiprocessing.Pool( max( 1, min( args.jobs, len( jobs ) ) ) )
+    try:
+      for fileName, count, error, notSong in pool.imap_unordered( importJob, jobs, chunksize=4 ):
+        if notSong:
+          skipped += 1
+          print( "Skipped %s: %s" % ( fileName, error ) )
+        elif error:
+          failed.append( fileName )
+          print( "Failed %s: %s" % ( fileName, error ) )
+        else:
+          converted += 1
+          measures += count
+    finally:
+      pool.close()
+      pool.join()
+
+  elapsed = max( time.time() - start, 0.001 )
+  print( "%d files, %d converted, %d up to date, %d skipped, %d failed." %
+         ( len( files ), converted, len( songFiles ) - len( jobs ), skipped, len( failed ) ) )
+  print( "%.2fs, %.1f files/s, %.0f measures/s, %.1f KB/s read." %
+         ( elapsed, len( jobs ) / elapsed, measures / elapsed, bytesIn / 1024.0 / elapsed ) )
+  return 1 if failed else 0
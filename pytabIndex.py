@@ -0,0 +1,125 @@
+'''
+Where beats are in a track, for tab.py's cursor and display window.
+
+beatIndex keeps the beat count of every measure and a Fenwick tree ( binary indexed tree ) of the columns
+each measure takes in the display, its beats plus the bar after it. So a measure's first column, the
+measure holding a song wide beat number or where the display has to start to show a measure are all
+O( log n ) without looking at any measures. Lazily loaded measures are counted from the file, not read.
+
+The index follows a songEditor's edits ( update() is an editor listener ). An edit inside a measure is a
+point update, adding or removing a measure shifts the counts and rebuilds the tree, O( n ) but only arithmetic.
+'''
+
+from array import array
+
+class beatIndex( object ):
+
+  def __init__( self, song, trackNumber=1 ):
+    self.song = song
+    self.trackNumber = trackNumber
+    self.rebuild()
+
+  def rebuild( self ):
+    track = self.song.get( self.trackNumber )
+    self.counts = array( 'H', [ track.beatCount( m ) for m in range( 1, track.count() + 1 ) ] )
+    self._build()
+
+  def _build( self ):
+    n = len( self.counts )
+    tree = [ 0 ] * ( n + 1 )
+    for i in range( 1, n + 1 ):
+      tree[ i ] += self.counts[ i - 1 ] + 1
+      j = i + ( i & -i )
+      if j <= n:
+        tree[ j ] += tree[ i ]
+    self.tree = tree
+
+  def _add( self, m, delta ):
+    while m < len( self.tree ):
+      self.tree[ m ] += delta
+      m += m & -m
+
+  def update( self, op ):
+    # An edit was applied, see pytabEdit for the operations. Tracks share measures, any track's edit counts.
+    name = op[ 0 ]
+    if name in ( 'tuning', 'songName', 'addTrack', 'popTrack', 'moveTrack' ):
+      return
+    track = self.song.get( self.trackNumber )
+    m = op[ 2 ]
+    n = len( self.counts )
+    if name == 'popMeasure':
+      if m >= 1 and m <= n:
+        self.counts.pop( m - 1 )
+        self._build()
+    elif name == 'setMeasure':
+      insert = op[ 4 ]
+      if m is None:
+        self.counts.append( track.beatCount( n + 1 ) )
+        self._build()
+      elif m > n: # padded with empty measures
+        self.rebuild()
+      elif insert:
+        self.counts.insert( m - 1, track.beatCount( m ) )
+        self._build()
+      else:
+        self._set( m, track.beatCount( m ) )
+    else:
+      self._set( m, track.beatCount( m ) )
+    if len( self.counts ) != track.count(): # shouldn't happen, but don't drift
+      self.rebuild()
+
+  def _set( self, m, count ):
+    delta = count - self.counts[ m - 1 ]
+    if delta:
+      self.counts[ m - 1 ] = count
+      self._add( m, delta )
+
+  def measures( self ):
+    return len( self.counts )
+
+  def beats( self, m ):
+    # Beats in measure m, 0 past the end.
+    return self.counts[ m - 1 ] if m >= 1 and m <= len( self.counts ) else 0
+
+  def columns( self, m ):
+    # Display columns of measures 1..m, a column per beat and one per bar.
+    m = min( m, len( self.counts ) )
+    total = 0
+    while m > 0:
+      total += self.tree[ m ]
+      m -= m & -m
+    return total
+
+  def beatNumber( self, m, b ):
+    # Song wide number of beat b in measure m, 1 based.
+    return self.columns( m - 1 ) - ( m - 1 ) + b
+
+  def _search( self, below ):
+    # The last m with below( columns( m ), m ) true, 0 if none. below has to go from true to false once.
+    m, total = 0, 0
+    step = 1
+    while step * 2 < len( self.tree ):
+      step *= 2
+    while step:
+      nxt = m + step
+      if nxt < len( self.tree ) and below( total + self.tree[ nxt ], nxt ):
+        m = nxt
+        total += self.tree[ nxt ]
+      step //= 2
+    return m
+
+  def locate( self, beat ):
+    # ( measure, beat ) of song wide beat number beat, None if there's no such beat.
+    m = self._search( lambda cols, m: cols - m < beat ) + 1 # beats in measures 1..m are cols - m
+    if m > len( self.counts ):
+      return None
+    b = beat - self.beatNumber( m, 0 )
+    return ( m, b ) if b <= self.counts[ m - 1 ] else None
+
+  def firstShown( self, m, width ):
+    # The first measure to display so measures from it through m take less than width columns, not
+    # counting m's bar. m is always shown.
+    limit = self.columns( m - 1 ) + self.beats( m ) - width # shown measures start after this many columns
+    if limit < 0:
+      return 1
+    return min( self._search( lambda cols, j: cols <= limit ) + 2, m )
@@ -0,0 +1,386 @@
+'''
+Standard MIDI Files to and from songs, for trading tab with other music software.
+
+writeMidi() saves a song as a format 1 file: a conductor track with the tempo, a time signature wherever the
+measure length changes and the annotations ( markers for measures, text events for beats ), then a track per
+tab track. A tab beat is an eighth note. Notes ring until the next note on their string, MIDI has no hammer
+ons, pull offs or slides so they're only played softer. Measures are written as notated, repeats aren't
+unrolled.
+
+readMidi() goes the other way. Note ons are quantized to a grid of tab beats ( eighths by default ) and
+measures follow the time signatures. Each MIDI track and channel it plays on, drums aside, becomes a tab
+track, the first MAX_TRACKS of them. MIDI only has pitches: fingerings() lists the ways a beat's notes can be
+played on the tuning and fretTrack() picks one per beat by dynamic programming over hand positions so the
+hand moves as little as it can.
+
+  python tab.py --import songs.mid    # MIDI files to .pytab, see pytabImport
+  python tab.py --export -f mid       # songs to MIDI
+'''
+
+import struct, bisect
+
+from pytabModel import *
+import pytabRender
+
+MIDI_EXTS = ( ".mid", ".midi" )
+
+PPQ = 480              # ticks a quarter note, written
+BEAT_TICKS = PPQ // 2  # a tab beat is an eighth note
+TEMPO = 240            # tab beats a minute, as pytabAudio plays them
+PROGRAM = 25           # General MIDI steel string guitar, 0 based
+VELOCITY = 96
+LEGATO_VELOCITY = 64   # hammer ons, pull offs and slides aren't picked
+RING_BEATS = 8         # beats a note rings if nothing on its string stops it
+DRUMS = 9              # General MIDI percussion channel, not read
+
+GRID = 8               # note ons are read to 1 / GRID of a whole note, a tab beat
+MAX_FRET = 24
+MAX_SPAN = 4           # frets between the lowest and highest fretted notes a hand reaches comfortably
+MOVE_COST = 1.0        # moving the hand a fret
+SPAN_COST = 0.1        # a fret of stretch
+REACH_COST = 4.0       # a fret of stretch past MAX_SPAN, a second hand / barely playable
+HIGH_COST = 0.1        # a fret up the neck, low positions are easier to read
+FINGERING_CACHE = 4096 # chords kept, songs repeat chords a lot
+
+class midiError( Exception ):
+  pass
+
+# Writing
+
+def _varLen( n ):
+  # A variable length quantity, 7 bits a byte, high bit set on all but the last.
+  out = bytearray( [ n & 0x7f ] )
+  n >>= 7
+  while n:
+    out.insert( 0, ( n & 0x7f ) | 0x80 )
+    n >>= 7
+  return out
+
+def _meta( kind, data ):
+  return bytearray( [ 0xff, kind ] ) + _varLen( len( data ) ) + bytearray( data )
+
+def _text( kind, text ):
+  return _meta( kind, bytearray( text.encode( 'utf-8' ) ) )
+
+def _chunk( kind, data ):
+  return kind + struct.pack( '>I', len( data ) ) + bytes( data )
+
+def _trackChunk( events, end=0 ):
+  # events are ( tick, order, event bytes ). order sorts events at the same tick, note offs before note ons.
+  # The track ends at tick end or its last event.
+  data = bytearray()
+  now = 0
+  for tick, order, event in sorted( events, key=lambda e: ( e[ 0 ], e[ 1 ] ) ):
+    data += _varLen( tick - now ) + event
+    now = tick
+  data += _varLen( max( end - now, 0 ) ) + _meta( 0x2f, b'' )
+  return _chunk( b'MTrk', data )
+
+def songEvents( song, tempo=TEMPO ):
+  '''
+  ( conductor events, [ events of each track ], ticks ) of song, events are ( tick, order, event bytes ), ticks
+  is the song's length.
+  '''
+  pitches = pytabRender.tuningPitches( song.tuningIndex )
+  tracks = song.get()
+  conductor = [ ( 0, 0, _text( 0x03, song.songName or "" ) ),
+                ( 0, 0, _meta( 0x51, struct.pack( '>I', int( 120e6 / tempo ) )[ 1 : ] ) ) ]
+  parts = [ [ ( 0, 0, _text( 0x03, track.trackName or "" ) ),
+              ( 0, 0, bytearray( [ 0xc0 | channel, PROGRAM ] ) ) ] for channel, track in enumerate( tracks ) ]
+
+  ringing = {} # ( channel, string ) -> ( tick, pitch ) of the note sounding
+  maxRing = RING_BEATS * BEAT_TICKS
+  meter = None
+  tick = 0
+  for m in range( 1, tracks[ 0 ].count() + 1 ):
+    tracks[ 0 ].view( m, m + 1 )
+    measures = [ track.get( m ) for track in tracks ]
+    beats = tracks[ 0 ].beatCount( m )
+    if max( beats, 1 ) != meter: # n / 8, an empty measure is a beat of rest
+      meter = max( beats, 1 )
+      conductor.append( ( tick, 0, _meta( 0x58, [ meter, 3, 24, 8 ] ) ) )
+    if measures[ 0 ] is not None and measures[ 0 ].annotation:
+      conductor.append( ( tick, 1, _text( 0x06, measures[ 0 ].annotation ) ) )
+    for b in range( 1, beats + 1 ):
+      for channel, measure in enumerate( measures ):
+        beat = measure.get( b ) if measure is not None else None
+        if beat is None:
+          continue
+        if channel == 0 and beat.annotation:
+          conductor.append( ( tick, 1, _text( 0x01, beat.annotation ) ) )
+        for note in beat.get():
+          if note is None:
+            continue
+          key = ( channel, note.string )
+          if key in ringing:
+            start, pitch = ringing.pop( key )
+            parts[ channel ].append( ( min( tick, start + maxRing ), 1, bytearray( [ 0x80 | channel, pitch, 0 ] ) ) )
+          pitch = pitches[ note.string - 1 ] + note.fret
+          velocity = VELOCITY if note.noteType == NOTE_NORMAL else LEGATO_VELOCITY
+          parts[ channel ].append( ( tick, 2, bytearray( [ 0x90 | channel, pitch, velocity ] ) ) )
+          ringing[ key ] = ( tick, pitch )
+      tick += BEAT_TICKS
+    if not beats:
+      tick += BEAT_TICKS
+
+  for ( channel, string ), ( start, pitch ) in ringing.items():
+    parts[ channel ].append( ( min( tick, start + maxRing ), 1, bytearray( [ 0x80 | channel, pitch, 0 ] ) ) )
+  return conductor, parts, tick
+
+def writeMidi( song, fileName, tempo=TEMPO ):
+  ''' Save song as a format 1 MIDI file. '''
+  conductor, parts, ticks = songEvents( song, tempo )
+  with open( fileName, 'wb' ) as f:
+    f.write( _chunk( b'MThd', struct.pack( '>HHH', 1, 1 + len( parts ), PPQ ) ) )
+    for events in [ conductor ] + parts:
+      f.write( _trackChunk( events, ticks ) )
+
+# Reading
+
+def _readVarLen( data, pos ):
+  n = 0
+  while True:
+    c = data[ pos ]
+    pos += 1
+    n = ( n << 7 ) | ( c & 0x7f )
+    if c < 0x80:
+      return n, pos
+
+def chunks( data ):
+  # ( type, start, end ) of each chunk in data, a bytearray.
+  pos = 0
+  while pos + 8 <= len( data ):
+    length = struct.unpack( '>I', bytes( data[ pos + 4 : pos + 8 ] ) )[ 0 ]
+    yield bytes( data[ pos : pos + 4 ] ), pos + 8, min( pos + 8 + length, len( data ) )
+    pos += 8 + length
+
+def trackEvents( data, start, end ):
+  '''
+  ( channels, note ons, metas ) of the track in data[ start : end ]. channels are those with events, in the
+  order they're first used. Note ons are ( tick, channel, pitch ), metas are ( tick, type, data ). Everything
+  else is skipped.
+  '''
+  channels, notes, metas = [], [], []
+  tick = 0
+  status = 0
+  pos = start
+  while pos < end:
+    delta, pos = _readVarLen( data, pos )
+    tick += delta
+    if data[ pos ] & 0x80:
+      status = data[ pos ]
+      pos += 1
+    elif not status:
+      raise midiError( "Data byte without a status at %d." % ( pos ) )
+
+    if status == 0xff:
+      kind = data[ pos ]
+      length, pos = _readVarLen( data, pos + 1 )
+      metas.append( ( tick, kind, bytes( data[ pos : pos + length ] ) ) )
+      pos += length
+      status = 0 # no running status after meta and sysex events
+      if kind == 0x2f:
+        break
+    elif status in ( 0xf0, 0xf7 ):
+      length, pos = _readVarLen( data, pos )
+      pos += length
+      status = 0
+    elif status > 0xf0:
+      raise midiError( "Unexpected status 0x%x at %d." % ( status, pos ) )
+    else:
+      kind = status & 0xf0
+      if status & 0x0f not in channels:
+        channels.append( status & 0x0f )
+      if kind == 0x90 and data[ pos + 1 ]: # velocity 0 is a note off
+        notes.append( ( tick, status & 0x0f, data[ pos ] ) )
+      pos += 1 if kind in ( 0xc0, 0xd0 ) else 2
+  return channels, notes, metas
+
+def measureGrid( metas, division, grid, end ):
+  '''
+  The measures before tick end as the time signatures in metas have them, [ ( start tick, first step, steps ) ].
+  A step is a tab beat, 1 / grid of a whole note. A signature change takes effect at the next measure, measures
+  longer than MAX_BEATS_PER_MEAS steps are split.
+  '''
+  signatures = sorted( ( tick, bytearray( d ) ) for tick, kind, d in metas if kind == 0x58 and len( d ) >= 2 )
+  step = division * 4.0 / grid
+  measures = []
+  num, den = 4, 2
+  ix = 0
+  tick, first = 0.0, 0
+  while tick < end or not measures:
+    while ix < len( signatures ) and signatures[ ix ][ 0 ] < tick + step / 2:
+      num, den = max( 1, signatures[ ix ][ 1 ][ 0 ] ), signatures[ ix ][ 1 ][ 1 ]
+      ix += 1
+    length = num * division * 4.0 / 2 ** den
+    steps = max( 1, int( round( length / step ) ) )
+    for s in range( 0, steps, MAX_BEATS_PER_MEAS ):
+      n = min( MAX_BEATS_PER_MEAS, steps - s )
+      measures.append( ( tick + s * step, first, n ) )
+      first += n
+    tick += length
+  return measures
+
+_fingerings = {}
+
+def _place( chord, opens, i, placed, found ):
+  # Put chord[ i: ] on strings placed hasn't used, keep the cheapest result for each hand position in found.
+  frets = [ f for s, f in placed if f ]
+  if i == len( chord ):
+    position = min( frets ) if frets else 0
+    span = max( frets ) - position if frets else 0
+    cost = span * SPAN_COST + max( 0, span - MAX_SPAN ) * REACH_COST + position * HIGH_COST
+    if position not in found or cost < found[ position ][ 0 ]:
+      found[ position ] = ( cost, placed )
+    return
+  used = [ s for s, f in placed ]
+  for string, open in enumerate( opens, 1 ):
+    fret = chord[ i ] - open
+    if string in used or fret < 0 or fret > MAX_FRET:
+      continue
+    _place( chord, opens, i + 1, placed + ( ( string, fret ), ), found )
+
+def fingerings( chord, opens ):
+  '''
+  The ways to play the pitches in chord on open strings opens, { hand position : ( cost, ( ( string, fret ), .. ) ) }
+  with the cheapest for each position. The position is the lowest fretted fret, 0 if only open strings are played.
+  '''
+  key = ( chord, opens )
+  found = _fingerings.get( key )
+  if found is None:
+    found = {}
+    _place( chord, opens, 0, (), found )
+    if len( _fingerings ) >= FINGERING_CACHE:
+      _fingerings.clear()
+    _fingerings[ key ] = found
+  return found
+
+def playable( pitches, opens ):
+  '''
+  The notes of pitches that can be played together, high to low. Notes off the neck are moved an octave at a
+  time onto it. Notes from the second lowest up are dropped until the rest each have a string.
+  '''
+  low, high = min( opens ), max( opens ) + MAX_FRET
+  chord = set()
+  for p in pitches:
+    while p < low:
+      p += 12
+    while p > high:
+      p -= 12
+    chord.add( p )
+  chord = sorted( chord, reverse=True )
+  while len( chord ) > 1 and ( len( chord ) > len( opens ) or not fingerings( tuple( chord ), opens ) ):
+    chord.pop( -2 ) # keep the top and bottom notes
+  return tuple( chord )
+
+def fretTrack( chords, opens ):
+  '''
+  A fingering, ( ( string, fret ), .. ), for each of chords, playable() tuples of pitches, with the hand moving
+  as little as it can. Dynamic programming over hand positions: cost maps each position the hand can be at
+  after the chords so far to the cheapest way there. A chord costs its fingering plus MOVE_COST a fret the hand
+  moved, only open strings leave the hand where it was. A chord has a few positions so it's a few dozen steps.
+  '''
+  cost = { None : 0.0 } # the hand starts anywhere
+  steps = [] # ( position -> fingering, position -> previous position ) of each chord
+  for chord in chords:
+    options = fingerings( chord, opens )
+    new, chosen, came = {}, {}, {}
+    if 0 in options: # open strings, the hand stays put
+      openCost, openPlaced = options[ 0 ]
+      for p, c in cost.items():
+        new[ p ], chosen[ p ], came[ p ] = c + openCost, openPlaced, p
+    for p, ( c, placed ) in options.items():
+      if not p:
+        continue
+      for q, total in cost.items():
+        total += c + ( MOVE_COST * abs( p - q ) if q is not None else 0.0 )
+        if p not in new or total < new[ p ]:
+          new[ p ], chosen[ p ], came[ p ] = total, placed, q
+    cost = new
+    steps.append( ( chosen, came ) )
+
+  p = min( cost, key=cost.get )
+  fingering = [ None ] * len( chords )
+  for i in range( len( chords ) - 1, -1, -1 ):
+    chosen, came = steps[ i ]
+    fingering[ i ] = chosen[ p ]
+    p = came[ p ]
+  return fingering
+
+def _decode( text ):
+  return text.decode( 'utf-8', 'replace' )
+
+def readMidi( fileName, name, tuningIndex=0, grid=GRID ):
+  ''' A pytabSong of MIDI file fileName, fretted for tunings[ tuningIndex ]. Raises midiError if it can't be read. '''
+  with open( fileName, 'rb' ) as f:
+    data = bytearray( f.read() )
+  found = list( chunks( data ) )
+  if not found or found[ 0 ][ 0 ] != b'MThd' or found[ 0 ][ 2 ] - found[ 0 ][ 1 ] < 6:
+    raise midiError( "Not a MIDI file: " + fileName )
+  division = struct.unpack( '>H', bytes( data[ found[ 0 ][ 1 ] + 4 : found[ 0 ][ 1 ] + 6 ] ) )[ 0 ]
+  if division & 0x8000 or not division:
+    raise midiError( "SMPTE timed files aren't supported: " + fileName )
+
+  parts = {} # ( MIDI track, channel ) -> [ ( tick, pitch ) ]
+  order = [] # parts in the order they're found
+  names = {}
+  metas = []
+  try:
+    for t, ( kind, start, end ) in enumerate( c for c in found[ 1 : ] if c[ 0 ] == b'MTrk' ):
+      channels, notes, trackMetas = trackEvents( data, start, end )
+      trackName = next( ( _decode( d ) for tick, k, d in trackMetas if k == 0x03 ), None )
+      for channel in channels:
+        if channel != DRUMS:
+          parts[ ( t, channel ) ] = []
+          order.append( ( t, channel ) )
+          names[ ( t, channel ) ] = trackName
+      for tick, channel, pitch in notes:
+        if channel != DRUMS:
+          parts[ ( t, channel ) ].append( ( tick, pitch ) )
+      metas += trackMetas
+  except IndexError:
+    raise midiError( "Truncated MIDI file: " + fileName )
+
+  order = order[ : MAX_TRACKS ]
+  step = division * 4.0 / grid
+  # Measures through the last note and the last end of track, less the half step a note would be rounded by.
+  end = max( [ tick + step / 2 + 1 for key in order for tick, pitch in parts[ key ][ -1 : ] ] +
+             [ tick - step / 2 for tick, kind, d in metas if kind == 0x2f ] or [ 0 ] ) # no notes, an empty song
+  measures = measureGrid( metas, division, grid, end )
+  starts = [ m[ 0 ] for m in measures ]
+
+  def locate( tick ):
+    # ( measure index, step ) of tick, rounded to the nearest step.
+    m = max( 0, bisect.bisect_right( starts, tick + step / 2 ) - 1 )
+    start, first, steps = measures[ m ]
+    return m, first + min( max( 0, int( round( ( tick - start ) / step ) ) ), steps - 1 )
+
+  song = pytabSong( name )
+  song.tuningIndex = tuningIndex
+  for n, key in enumerate( order or [ None ] ):
+    song.addTrack( name=names.get( key ) or "Track %d" % ( n + 1 ) )
+  timeline = song.get( 1 )
+  beats = [] # every step's beat
+  for start, first, steps in measures:
+    measure = timeline.addMeasure()
+    beats += [ measure.addBeat() for s in range( steps ) ]
+
+  for tick, kind, d in metas:
+    if kind == 0x06: # marker
+      m, s = locate( tick )
+      timeline.get( m + 1 ).annotation = _decode( d )
+    elif kind == 0x01:
+      m, s = locate( tick )
+      beats[ s ].annotation = _decode( d )
+
+  opens = tuple( pytabRender.tuningPitches( tuningIndex ) )
+  for part, key in enumerate( order ):
+    chords = {} # step -> pitches
+    for tick, pitch in parts[ key ]:
+      chords.setdefault( locate( tick )[ 1 ], [] ).append( pitch )
+    playing = sorted( chords )
+    for s, fingering in zip( playing, fretTrack( [ playable( chords[ s ], opens ) for s in playing ], opens ) ):
+      beat = pytabBeat( beats[ s ].store, beats[ s ].slot, part )
+      for string, fret in fingering:
+        beat.addNote( string, fret, NOTE_NORMAL )
+  return song
@@ -0,0 +1,535 @@
+'''
+The tab.py song model.
+
+A song is a list of tracks (e.g. guitar1, guitar2, bass)
+Each track is a list of measures.
+Each measure is a list of beats.
+Each beat is a list of simultaneous notes, empty list indicates a rest
+Each note is a value representing the fret and string
+
+Songs and tracks are plain containers. A measure keeps its beats in arrays instead of objects: each beat
+owns a slot of STRINGS note cells ( fret and note type packed in a byte ) and the measure keeps the slot
+order. Beats and notes handed out are small views / values over those arrays, so a long song is a couple of
+arrays per measure rather than objects per beat and note.
+
+Tracks share one timeline, the first track's measures and beats. Each measure keeps a cell array per track
+( a part ), indexed by the same slots, so adding a beat adds it to every track and adding a track adds
+nothing until it gets notes. Tracks after the first are partTracks, views of the first track's measures.
+
+Kept out of tab.py so the file format code and other tools can use it without the editor.
+'''
+
+from array import array
+
+songExt = ".pytab"
+
+NOTE_NORMAL = 0
+NOTE_HAMMER = 1
+NOTE_PULLOFF = 2
+NOTE_SLIDE = 3
+
+MAX_BEATS_PER_MEAS = 32
+MAX_TRACKS = 3
+MAX_MEASURES = 500
+
+STRINGS = 6         # note cells per beat slot, strings 1-6
+EMPTY_SLOT = array( 'B', [ 0 ] * STRINGS )
+FRET_MASK = 0x1f    # a note cell is fret + 1 in the low bits and the note type above, see packNote()
+TYPE_SHIFT = 5
+NO_BEAT = -1        # slot of a None beat
+
+'''
+  Wrapper around a list. This API is 1 based
+
+  API
+
+  set
+  get
+  pop
+  clr
+'''
+
+class pytabContainer( object ):
+  __slots__ = ( 'objects', 'annotation' )
+
+  def __init__( self ):
+    self.objects = []
+    self.annotation = None # place to allow comments
+
+  def set( self, obj, index=None, insert=False ):
+    # If index is none then append. Create if necessary.
+    if index is None and insert == True:
+      assert 0, "Must provide index to insert"
+
+    if index and index < 1:
+      assert 0, "Bad index."
+
+    if index:
+      index -= 1 # make 0 based, API is 1 based
+      # Add empty entries if necessary, ex: we're adding measure 10 to a new song.
+      while self.count() <= index:
+        self.objects.append( None )
+
+      if insert:
+        self.objects.insert( index, obj )
+      else:
+        self.objects[ index ] = obj
+    else:
+      self.objects.append( obj )
+
+    return obj
+
+  def get( self, index=None ):
+    # get an object list.
+    if index:
+      assert index > 0, "Index must be > 0."
+      if index > len( self.objects ):
+        return None
+      index -= 1 # make 0 based, API is 1 based.
+      return self.objects[ index ]
+    else:
+      return self.objects
+
+  def pop( self, index ):
+    if index < 1 or index > len( self.objects ):
+      return None
+
+    self.objects.pop( index - 1 )
+    return True
+
+  def clr( self, index ):
+    return( self.set( None, index ) )
+
+  def count( self ):
+    return len( self.objects )
+
+class pytabNote( object ):
+  # A value, changing one doesn't change the song. Set notes with pytabBeat.addNote()
+  __slots__ = ( 'string', 'fret', 'noteType' )
+
+  def __init__( self, string, fret, noteType ):
+    self.string = string
+    self.fret = fret
+    self.noteType = noteType
+
+def packNote( fret, noteType ):
+  # A note cell, 0 is no note.
+  return ( fret + 1 ) | ( noteType << TYPE_SHIFT )
+
+class pytabBeat( object ):
+  '''
+  A beat, a view of one slot of a measure's cells, notes are part's ( track - 1 ). pytabBeat() is a beat of
+  its own, not in a measure yet, measures copy beats they're given, every track's notes. A view is only good
+  while its beat is in the measure.
+  Notes are indexed by string, 1 based.
+  '''
+  __slots__ = ( 'store', 'slot', 'part' )
+
+  def __init__( self, store=None, slot=None, part=0 ):
+    if store is None:
+      store = pytabMeasure() # a measure just to hold this beat's cells
+      slot = store.allocSlot()
+    self.store = store
+    self.slot = slot
+    self.part = part
+
+  def _getAnnotation( self ):
+    return self.store.beatAnnotation( self.slot )
+
+  def _setAnnotation( self, annotation ):
+    self.store.setBeatAnnotation( self.slot, annotation )
+
+  annotation = property( _getAnnotation, _setAnnotation )
+
+  def set( self, obj, index=None, insert=False ):
+    assert index and not insert, "Notes are set by string."
+    cells = self.store.partCells( self.part )
+    cells[ self.slot * STRINGS + index - 1 ] = 0 if obj is None else packNote( obj.fret, obj.noteType )
+    return obj
+
+  def get( self, index=None ):
+    if index:
+      assert index > 0, "Index must be > 0."
+      if index > STRINGS:
+        return None
+      cell = self.store.partCells( self.part )[ self.slot * STRINGS + index - 1 ]
+      return pytabNote( index, ( cell & FRET_MASK ) - 1, cell >> TYPE_SHIFT ) if cell else None
+    # The notes by string, up to the highest string played.
+    return [ self.get( s ) for s in range( 1, self.count() + 1 ) ]
+
+  def pop( self, index ):
+    if index < 1 or index > self.count():
+      return None
+    self.set( None, index )
+    return True
+
+  def clr( self, index ):
+    return( self.set( None, index ) )
+
+  def count( self ):
+    cells = self.store.partCells( self.part )
+    base = self.slot * STRINGS
+    for s in range( STRINGS, 0, -1 ):
+      if cells[ base + s - 1 ]:
+        return s
+    return 0
+
+  def addNote( self, string, fret, noteType ):
+    assert string >= 1 and string <= 6, "Valid strings are 1-6" # tbd
+    assert fret >= 0 and fret <= 24, "Valid frets are 0-24" # tbd
+    return self.set( pytabNote( string, fret, noteType ), string )
+
+  def __deepcopy__( self, memo ):
+    beat = pytabBeat( part=self.part )
+    beat.store.copySlot( beat.slot, self.store, self.slot )
+    return beat
+
+class pytabMeasure( object ):
+  '''
+  The beats of a measure. Each beat has a slot of STRINGS note cells in each of parts, a cell array per
+  track, order has the slot of each beat, NO_BEAT for None. Slots of removed beats are reused.
+  Same 1 based API as pytabContainer, get() hands out pytabBeat views of the first track's notes, view()
+  gives the measure as another track sees it.
+  version counts edits to the measure ( pytabEdit bumps it ) so a display can tell when to redraw it.
+  '''
+  __slots__ = ( 'pageBreak', 'repeat', 'annotation', 'parts', 'order', 'beatAnnotations', 'freeSlots',
+                'version', 'views' )
+
+  def __init__( self ):
+    self.pageBreak = False
+    self.repeat = False
+    self.annotation = None
+    self.parts = [ array( 'B' ) ] # all the same length, parts are only added when a track gets notes
+    self.order = array( 'h' )
+    self.beatAnnotations = None # slot -> annotation, most measures don't have any
+    self.freeSlots = None
+    self.version = 0
+    self.views = None # part -> partMeasure
+
+  def partCells( self, part ):
+    # The cells of part, track part + 1.
+    while len( self.parts ) <= part:
+      self.parts.append( array( 'B', [ 0 ] ) * len( self.parts[ 0 ] ) )
+    return self.parts[ part ]
+
+  def allocSlot( self ):
+    if self.freeSlots:
+      return self.freeSlots.pop()
+    for cells in self.parts:
+      cells.extend( EMPTY_SLOT )
+    return len( self.parts[ 0 ] ) // STRINGS - 1
+
+  def freeSlot( self, slot ):
+    base = slot * STRINGS
+    for cells in self.parts:
+      cells[ base : base + STRINGS ] = EMPTY_SLOT
+    self.setBeatAnnotation( slot, None )
+    if self.freeSlots is None:
+      self.freeSlots = []
+    self.freeSlots.append( slot )
+
+  def copySlot( self, slot, src, srcSlot ):
+    # Make slot a copy of srcSlot in measure src, every track's notes.
+    base, srcBase = slot * STRINGS, srcSlot * STRINGS
+    for part in range( max( len( self.parts ), len( src.parts ) ) ):
+      if part < len( src.parts ):
+        self.partCells( part )[ base : base + STRINGS ] = src.parts[ part ][ srcBase : srcBase + STRINGS ]
+      else:
+        self.parts[ part ][ base : base + STRINGS ] = EMPTY_SLOT
+    self.setBeatAnnotation( slot, src.beatAnnotation( srcSlot ) )
+
+  def view( self, part ):
+    # The measure as track part + 1 sees it, the same object each time so it can be cached by id.
+    if not part:
+      return self
+    if self.views is None:
+      self.views = {}
+    v = self.views.get( part )
+    if v is None:
+      v = self.views[ part ] = partMeasure( self, part )
+    return v
+
+  # Tracks added, removed or moved, see pytabSong.
+  def insertPart( self, part ):
+    if part < len( self.parts ):
+      self.parts.insert( part, array( 'B', [ 0 ] ) * len( self.parts[ 0 ] ) )
+    self._partsChanged()
+
+  def popPart( self, part ):
+    if part < len( self.parts ):
+      cells = self.parts.pop( part )
+      if not self.parts:
+        self.parts.append( array( 'B', [ 0 ] ) * len( cells ) )
+    self._partsChanged()
+
+  def swapParts( self, part, other ):
+    self.partCells( max( part, other ) )
+    self.parts[ part ], self.parts[ other ] = self.parts[ other ], self.parts[ part ]
+    self._partsChanged()
+
+  def _partsChanged( self ):
+    self.views = None
+    self.version += 1
+
+  def beatAnnotation( self, slot ):
+    return self.beatAnnotations.get( slot ) if self.beatAnnotations else None
+
+  def setBeatAnnotation( self, slot, annotation ):
+    if annotation is not None:
+      if self.beatAnnotations is None:
+        self.beatAnnotations = {}
+      self.beatAnnotations[ slot ] = annotation
+    elif self.beatAnnotations:
+      self.beatAnnotations.pop( slot, None )
+
+  def _slotFor( self, obj ):
+    # A slot holding a copy of beat obj, or NO_BEAT.
+    if obj is None:
+      return NO_BEAT
+    slot = self.allocSlot()
+    self.copySlot( slot, obj.store, obj.slot )
+    return slot
+
+  def _view( self, slot ):
+    return None if slot == NO_BEAT else pytabBeat( self, slot )
+
+  def set( self, obj, index=None, insert=False ):
+    # If index is none then append. Create if necessary. Returns the beat as it is in the measure.
+    return self._place( self._slotFor( obj ), index, insert )
+
+  def _place( self, slot, index, insert ):
+    if index is None and insert == True:
+      assert 0, "Must provide index to insert"
+
+    if index and index < 1:
+      assert 0, "Bad index."
+
+    if index:
+      index -= 1 # make 0 based, API is 1 based
+      # Add empty entries if necessary.
+      while self.count() <= index:
+        self.order.append( NO_BEAT )
+
+      if insert:
+        self.order.insert( index, slot )
+      else:
+        if self.order[ index ] != NO_BEAT:
+          self.freeSlot( self.order[ index ] )
+        self.order[ index ] = slot
+    else:
+      self.order.append( slot )
+
+    return self._view( slot )
+
+  def get( self, index=None ):
+    if index:
+      assert index > 0, "Index must be > 0."
+      if index > len( self.order ):
+        return None
+      return self._view( self.order[ index - 1 ] )
+    else:
+      return [ self._view( slot ) for slot in self.order ]
+
+  def pop( self, index ):
+    if index < 1 or index > len( self.order ):
+      return None
+
+    slot = self.order.pop( index - 1 )
+    if slot != NO_BEAT:
+      self.freeSlot( slot )
+    return True
+
+  def clr( self, index ):
+    return( self.set( None, index ) )
+
+  def count( self ):
+    return len( self.order )
+
+  def addBeat( self, beat=None, insert=False ):
+    if beat:
+      assert beat <= MAX_BEATS_PER_MEAS, "Exceeded max beats per measure."
+      assert beat > 0, "First beat is 1."
+    return self._place( self.allocSlot(), beat, insert )
+
+  def __deepcopy__( self, memo ):
+    measure = pytabMeasure() # every track's notes, copySlot() copies them
+    measure.pageBreak = self.pageBreak
+    measure.repeat = self.repeat
+    measure.annotation = self.annotation
+    for beat in self.get():
+      measure.set( beat )
+    return measure
+
+def _shared( name ):
+  # An attribute of a partMeasure that's its measure's.
+  return property( lambda self: getattr( self.measure, name ),
+                   lambda self, value: setattr( self.measure, name, value ) )
+
+class partMeasure( object ):
+  '''
+  A measure as a track after the first sees it, the measure's beats with this track's notes. Everything else
+  is the measure's, shared by every track. Beats added or removed here are added or removed in every track.
+  '''
+  __slots__ = ( 'measure', 'part' )
+
+  def __init__( self, measure, part ):
+    self.measure = measure
+    self.part = part
+
+  pageBreak = _shared( 'pageBreak' )
+  repeat = _shared( 'repeat' )
+  annotation = _shared( 'annotation' )
+  version = _shared( 'version' )
+
+  def _part( self, beat ):
+    return None if beat is None else pytabBeat( beat.store, beat.slot, self.part )
+
+  def set( self, obj, index=None, insert=False ):
+    return self._part( self.measure.set( obj, index, insert ) )
+
+  def get( self, index=None ):
+    if index:
+      return self._part( self.measure.get( index ) )
+    return [ self._part( beat ) for beat in self.measure.get() ]
+
+  def pop( self, index ):
+    return self.measure.pop( index )
+
+  def clr( self, index ):
+    return self.measure.clr( index )
+
+  def count( self ):
+    return self.measure.count()
+
+  def addBeat( self, beat=None, insert=False ):
+    return self._part( self.measure.addBeat( beat, insert ) )
+
+class pytabTrack( pytabContainer ):
+  __slots__ = ( 'trackName', )
+
+  def __init__( self, name="Track" ):
+    self.trackName = name
+    #self.trackType = type # guitar, bass, etc
+    pytabContainer.__init__( self )
+
+  def addMeasure( self, measure=None, insert=False ):
+    if measure:
+      assert measure <= MAX_MEASURES, "Beyond max measure."
+      assert measure > 0, "First measure is 1."
+    return self.set( pytabMeasure(), measure, insert )
+
+  def view( self, first, last ):
+    # Measures first..last are about to be shown. Lazily loaded tracks read them here, see pytabFile.
+    pass
+
+  def beatCount( self, index ):
+    # Beats in measure index, 0 if there's no measure. Lazily loaded tracks don't read the measure for it.
+    if index < 1 or index > self.count():
+      return 0
+    measure = self.get( index )
+    return measure.count() if measure else 0
+
+class partTrack( pytabTrack ):
+  '''
+  A track after the first. Its measures are the first track's ( the timeline ) seen through partMeasure, so
+  adding measures or beats to any track adds them to all of them.
+  '''
+  __slots__ = ( 'song', 'part' )
+
+  def __init__( self, song, part, name="Track" ):
+    pytabTrack.__init__( self, name )
+    self.song = song
+    self.part = part # index of the track's cells in a measure's parts
+
+  def timeline( self ):
+    return self.song.objects[ 0 ]
+
+  def set( self, obj, index=None, insert=False ):
+    measure = self.timeline().set( obj, index, insert )
+    return measure.view( self.part ) if measure else measure
+
+  def get( self, index=None ):
+    if index:
+      measure = self.timeline().get( index )
+      return measure.view( self.part ) if measure else measure
+    return [ m.view( self.part ) if m else m for m in self.timeline().get() ]
+
+  def pop( self, index ):
+    return self.timeline().pop( index )
+
+  def count( self ):
+    return self.timeline().count()
+
+  def view( self, first, last ):
+    self.timeline().view( first, last )
+
+  def beatCount( self, index ):
+    return self.timeline().beatCount( index )
+
+class pytabSong( pytabContainer ):
+  '''
+  Tracks are positional, the first holds the measures and the others are partTracks of them. Adding a track
+  at the end is free, inserting, removing or moving one goes through every measure.
+  '''
+  __slots__ = ( 'songName', 'tuningIndex', 'journalSeq' )
+
+  def __init__( self, name ):
+    self.songName = name
+    self.tuningIndex = 0
+    self.journalSeq = 0 # last edit journal record applied, see pytabEdit
+    pytabContainer.__init__( self )
+
+  def addTrack( self, track=None, insert=False, name="Track" ):
+    # A new empty track, added at the end unless inserted before track.
+    if track:
+      assert track <= MAX_TRACKS, "Beyond max track."
+      assert track > 0, "First track is 1."
+    if not self.count():
+      return self.set( pytabTrack( name ) )
+    if not track or track > self.count():
+      return self.set( partTrack( self, self.count(), name ) )
+    names = self._names()
+    if insert:
+      self._eachMeasure( lambda m: m.insertPart( track - 1 ) )
+      names.insert( track - 1, ( name, None ) )
+    else: # replaces track
+      self._eachMeasure( lambda m: m.popPart( track - 1 ) or m.insertPart( track - 1 ) )
+      names[ track - 1 ] = ( name, None )
+    self._retrack( names )
+    return self.get( track )
+
+  def popTrack( self, track ):
+    if track < 1 or track > self.count() or self.count() == 1:
+      return None
+    self._eachMeasure( lambda m: m.popPart( track - 1 ) )
+    names = self._names()
+    names.pop( track - 1 )
+    self._retrack( names )
+    return True
+
+  def moveTrack( self, track, to ):
+    # Swap tracks track and to.
+    self._eachMeasure( lambda m: m.swapParts( track - 1, to - 1 ) )
+    names = self._names()
+    names[ track - 1 ], names[ to - 1 ] = names[ to - 1 ], names[ track - 1 ]
+    self._retrack( names )
+
+  def _eachMeasure( self, fn ):
+    for measure in self.objects[ 0 ].get():
+      if measure:
+        fn( measure )
+
+  def _names( self ):
+    return [ ( track.trackName, track.annotation ) for track in self.objects ]
+
+  def _retrack( self, names ):
+    # Give the tracks names after tracks moved, there's a partTrack for each track after the first.
+    self.objects = self.objects[ : 1 ] + [ partTrack( self, part ) for part in range( 1, len( names ) ) ]
+    for track, ( name, annotation ) in zip( self.objects, names ):
+      track.trackName, track.annotation = name, annotation
+
+def newSong( name ):
+  # What the editor starts a new song with.
+  song = pytabSong( name )
+  song.addTrack( 1, name="Default" ).addMeasure( 1 ).addBeat( 1 )
+  return song
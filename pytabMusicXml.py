@@ -0,0 +1,301 @@
+'''
+MusicXML scores read into songs.
+
+readScore() streams a partwise score ( .xml / .musicxml, or compressed .mxl ) with iterparse: each <measure>
+is turned into tab and dropped as soon as it's parsed, so a long score doesn't sit in memory as a tree. Parts
+become tracks ( the first MAX_TRACKS with pitched notes ) on one timeline: the first part to reach a measure
+lays out its beats, notes are quantized to a grid of tab beats ( eighths by default ) as pytabMidi does.
+
+Notes with <string> / <fret> ( a tab staff ) keep them when they agree with the note's pitch on the song's
+tuning, the first 6 string <staff-tuning> that's one of ours or else the one asked for. Other notes are
+fretted with pytabMidi.fretTrack() once their part is read. Hammer ons, pull offs and slides / glissandos end
+on the notes they mark. Backward repeats, rehearsal marks ( measure annotations ), words ( beat annotations ) and new
+systems ( page breaks ) come along. Forward repeats, endings, grace notes and percussion don't.
+
+Batch conversion is tab.py --import, see pytabImport.
+'''
+
+import zipfile
+import xml.etree.ElementTree as ET
+
+from pytabModel import *
+import registry, pytabRender, pytabMidi
+
+XML_EXTS = ( ".xml", ".musicxml", ".mxl" )
+
+class xmlError( Exception ):
+  pass
+
+class notScore( xmlError ):
+  # XML, but not a MusicXML score, ex: a build file next to the scores.
+  pass
+
+def _int( text, default=0 ):
+  try:
+    return int( round( float( text ) ) )
+  except ( TypeError, ValueError ):
+    return default
+
+def _pitch( elem, step, alter, octave ):
+  # MIDI note number of a <pitch> ( or <staff-tuning> ) element, None if it has none.
+  if elem is None or elem.findtext( step ) not in registry.NOTE_NUMS:
+    return None
+  return registry.NOTE_NUMS[ elem.findtext( step ) ] + _int( elem.findtext( alter ) ) + \
+         ( _int( elem.findtext( octave ), 4 ) + 1 ) * 12
+
+def _ends( notations, names ):
+  # Whether a <notations> has one of names ending here, ex: <hammer-on type="stop"/>.
+  if notations is None:
+    return False
+  for elem in notations.iter():
+    if elem.tag in names and elem.get( 'type' ) == 'stop':
+      return True
+  return False
+
+class scoreReader( object ):
+  '''
+  A song built from a score a measure element at a time: startPart(), measure() for each of its measures,
+  endPart(), then song().
+  '''
+
+  def __init__( self, name, tuningIndex=0, grid=pytabMidi.GRID ):
+    self.name = name
+    self.grid = grid
+    self.title = None
+    self.partNames = {} # part id -> name, from the part list
+    self.timeline = pytabTrack( "Track" )
+    self.tracks = [] # tracks given to parts so far
+    self.layout = [] # ( first timeline measure, steps ) of each score measure
+    self.tuningIndex = None # set by the first known staff tuning before any notes
+    self.defaultTuning = tuningIndex
+    self.opens = pytabRender.tuningPitches( tuningIndex )
+
+  def startPart( self, partId ):
+    self.partId = partId
+    self.part = None # track index of the part's cells, given at its first note
+    self.ordinal = 0
+    self.divisions = 1
+    self.meter = ( 4, 4 )
+    self.unfretted = [] # ( beat, pitches ) fretted at the end of the part
+
+  # A measure
+
+  def measure( self, elem ):
+    notes = [] # ( position, pitch, string, fret, note type )
+    marks = [] # ( position, tag, text )
+    pos = last = extent = 0
+    repeat = pageBreak = False
+    for child in elem:
+      tag = child.tag
+      if tag == 'attributes':
+        self.attributes( child )
+      elif tag == 'note':
+        if child.find( 'chord' ) is not None: # starts with the note before it
+          start = last
+        else:
+          start = last = pos
+          pos += _int( child.findtext( 'duration' ) ) # grace notes have none
+          extent = max( extent, pos )
+        note = self.note( child )
+        if note:
+          notes.append( ( start, ) + note )
+      elif tag == 'backup':
+        pos -= _int( child.findtext( 'duration' ) )
+      elif tag == 'forward':
+        pos += _int( child.findtext( 'duration' ) )
+        extent = max( extent, pos )
+      elif tag == 'direction':
+        at = pos + _int( child.findtext( 'offset' ) )
+        for kind in ( 'rehearsal', 'words' ):
+          text = " ".join( t.text.strip() for t in child.iter( kind ) if t.text and t.text.strip() )
+          if text:
+            marks.append( ( at, kind, text ) )
+      elif tag == 'barline':
+        repeat = repeat or any( r.get( 'direction' ) == 'backward' for r in child.iter( 'repeat' ) )
+      elif tag == 'print':
+        pageBreak = pageBreak or child.get( 'new-system' ) == 'yes' or child.get( 'new-page' ) == 'yes'
+
+    stepLength = self.divisions * 4.0 / self.grid
+    length = self.divisions * 4.0 * self.meter[ 0 ] / self.meter[ 1 ]
+    if elem.get( 'implicit' ) == 'yes' and extent: # a pickup
+      length = extent
+    steps = max( 1, int( round( max( length, extent ) / stepLength ) ) )
+    first, steps = self.place( steps )
+
+    def beatAt( position ):
+      step = min( max( 0, int( round( position / stepLength ) ) ), steps - 1 )
+      return self.timeline.get( first + step // MAX_BEATS_PER_MEAS ).get( step % MAX_BEATS_PER_MEAS + 1 )
+
+    measure = self.timeline.get( first )
+    measure.pageBreak = measure.pageBreak or pageBreak
+    if repeat:
+      self.timeline.get( first + ( steps - 1 ) // MAX_BEATS_PER_MEAS ).repeat = True
+    for position, kind, text in marks:
+      if kind == 'rehearsal' and position == 0 and not measure.annotation:
+        measure.annotation = text
+      else:
+        beat = beatAt( position )
+        if not beat.annotation:
+          beat.annotation = text
+    if notes and self.part is None:
+      self.startTrack()
+    if self.part is not None:
+      self.placeNotes( notes, beatAt )
+    self.ordinal += 1
+
+  def attributes( self, elem ):
+    self.divisions = _int( elem.findtext( 'divisions' ), self.divisions ) or 1
+    time = elem.find( 'time' )
+    if time is not None and time.findtext( 'beats' ):
+      beats = sum( _int( b ) for b in time.findtext( 'beats' ).split( '+' ) )
+      self.meter = ( max( 1, beats ), max( 1, _int( time.findtext( 'beat-type' ), 4 ) ) )
+    if self.tuningIndex is None and not self.tracks:
+      lines = dict( ( _int( t.get( 'line' ) ), _pitch( t, 'tuning-step', 'tuning-alter', 'tuning-octave' ) )
+                    for t in elem.iter( 'staff-tuning' ) )
+      opens = tuple( lines.get( line ) for line in range( STRINGS, 0, -1 ) ) # line 1 is the lowest string
+      for ix in range( len( pytabRender.tunings ) ):
+        if len( lines ) == STRINGS and tuple( pytabRender.tuningPitches( ix ) ) == opens:
+          self.tuningIndex = ix
+          self.opens = pytabRender.tuningPitches( ix )
+
+  def note( self, elem ):
+    # ( pitch, string, fret, note type ) of a <note> that starts a sound, else None.
+    if elem.find( 'rest' ) is not None or elem.find( 'grace' ) is not None:
+      return None
+    if any( t.get( 'type' ) == 'stop' for t in elem.findall( 'tie' ) ):
+      return None # the rest of a tied note
+    pitch = _pitch( elem.find( 'pitch' ), 'step', 'alter', 'octave' )
+    notations = elem.find( 'notations' )
+    technical = notations.find( 'technical' ) if notations is not None else None
+    string = _int( technical.findtext( 'string' ), None ) if technical is not None else None
+    fret = _int( technical.findtext( 'fret' ), None ) if technical is not None else None
+    if pitch is None and ( string is None or fret is None ):
+      return None # unpitched, percussion
+    if _ends( notations, ( 'slide', 'glissando' ) ):
+      noteType = NOTE_SLIDE
+    elif _ends( notations, ( 'hammer-on', ) ):
+      noteType = NOTE_HAMMER
+    elif _ends( notations, ( 'pull-off', ) ):
+      noteType = NOTE_PULLOFF
+    else:
+      noteType = NOTE_NORMAL
+    return pitch, string, fret, noteType
+
+  # Placing
+
+  def place( self, steps ):
+    # ( first timeline measure, steps ) of the current score measure, laid out by the first part to get here.
+    # A measure longer than MAX_BEATS_PER_MEAS steps takes more than one.
+    if self.ordinal < len( self.layout ):
+      return self.layout[ self.ordinal ]
+    first = self.timeline.count() + 1
+    for s in range( 0, steps, MAX_BEATS_PER_MEAS ):
+      measure = self.timeline.addMeasure()
+      for b in range( min( MAX_BEATS_PER_MEAS, steps - s ) ):
+        measure.addBeat()
+    self.layout.append( ( first, steps ) )
+    return first, steps
+
+  def startTrack( self ):
+    # The part has notes, it gets the next track if there's one left.
+    if len( self.tracks ) == MAX_TRACKS:
+      return
+    self.part = len( self.tracks )
+    self.tracks.append( self.partNames.get( self.partId ) or "Track %d" % ( self.part + 1 ) )
+
+  def placeNotes( self, notes, beatAt ):
+    # Notes whose string and fret are right on the tuning go in now, the others wait for endPart().
+    beats = {} # ( measure, slot ) -> ( beat, strings used, pitches placed, ( pitch, note type ) to fret )
+    for position, pitch, string, fret, noteType in notes:
+      b = beatAt( position )
+      key = ( b.store, b.slot )
+      if key not in beats:
+        beats[ key ] = ( pytabBeat( b.store, b.slot, self.part ), set(), set(), [] )
+      beat, strings, placed, pending = beats[ key ]
+      if string is not None and fret is not None and 1 <= string <= STRINGS and 0 <= fret <= pytabMidi.MAX_FRET and \
+         string not in strings and ( pitch is None or self.opens[ string - 1 ] + fret == pitch ):
+        beat.addNote( string, fret, noteType )
+        strings.add( string )
+        placed.add( self.opens[ string - 1 ] + fret )
+      elif pitch is not None:
+        pending.append( ( pitch, noteType ) )
+    for beat, strings, placed, pending in beats.values():
+      pending = [ p for p in pending if p[ 0 ] not in placed ] # a notation staff doubling the tab staff
+      if pending:
+        self.unfretted.append( ( beat, pending ) )
+
+  def endPart( self ):
+    # Fret the notes that came without string and fret, or with ones that didn't fit.
+    opens = tuple( self.opens )
+    chords = [ pytabMidi.playable( [ p for p, t in pending ], opens ) for beat, pending in self.unfretted ]
+    for ( beat, pending ), fingering in zip( self.unfretted, pytabMidi.fretTrack( chords, opens ) ):
+      types = dict( pending )
+      for string, fret in fingering:
+        if beat.get( string ) is None:
+          beat.addNote( string, fret, types.get( opens[ string - 1 ] + fret, NOTE_NORMAL ) )
+    self.unfretted = []
+
+  def song( self ):
+    song = pytabSong( self.name )
+    song.tuningIndex = self.defaultTuning if self.tuningIndex is None else self.tuningIndex
+    song.annotation = self.title
+    if not self.timeline.count():
+      self.timeline.addMeasure().addBeat()
+    self.timeline.trackName = self.tracks[ 0 ] if self.tracks else "Track"
+    song.set( self.timeline )
+    for name in self.tracks[ 1 : ]:
+      song.addTrack( name=name )
+    return song
+
+def scoreFile( fileName ):
+  # The score XML of fileName as a file object, .mxl is a zip with the score named in its container.
+  if not zipfile.is_zipfile( fileName ):
+    return open( fileName, 'rb' )
+  try:
+    archive = zipfile.ZipFile( fileName )
+    try:
+      container = ET.fromstring( archive.read( 'META-INF/container.xml' ) )
+      rootfile = next( container.iter( 'rootfile' ) ).get( 'full-path' )
+    except ( KeyError, StopIteration, ET.ParseError ):
+      rootfile = next( ( n for n in archive.namelist() if n.endswith( '.xml' ) and '/' not in n ), None )
+    if rootfile is None:
+      raise xmlError( "No score in " + fileName )
+    return archive.open( rootfile )
+  except ( KeyError, zipfile.BadZipfile ) as e:
+    raise xmlError( "%s: %s" % ( fileName, e ) )
+
+def readScore( fileName, name, tuningIndex=0, grid=pytabMidi.GRID ):
+  '''
+  A pytabSong of the MusicXML score in fileName, tunings[ tuningIndex ] unless the score has a tuning we know.
+  Raises xmlError if it can't be read, notScore if it isn't a score.
+  '''
+  reader = scoreReader( name, tuningIndex, grid )
+  root = part = None
+  f = scoreFile( fileName )
+  try:
+    for event, elem in ET.iterparse( f, events=( 'start', 'end' ) ):
+      if event == 'start':
+        if root is None:
+          root = elem.tag
+          if root == 'score-timewise':
+            raise xmlError( "Timewise scores aren't supported: " + fileName )
+          if root != 'score-partwise':
+            raise notScore( "Not a MusicXML score: " + fileName )
+        elif elem.tag == 'part':
+          part = elem
+          reader.startPart( elem.get( 'id' ) )
+      elif elem.tag == 'measure' and part is not None:
+        reader.measure( elem )
+        part.remove( elem ) # done with it
+      elif elem.tag == 'part':
+        reader.endPart()
+        part = None
+      elif elem.tag == 'score-part':
+        reader.partNames[ elem.get( 'id' ) ] = ( elem.findtext( 'part-name' ) or "" ).strip()
+      elif elem.tag in ( 'work-title', 'movement-title' ) and reader.title is None:
+        reader.title = elem.text
+  except ( ET.ParseError, zipfile.BadZipfile ) as e:
+    raise xmlError( "%s: %s" % ( fileName, e ) )
+  finally:
+    f.close()
+  return reader.song()
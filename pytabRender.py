@@ -0,0 +1,224 @@
+'''
+Songs drawn as text tab, shared by tab.py's display and the txt / html exports.
+
+systems() is a generator of systems, the rows of tab a page is made of, each up to SYSTEM_BEATS beats wide.
+Nothing but the system being drawn is kept, so exporting a long song takes the same memory as a short one
+( lazily loaded tracks are read a system at a time ). Measures are drawn once into a renderedMeasure, which
+the display keeps in a measureCache between key presses.
+'''
+
+import registry
+from pytabModel import *
+
+SYSTEM_BEATS = 32 # beats in a system
+
+# Where a system's measure numbers go, ( columns before the first, format )
+DISPLAY_NUMBERS = ( 2, "%-3d" )
+EXPORT_NUMBERS = ( 1, "%3d" )
+
+def loadTunings():
+  # Tunings come from registry.json. Songs store an index into tunings so only add new ones at the end.
+  tDict = {}
+  tList = []
+  for name, notes in registry.default().tabTunings().items():
+    if len( notes ) == 6: # 6 strings only, for now
+      tDict[ name ] = [ registry.pitchClassName( n ).ljust( 2 ) for n in notes ]
+      tList.append( name )
+  return tDict, tList
+
+tuningsDict, tunings = loadTunings()
+
+def tuningLabels( tuningIndex ):
+  # The string names that start each line, strings 1-6.
+  return tuningsDict[ tunings[ tuningIndex ] ]
+
+def tuningPitches( tuningIndex ):
+  # MIDI note numbers of the open strings, string 1 first.
+  return registry.default().tabPitches()[ tunings[ tuningIndex ] ]
+
+def renderNote( note, cursorPos=False ):
+  # A beat's 3 columns on one string.
+  if note == None:
+    return "<->" if cursorPos else "---"
+  if note.fret > 9:
+    fieldString = "%2d" % ( note.fret )
+  else:
+    if note.noteType == NOTE_NORMAL:
+      prefix = "-"
+    elif note.noteType == NOTE_HAMMER:
+      prefix = "h"
+    elif note.noteType == NOTE_SLIDE:
+      prefix = "\\"
+    else:
+      prefix = "p"
+    fieldString = ( "<" if cursorPos else prefix ) + "%d" % ( note.fret )
+  return fieldString + ( ">" if cursorPos else "-" )
+
+class renderedMeasure( object ):
+  # A measure drawn, good while measure.version hasn't changed.
+  __slots__ = ( 'measure', 'version', 'lines', 'annotations', 'beats' )
+
+  def __init__( self, m ):
+    self.measure = m # also keeps id( m ) from being reused while cached
+    self.version = m.version
+    self.lines = []  # columns for strings 1-6
+    self.annotations = [ ( 0, m.annotation ) ] if m.annotation else [] # ( column, text )
+    beats = m.get()
+    self.beats = len( beats )
+    for curString in range( 1, 7 ):
+      self.lines.append( "".join( [ renderNote( b.get( curString ) if b else None ) for b in beats ] ) )
+    for ix, b in enumerate( beats ):
+      if b and b.annotation:
+        self.annotations.append( ( ix * 3, b.annotation ) )
+
+class measureCache( object ):
+  ''' renderedMeasures kept until their measure is edited. sweep() drops those not used since the last sweep. '''
+
+  def __init__( self ):
+    self.entries = {} # id( measure ) -> renderedMeasure
+    self.used = {}
+
+  def get( self, m ):
+    r = self.entries.get( id( m ) )
+    if r is None or r.measure is not m or r.version != m.version:
+      r = renderedMeasure( m )
+    self.used[ id( m ) ] = r
+    return r
+
+  def sweep( self ):
+    self.entries = self.used
+    self.used = {}
+
+class system( object ):
+  '''
+  One row of tab, measures first..last. Lines are kept as lists of pieces until they're asked for.
+  space is what pads the measure number and annotation lines, '&nbsp' for html.
+  '''
+
+  def __init__( self, labels, numbers=EXPORT_NUMBERS, space=' ', bass=False ):
+    self.first = None
+    self.last = None
+    self.bass = bass
+    self.space = space
+    self.numberFormat = numbers[ 1 ]
+    self.strings = [ [ label ] for label in labels ] # strings 1-6
+    self.numbers = [ space * numbers[ 0 ] ]
+    self.numberPad = 0 # spaces owed before the next measure number
+    self.annotations = []
+    self.annotationEnd = 0
+    self.beatMarks = [ '  ' ]
+    self.column = 3 # where the next beat starts, for annotations
+    self.beats = 0
+    self.pieces = {} # measure -> index of its piece in strings
+
+  def addMeasure( self, measure, r, pageBreak=False ):
+    # Measure number measure, drawn as r ( None for a missing measure ), pageBreak marks the bar after it.
+    if self.first is None:
+      self.first = measure
+    self.last = measure
+
+    if r is not None:
+      for column, annotation in r.annotations:
+        self.annotate( self.column + column, annotation )
+      self.pieces[ measure ] = len( self.strings[ 0 ] )
+      for s in range( 6 ):
+        self.strings[ s ].append( r.lines[ s ] )
+      if r.beats:
+        number = self.numberFormat % ( measure )
+        digits = number.strip()
+        lead = number.index( digits )
+        self.numbers.append( self.space * ( self.numberPad + lead ) + digits )
+        self.numberPad = len( number ) - lead - len( digits ) + 3 * ( r.beats - 1 )
+        self.beatMarks.append( ' . ' * r.beats )
+      self.column += 3 * r.beats
+      self.beats += r.beats
+    self.bar( pageBreak, r.measure.repeat if r is not None else False )
+
+  def bar( self, pageBreak=False, repeat=False ):
+    outer = '/' if pageBreak else '|'
+    inner = ':' if repeat else outer
+    for s in ( ( 0, 1, 2, 5 ) if self.bass else ( 0, 1, 4, 5 ) ): # bass doesn't show 1 and 2
+      self.strings[ s ].append( outer )
+    for s in ( ( 3, 4 ) if self.bass else ( 2, 3 ) ):
+      self.strings[ s ].append( inner )
+    self.numberPad += 1
+    self.beatMarks.append( ' ' )
+    self.column += 1
+
+  def annotate( self, column, annotation ):
+    # Display annotation if it won't overwrite a previous one.
+    if annotation and self.annotationEnd < column:
+      self.annotations.append( self.space * ( column - self.annotationEnd ) + annotation )
+      self.annotationEnd = column + len( annotation )
+
+  def overlay( self, measure, beat, string, text ):
+    # Replace the 3 columns of beat on string in measure, ex: with the cursor.
+    pieces = self.strings[ string - 1 ]
+    ix = self.pieces[ measure ]
+    col = ( beat - 1 ) * 3
+    pieces[ ix ] = pieces[ ix ][ : col ] + text + pieces[ ix ][ col + 3 : ]
+
+  def numberLine( self ):
+    return "".join( self.numbers )
+
+  def annotationLine( self ):
+    return "".join( self.annotations )
+
+  def beatLine( self ):
+    return "".join( self.beatMarks )
+
+  def stringLines( self ):
+    # The strings shown, bass only has 4.
+    return [ "".join( pieces ) for pieces in self.strings[ 2 if self.bass else 0 : ] ]
+
+def systems( track, labels, first=1, numbers=EXPORT_NUMBERS, space=' ', bass=False, breakPages=True,
+             cache=None, beats=SYSTEM_BEATS ):
+  '''
+  Yield the systems of track from measure first on. A system starts at a page break if breakPages, else the
+  break is drawn as a '/' bar. Measures come from cache if one is given.
+  '''
+  count = track.count()
+  measure = first
+  while measure <= count:
+    track.view( measure, measure + beats ) # at most one measure per beat
+    s = system( labels, numbers, space, bass )
+    while measure <= count and s.beats < beats:
+      m = track.get( measure )
+      nm = track.get( measure + 1 ) if measure < count else None
+      pageBreak = bool( nm and nm.pageBreak )
+      if m is None:
+        r = None
+      else:
+        r = cache.get( m ) if cache is not None else renderedMeasure( m )
+      s.addMeasure( measure, r, pageBreak and not breakPages )
+      measure += 1
+      if pageBreak and breakPages:
+        break
+    yield s
+
+def writeSystems( f, song, html=False, bass=False ):
+  # Write song's systems to file like f, with more than one track each system has every track, named.
+  space, eol = ( '&nbsp', "<br>\n" ) if html else ( ' ', "\n" )
+  tracks = song.get()
+  labels = tuningLabels( song.tuningIndex )
+  for row in zip( *[ systems( track, labels, space=space, bass=bass ) for track in tracks ] ):
+    lines = [ row[ 0 ].numberLine(), row[ 0 ].annotationLine() ]
+    for track, s in zip( tracks, row ):
+      if len( tracks ) > 1:
+        lines.append( track.trackName or "" )
+      lines += s.stringLines()
+    f.write( eol.join( lines ) + eol + "\n" )
+
+def exportSong( song, fileName, html=False, bass=False ):
+  ''' Save in human readable format, text or html. '''
+  with open( fileName, 'w', 1 << 16 ) as f:
+    if html:
+      f.write( "<!DOCTYPE html>\n"
+               "<html><head><style type=\"text/css\">a {text-decoration: none}</style></head>\n"
+               "<body><font style=\"font-family:courier;\" size=\"2\">\n<h2>\n")
+    f.write( song.songName + ( "<br>\n" if html else "\n" ) )
+    if html:
+      f.write( "</h2><hr>" )
+    writeSystems( f, song, html, bass )
+    if html:
+      f.write( "</font></body></html>\n" )
@@ -0,0 +1,141 @@
+'''
+Instrument, tuning and spelling registry shared by chords.py and tab.py.
+
+Everything lives in registry.json ( or the file named by $CHORDS_REGISTRY ), so adding an instrument or
+tuning needs no code changes. The file is read the first time something asks for it. The parsed data and
+any tables derived from it ( see cached() ) are kept in a pickle next to it and reused until the json or
+the code deriving them changes, so startup doesn't parse and derive everything again.
+'''
+
+import os, sys, json, pickle
+from collections import OrderedDict
+
+DATA_FILE = os.environ.get( 'CHORDS_REGISTRY' ) or \
+            os.path.join( os.path.dirname( os.path.abspath( __file__ ) ), "registry.json" )
+CACHE_EXT = ".cache"
+CACHE_VERSION = 2 # bump when the cached forms change
+
+NOTE_NUMS = { 'C' : 0, 'D' : 2, 'E' : 4, 'F' : 5, 'G' : 7, 'A' : 9, 'B' : 11 }
+
+def pitchNum( name ):
+  # MIDI note number of a name like "E2", "F#3" or "Bb1". C4 is 60.
+  num = NOTE_NUMS[ name[ 0 ] ]
+  ix = 1
+  while name[ ix ] in '#b':
+    num += 1 if name[ ix ] == '#' else -1
+    ix += 1
+  return num + ( int( name[ ix : ] ) + 1 ) * 12
+
+def pitchClassName( name ):
+  # "F#3" -> "F#"
+  return name.rstrip( '0123456789' )
+
+def sourceStamp( fn ):
+  # ( mtime, size ) of the file fn's code is in, a table built by fn is stale when it changes.
+  try:
+    st = os.stat( fn.__code__.co_filename )
+  except ( AttributeError, OSError ):
+    return None
+  return ( st.st_mtime, st.st_size )
+
+def _tuples( pairs ):
+  # json object hook, lists to tuples and keep the file's order.
+  return OrderedDict( ( k, tuple( v ) if isinstance( v, list ) else v ) for k, v in pairs )
+
+class registry( object ):
+
+  def __init__( self, fileName=DATA_FILE ):
+    self.fileName = fileName
+    self._state = None # { 'stamp', 'data', name : derived table.. }
+    self._dirty = False
+
+  def _stamp( self ):
+    st = os.stat( self.fileName )
+    return ( CACHE_VERSION, sys.version_info[ 0 ], st.st_mtime, st.st_size )
+
+  def _load( self ):
+    if self._state is not None:
+      return self._state
+
+    stamp = self._stamp()
+    try:
+      with open( self.fileName + CACHE_EXT, 'rb' ) as f:
+        state = pickle.load( f )
+      if state[ 'stamp' ] != stamp:
+        state = None
+    except Exception:
+      state = None # no cache, or a stale / unreadable one
+
+    if state is None:
+      with open( self.fileName ) as f:
+        state = { 'stamp' : stamp, 'data' : json.load( f, object_pairs_hook=_tuples ) }
+      self._dirty = True
+
+    self._state = state
+    return state
+
+  def _save( self ):
+    # Best effort, the registry works without its cache.
+    if not self._dirty:
+      return
+    try:
+      tmpName = self.fileName + CACHE_EXT + ".tmp"
+      with open( tmpName, 'wb' ) as f:
+        pickle.dump( self._state, f, pickle.HIGHEST_PROTOCOL )
+      os.rename( tmpName, self.fileName + CACHE_EXT )
+      self._dirty = False
+    except ( IOError, OSError ):
+      pass
+
+  def data( self ):
+    state = self._load()
+    self._save()
+    return state[ 'data' ]
+
+  def cached( self, name, build ):
+    '''
+    build( data ) derives a table from the registry data. The result is cached with the data and only
+    rebuilt when the json or the file build is defined in changes. It must be picklable.
+    '''
+    state = self._load()
+    key = sourceStamp( build )
+    if name not in state or state[ name ][ 0 ] != key:
+      state[ name ] = ( key, build( state[ 'data' ] ) )
+      self._dirty = True
+    self._save()
+    return state[ name ][ 1 ]
+
+  def instrumentMap( self ):
+    return self.data()[ 'instruments' ]
+
+  def instruments( self ):
+    # The instruments shown in menus.
+    return self.data()[ 'instrumentMenu' ]
+
+  def spellingMap( self ):
+    return self.data()[ 'spellings' ]
+
+  def spellings( self ):
+    # The spellings shown in menus.
+    return self.data()[ 'spellingMenu' ]
+
+  def majHarmMap( self ):
+    return self.data()[ 'majHarm' ]
+
+  def tabTunings( self ):
+    # Tuning name -> note names with octaves, high string first.
+    return self.data()[ 'tabTunings' ]
+
+  def tabPitches( self ):
+    # Tuning name -> MIDI note numbers, high string first.
+    return self.cached( 'tabPitches', lambda data : dict(
+             ( name, tuple( pitchNum( n ) for n in notes ) ) for name, notes in data[ 'tabTunings' ].items() ) )
+
+_default = None
+
+def default():
+  # The registry everything shares.
+  global _default
+  if _default is None:
+    _default = registry()
+  return _default
@@ -0,0 +1,92 @@
+'''
+Terminal drawing for the text mode tools ( tab.py, jsonGen.py, metaDataGen.py ).
+
+Instead of clearing the screen and printing everything for each key, a screen keeps the last frame it drew
+and only rewrites what changed using ANSI cursor movement. A frame is a list of lines, written with a single
+write. Anything else that writes to the terminal ( a prompt ) should be followed by invalidate() so the next
+frame is drawn from scratch. Cursor movement needs each line to be one row of the terminal, a frame with a
+line wider than the terminal ( it wraps ) or taller than it ( it scrolls ) is cleared and printed instead.
+'''
+
+import sys, re
+
+ESC = '\033['
+HOME = ESC + 'H'
+CLEAR = ESC + '2J'
+CLEAR_EOL = ESC + 'K'
+CLEAR_EOS = ESC + 'J'
+ANSI_CODE = re.compile( '\033\\[[0-9;]*[A-Za-z]' )
+
+def moveTo( row, col=0 ):
+  # ANSI positions are 1 based.
+  return ESC + "%d;%dH" % ( row + 1, col + 1 )
+
+def splitLines( lines ):
+  # The rows of a frame, lines may have embedded newlines.
+  rows = []
+  for line in lines:
+    rows.extend( line.split( "\n" ) )
+  return rows
+
+def visibleWidth( line ):
+  # Columns line takes, colors take none.
+  return len( ANSI_CODE.sub( '', line ) )
+
+def terminalSize():
+  # ( columns, rows ) of the terminal, None for what can't be told.
+  try:
+    import shutil
+    size = shutil.get_terminal_size( ( 0, 0 ) )
+  except AttributeError: # python 2
+    return None, None
+  return size.columns or None, size.lines or None
+
+class screen( object ):
+  def __init__( self, out=None ):
+    self.out = out # None is whatever sys.stdout is when drawing
+    self.last = None # rows on the terminal, None if unknown
+
+  def invalidate( self ):
+    self.last = None
+
+  def draw( self, lines ):
+    rows = splitLines( lines )
+    width, height = terminalSize()
+    if ( height and len( rows ) >= height ) or ( width and any( visibleWidth( r ) > width for r in rows ) ):
+      # A row on the screen isn't a row of the frame, cursor moves would land in the wrong place.
+      self._write( HOME + CLEAR + "\n".join( rows ) + "\n" )
+      self.last = None
+      return
+
+    last = self.last
+    if last is None:
+      buf = [ HOME + CLEAR ]
+      last = []
+    else:
+      buf = []
+
+    for row, line in enumerate( rows ):
+      if row < len( last ):
+        old = last[ row ]
+        if old == line:
+          continue
+        col = 0
+        if '\033' not in old and '\033' not in line: # characters are columns, skip the unchanged start
+          n = min( len( old ), len( line ) )
+          while col < n and old[ col ] == line[ col ]:
+            col += 1
+        buf.append( moveTo( row, col ) + line[ col : ] )
+        if len( line ) < len( old ) or col == 0:
+          buf.append( CLEAR_EOL )
+      else:
+        buf.append( moveTo( row ) + line )
+
+    # Leave the cursor under the frame, where prompts go, and drop what used to be there.
+    buf.append( moveTo( len( rows ) ) + CLEAR_EOS )
+    self._write( "".join( buf ) )
+    self.last = rows
+
+  def _write( self, s ):
+    out = self.out or sys.stdout
+    out.write( s )
+    out.flush()
@@ -0,0 +1,168 @@
+'''
+Journal crash recovery: a record torn by a crash mustn't swallow the edits made after the song is reopened,
+and unsaved edits are only thrown away when asked to. Undo: after random edits undoing each one gets back
+exactly the song before it, and redo, the journal, lazy loading and compaction all agree on the result.
+
+  python -m pytest test_pytabEdit.py
+'''
+
+import os, json, random, shutil, tempfile, unittest
+
+from pytabModel import *
+import pytabEdit, pytabFile
+
+def measureWith( string, fret ):
+  m = pytabMeasure()
+  m.addBeat().addNote( string, fret, NOTE_NORMAL )
+  return pytabFile.measureState( m )
+
+def notes( song ):
+  # ( measure, string, fret ) of every note in track 1.
+  return [ ( ix, n.string, n.fret ) for ix, m in enumerate( song.get( 1 ).get(), 1 ) if m
+           for b in m.get() if b for n in b.get() if n ]
+
+class tornJournal( unittest.TestCase ):
+
+  def setUp( self ):
+    self.dir = tempfile.mkdtemp()
+    self.fileName = os.path.join( self.dir, "T" + songExt )
+    editor = pytabEdit.songEditor( newSong( "T" ), self.fileName )
+    editor.apply( ( 'setMeasure', 1, 2, measureWith( 1, 5 ), False ) )
+    editor.journal.close()
+    with open( self.fileName + pytabEdit.JOURNAL_EXT, 'a' ) as f:
+      f.write( '[2, "setMeasure", 1, 3, [fal' ) # tab.py died writing this
+
+  def tearDown( self ):
+    shutil.rmtree( self.dir )
+
+  def testEditAfterTornTail( self ):
+    song = pytabEdit.openSong( self.fileName, "T" )
+    self.assertEqual( notes( song ), [ ( 2, 1, 5 ) ] )
+    editor = pytabEdit.songEditor( song, self.fileName )
+    editor.apply( ( 'setMeasure', 1, 3, measureWith( 2, 7 ), False ) )
+    editor.journal.close()
+    self.assertEqual( notes( pytabEdit.openSong( self.fileName, "T" ) ), [ ( 2, 1, 5 ), ( 3, 2, 7 ) ] )
+
+  def testRecordsAfterTornLine( self ):
+    # A journal written before torn tails were cut off, records were appended to the torn line's end.
+    with open( self.fileName + pytabEdit.JOURNAL_EXT, 'a' ) as f:
+      f.write( json.dumps( [ 2, 'setMeasure', 1, 3, measureWith( 2, 7 ), False ] ) + '\n' )
+    self.assertEqual( notes( pytabEdit.openSong( self.fileName, "T" ) ), [ ( 2, 1, 5 ), ( 3, 2, 7 ) ] )
+
+  def testCorruptLine( self ):
+    # Only the last record can be torn, a bad one before others mustn't be skipped over.
+    with open( self.fileName + pytabEdit.JOURNAL_EXT, 'a' ) as f:
+      f.write( '\n' + json.dumps( [ 3, 'setMeasure', 1, 3, measureWith( 2, 7 ), False ] ) + '\n' )
+    self.assertRaises( pytabEdit.journalError, pytabEdit.openSong, self.fileName, "T" )
+
+  def testReplayedEdits( self ):
+    song, edits = pytabEdit.openEdited( self.fileName, "T" )
+    self.assertEqual( edits, 1 )
+    editor = pytabEdit.songEditor( song, self.fileName )
+    editor.save()
+    editor.close()
+    self.assertEqual( pytabEdit.openEdited( self.fileName, "T" )[ 1 ], 0 )
+
+  def testDiscard( self ):
+    editor = pytabEdit.songEditor( pytabEdit.openSong( self.fileName, "T" ), self.fileName )
+    editor.apply( ( 'setMeasure', 1, 3, measureWith( 2, 7 ), False ) )
+    editor.close( discard=True )
+    self.assertFalse( any( os.path.exists( j ) for j in pytabEdit.journalFiles( self.fileName ) ) )
+    self.assertRaises( IOError, pytabEdit.openSong, self.fileName, "T" ) # never saved, nothing's left
+
+def songState( song ):
+  return ( song.songName, song.tuningIndex, [ track.trackName for track in song.get() ],
+           [ pytabFile.measureState( m ) for m in song.get( 1 ).get() ],
+           [ pytabEdit.trackNotes( track ) for track in song.get() ] )
+
+def randomBeat( rng, tracks ):
+  if rng.random() < 0.1:
+    return None
+  return ( rng.choice( ( None, "ann" ) ), ) + \
+         tuple( tuple( ( string, rng.randint( 0, 24 ), rng.randint( 0, 3 ) )
+                       for string in rng.sample( range( 1, STRINGS + 1 ), rng.randint( 0, 2 ) ) )
+                for t in range( tracks ) )
+
+def randomMeasure( rng, tracks ):
+  return ( rng.randint( 0, 3 ), rng.choice( ( None, "m" ) ),
+           tuple( randomBeat( rng, tracks ) for b in range( rng.randint( 0, 4 ) ) ) )
+
+def randomOp( rng, song ):
+  # An edit like tab.py makes, anywhere in song.
+  t = rng.randint( 1, song.count() )
+  track = song.get( t )
+  measures = [ m for m in range( 1, track.count() + 1 ) if track.get( m ) is not None ]
+  kind = rng.choice( ( 'setNote', 'setNote', 'setBeat', 'popBeat', 'setMeasure', 'setMeasure', 'popMeasure',
+                       'measureFlags', 'measureAnn', 'beatAnn', 'addTrack', 'popTrack', 'moveTrack', 'tuning',
+                       'songName' ) )
+  if kind == 'tuning':
+    return ( 'tuning', rng.randint( 0, 3 ) )
+  if kind == 'songName':
+    return ( 'songName', rng.choice( ( "U", "V" ) ) )
+  if kind == 'addTrack' and song.count() < MAX_TRACKS:
+    return ( 'addTrack', rng.choice( ( None, 1, song.count() ) ), "T%d" % rng.randint( 1, 9 ), None )
+  if kind == 'popTrack' and song.count() > 1:
+    return ( 'popTrack', t )
+  if kind == 'moveTrack' and song.count() > 1:
+    return ( 'moveTrack', t, rng.choice( [ o for o in range( 1, song.count() + 1 ) if o != t ] ) )
+  if kind == 'popMeasure' and track.count() > 1:
+    return ( 'popMeasure', t, rng.randint( 1, track.count() ) )
+  if kind == 'setMeasure' or not measures:
+    m = rng.choice( ( None, rng.randint( 1, track.count() + 2 ) ) )
+    return ( 'setMeasure', t, m, randomMeasure( rng, song.count() ), m is not None and rng.random() < 0.5 )
+
+  m = rng.choice( measures )
+  measure = track.get( m )
+  beats = [ b for b in range( 1, measure.count() + 1 ) if measure.get( b ) is not None ]
+  if kind == 'measureFlags':
+    return ( 'measureFlags', t, m, rng.random() < 0.5, rng.random() < 0.5 )
+  if kind == 'measureAnn':
+    return ( 'measureAnn', t, m, rng.choice( ( None, "a", "b" ) ) )
+  if kind == 'popBeat' and measure.count():
+    return ( 'popBeat', t, m, rng.randint( 1, measure.count() ) )
+  if kind == 'beatAnn' and beats:
+    return ( 'beatAnn', t, m, rng.choice( beats ), rng.choice( ( None, "x" ) ) )
+  if kind == 'setNote' and measure.count():
+    return ( 'setNote', t, m, rng.randint( 1, measure.count() ), rng.randint( 1, STRINGS ),
+             rng.choice( ( None, rng.randint( 0, 24 ) ) ), rng.randint( 0, 3 ) )
+  b = rng.randint( 1, measure.count() + 1 )
+  return ( 'setBeat', t, m, b, randomBeat( rng, song.count() ), rng.random() < 0.5 )
+
+class undoRedo( unittest.TestCase ):
+
+  def setUp( self ):
+    self.dir = tempfile.mkdtemp()
+    self.addCleanup( shutil.rmtree, self.dir )
+
+  def testRandomEdits( self ):
+    for seed in range( 30 ):
+      rng = random.Random( seed )
+      fileName = os.path.join( self.dir, "U%d%s" % ( seed, songExt ) )
+      song = newSong( "U" )
+      editor = pytabEdit.songEditor( song, fileName )
+      self.addCleanup( editor.close ) # a compaction mustn't outlive the directory
+      states = [ songState( song ) ]
+      for i in range( 40 ):
+        editor.apply( randomOp( rng, song ) )
+        editor.endAction()
+        states.append( songState( song ) )
+        if rng.random() < 0.1:
+          editor.save()
+
+      for state in reversed( states[ : -1 ] ):
+        self.assertTrue( editor.undo() )
+        self.assertEqual( songState( song ), state, "seed %d" % seed )
+      self.assertFalse( editor.undo() )
+      for state in states[ 1 : ]:
+        self.assertTrue( editor.redo() )
+        self.assertEqual( songState( song ), state, "seed %d" % seed )
+
+      editor.close()
+      for lazy in ( False, True ):
+        self.assertEqual( songState( pytabEdit.openSong( fileName, "U", lazy ) ), states[ -1 ], "seed %d" % seed )
+      editor.save()
+      editor.close()
+      self.assertEqual( songState( pytabEdit.openSong( fileName, "U", True ) ), states[ -1 ], "seed %d" % seed )
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,79 @@
+'''
+Binary song files: what's written reads back the same, eagerly or lazily.
+
+  python -m pytest test_pytabFile.py
+'''
+
+import os, shutil, tempfile, unittest
+
+from pytabModel import *
+import pytabEdit, pytabFile
+
+def songState( song ):
+  return ( song.songName, song.tuningIndex, song.annotation, song.journalSeq,
+           [ ( track.trackName, track.annotation ) for track in song.get() ],
+           [ pytabFile.measureState( m ) for m in song.get( 1 ).get() ],
+           [ pytabEdit.trackNotes( track ) for track in song.get() ] )
+
+def sampleSong():
+  # Three tracks, a missing measure and beat, notes only some tracks have and annotations everywhere.
+  song = pytabSong( "Round trip" )
+  song.addTrack( name="Lead" )
+  song.addTrack( name="Rhythm" )
+  song.addTrack( name="Bass" )
+  song.tuningIndex = 2
+  song.annotation = "song"
+  song.journalSeq = 42
+  song.get( 2 ).annotation = "track"
+  measures = ( ( 1, "intro", ( ( "a", ( ( 1, 0, NOTE_NORMAL ), ), ( ( 6, 3, NOTE_HAMMER ), ) ),
+                               None,
+                               ( None, (), (), ( ( 4, 12, NOTE_SLIDE ), ( 5, 10, NOTE_PULLOFF ) ) ) ) ),
+               None,
+               ( 2, None, ( ( None, ( ( 2, 24, NOTE_NORMAL ), ) ), ) ),
+               ( 0, None, () ) )
+  for m, state in enumerate( measures, 1 ):
+    pytabEdit.applyOp( song, ( 'setMeasure', 1, m, state, False ) )
+  return song
+
+class roundTrip( unittest.TestCase ):
+
+  def setUp( self ):
+    self.dir = tempfile.mkdtemp()
+    self.fileName = os.path.join( self.dir, "R" + songExt )
+    self.song = sampleSong()
+    pytabFile.writeSong( self.song, self.fileName )
+
+  def tearDown( self ):
+    shutil.rmtree( self.dir )
+
+  def testEager( self ):
+    self.assertTrue( pytabFile.isBinary( self.fileName ) )
+    self.assertEqual( songState( pytabFile.readSong( self.fileName ) ), songState( self.song ) )
+
+  def testLazy( self ):
+    song = pytabFile.readSong( self.fileName, lazy=True )
+    track = song.get( 1 )
+    self.assertTrue( isinstance( track, pytabFile.lazyTrack ) )
+    self.assertEqual( [ track.beatCount( m ) for m in range( 1, 5 ) ], [ 3, 0, 1, 0 ] ) # before reading them
+    self.assertEqual( pytabEdit.trackNotes( song.get( 3 ) )[ 0 ], [ (), (), ( ( 4, 12, NOTE_SLIDE ), ( 5, 10, NOTE_PULLOFF ) ) ] )
+    self.assertEqual( songState( song ), songState( self.song ) )
+    song.get( 1 ).songFile.close()
+
+  def testRewriteLazy( self ):
+    # Measures a lazy song hasn't read are written from the file's columns.
+    song = pytabFile.readSong( self.fileName, lazy=True )
+    copy = os.path.join( self.dir, "C" + songExt )
+    pytabFile.writeSong( song, copy )
+    song.get( 1 ).songFile.close()
+    with open( self.fileName, 'rb' ) as a:
+      with open( copy, 'rb' ) as b:
+        self.assertEqual( a.read(), b.read() )
+
+  def testPartNotes( self ):
+    # One entry per beat of the timeline and track after the first, plus the start.
+    cols = pytabFile.encodeSong( self.song )[ 1 ]
+    self.assertEqual( len( cols[ 'partNotes' ] ), 1 + 4 * 2 )
+    self.assertEqual( len( pytabFile.encodeSong( newSong( "One" ) )[ 1 ][ 'partNotes' ] ), 0 )
+
+if __name__ == '__main__':
+  unittest.main()
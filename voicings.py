@@ -0,0 +1,121 @@
+'''
+Voicing enumerator. Lists the playable fingerings of a spelling on an instrument.
+
+The search goes string by string and is branch and bound: a string is only fretted at notes in the chord,
+a branch is cut as soon as its fret span is too wide, it can no longer reach minStrings, or the strings left
+can't supply the required intervals. Results stream from a generator so the first shapes are available
+right away, and finished searches are cached.
+'''
+
+import chordTheory
+from chordTheory import *
+
+_cache = {}
+
+def _stringFrets( tuning, offsets, chordMask, minFret, maxFret ):
+  # For each string, the frets in range that are chord tones, lowest first.
+  frets = []
+  for string, note in enumerate( tuning ):
+    low = max( minFret, offsets[ string ] )
+    frets.append( [ f for f in range( low, maxFret + 1 )
+                    if inMask( chordMask, calcNote( note, f - offsets[ string ] ) ) ] )
+  return frets
+
+def voicings( instrument, root, spelling, maxSpan=4, minStrings=3, maxStrings=None, required=None,
+              minFret=0, maxFret=num_frets ):
+  '''
+  Generate fingerings of root/spelling on instrument.
+
+  Each is a tuple with a fret per string in instrumentMap order, None for strings not played.
+  maxSpan    frets covered by the fretting hand, open strings don't count.
+  minStrings / maxStrings  how many strings are played.
+  required   interval names that must be present, default is every chord tone if they fit on maxStrings
+             strings, otherwise just the root.
+  minFret / maxFret  limit the search to part of the neck, open strings are always allowed.
+  '''
+  tuning = instrumentMap[ instrument ][ 't' ]
+  offsets = instrumentMap[ instrument ][ 'f' ]
+  numStrings = len( tuning )
+  if maxStrings is None or maxStrings > numStrings:
+    maxStrings = numStrings
+  if not isinstance( root, int ):
+    root = noteIndex[ root ]
+
+  chordMask = spellingMask( root, spelling )
+  if required is None:
+    required = spellingMap[ spelling ] if maskSize( chordMask ) <= maxStrings else ( 'R', )
+  requiredMask = rotateMask( intervalMask( required ), root )
+
+  key = ( tuple( tuning ), tuple( offsets ), root, spelling, maxSpan, minStrings, maxStrings, requiredMask,
+          minFret, maxFret, chordTheory.tablesVersion )
+  cached = _cache.get( key )
+  if cached is not None:
+    for v in cached:
+      yield v
+    return
+
+  frets = _stringFrets( tuning, offsets, chordMask, minFret, maxFret )
+  # Open strings are allowed outside minFret. A string's open note is at its fret offset ( banjo 5th ).
+  openFrets = [ [ offsets[ s ] ] if offsets[ s ] < minFret and inMask( chordMask, noteIndex[ tuning[ s ] ] ) else []
+                for s in range( numStrings ) ]
+  notes = [ [ 1 << calcNote( tuning[ s ], f - offsets[ s ] ) for f in range( maxFret + 1 ) ]
+            for s in range( numStrings ) ]
+
+  # reach[ s ] is every chord tone strings s..N can play, to cut branches that can't complete.
+  reach = [ 0 ] * ( numStrings + 1 )
+  for s in range( numStrings - 1, -1, -1 ):
+    reach[ s ] = reach[ s + 1 ]
+    for f in frets[ s ] + openFrets[ s ]:
+      reach[ s ] |= notes[ s ][ f ]
+
+  found = []
+  fingering = [ None ] * numStrings
+
+  def branches( string, played, covered, lo, hi ):
+    # Choices for string given the strings above it, each is ( fret, covered, lowest fretted, highest fretted ).
+    if string == numStrings:
+      return
+    left = numStrings - string
+    if played + left < minStrings:
+      return
+    if requiredMask & ~( covered | reach[ string ] ):
+      return
+    if maskSize( requiredMask & ~covered ) > min( left, maxStrings - played ):
+      return
+
+    yield None, covered, lo, hi # string not played
+    if played == maxStrings:
+      return
+
+    for f in openFrets[ string ] + frets[ string ]:
+      if f == offsets[ string ]:
+        newLo, newHi = lo, hi # open
+      else:
+        newLo = f if lo is None else min( lo, f )
+        newHi = f if hi is None else max( hi, f )
+        if newHi - newLo >= maxSpan:
+          if f > newLo:
+            break # frets are ascending, the rest are wider still
+          continue
+      yield f, covered | notes[ string ][ f ], newLo, newHi
+
+  # Explicit stack rather than recursion so results can be yielded as they're found.
+  stack = [ ( 0, 0, 0, None, None, branches( 0, 0, 0, None, None ) ) ]
+  while stack:
+    string, played, covered, lo, hi, it = stack[ -1 ]
+    for f, newCovered, newLo, newHi in it:
+      fingering[ string ] = f
+      newPlayed = played + ( f is not None )
+      if string + 1 == numStrings:
+        if newPlayed >= minStrings and requiredMask & ~newCovered == 0:
+          v = tuple( fingering )
+          found.append( v )
+          yield v
+        continue
+      stack.append( ( string + 1, newPlayed, newCovered, newLo, newHi,
+                      branches( string + 1, newPlayed, newCovered, newLo, newHi ) ) )
+      break
+    else:
+      stack.pop()
+
+  _cache[ key ] = found # only reached if the caller ran the search to the end